@@ -1,5 +1,7 @@
 from datetime import datetime, timezone
 from uuid import uuid4
+import asyncio
+import time
 from typing import Any, Dict, List, Optional
 import json
 import os
@@ -11,19 +13,62 @@ from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
     EndSessionContent,
+    EndStreamContent,
     StartSessionContent,
+    StartStreamContent,
     TextContent,
     chat_protocol_spec,
 )
 
 # Import components from separate files
 from voting.votingrag import VotingRAG
-from voting.knowledge import initialize_knowledge_graph
-from voting.utils import LLM, generate_voting_question, generate_multiple_voting_questions, process_query
+from voting.knowledge import initialize_knowledge_graph, load_knowledge_snapshot
+from voting.cache import SingleFlight, create_cache
+from voting.condense import configure_condenser
+from voting.themes import CLUSTERING_BACKEND
+from voting.log import configure_logging, get_logger
+from voting.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REGISTRY,
+    REQUEST_SECONDS,
+    cache_stats_collector,
+    instrumented,
+    scheduler_stats_collector,
+    span,
+    start_metrics_server,
+    upstream_stats_collector,
+)
+from voting.resilience import UpstreamGuard, UpstreamUnavailable
+from voting.scheduler import WorkClass, WorkRejected, WorkScheduler
+from voting.utils import (
+    GENERATION_MODES,
+    LLM,
+    LLMBackend,
+    coalesced_generation,
+    generate_voting_question,
+    generate_multiple_voting_questions,
+    generate_voting_questions_batch,
+    has_negative_data,
+    parse_llm_backends,
+    parse_llm_routes,
+    parse_questions_command,
+    process_query,
+    stream_multiple_voting_questions,
+    stream_query_answer,
+    summarize_negative_data,
+)
 
 # Load environment variables
 load_dotenv()
 
+# Structured logging. Per-request events are DEBUG, so the default INFO level skips them entirely.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))
+LOG_MAX_CHARS = int(os.environ.get("LOG_MAX_CHARS", "500"))
+configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, sample_rate=LOG_SAMPLE_RATE, max_chars=LOG_MAX_CHARS)
+logger = get_logger("voting.agent")
+
 # Set your API keys
 ASI_ONE_API_KEY = os.environ.get("ASI_ONE_API_KEY")
 AGENTVERSE_API_KEY = os.environ.get("AGENTVERSE_API_KEY")
@@ -33,6 +78,118 @@ if not ASI_ONE_API_KEY:
 if not AGENTVERSE_API_KEY:
     raise ValueError("Please set AGENTVERSE_API_KEY environment variable")
 
+# OpenAI-compatible ASI:One endpoint, overridable to point at a proxy or a local stand-in
+ASI_ONE_BASE_URL = os.environ.get("ASI_ONE_BASE_URL", "https://api.asi1.ai/v1")
+
+# Completion backends in preference order, as comma-separated name=model[@base_url] entries. base_url defaults to
+# ASI_ONE_BASE_URL and each backend's key is read from LLM_<NAME>_API_KEY, falling back to ASI_ONE_API_KEY.
+# LLM_ROUTES gives call sites (intent, generation, knowledge, answer) their own order, e.g. "intent=fast;answer=quality,fast"
+LLM_BACKENDS = os.environ.get("LLM_BACKENDS") or "asi_one=asi1-mini"
+LLM_ROUTES = os.environ.get("LLM_ROUTES", "")
+# A completion still running after its backend's LLM_HEDGE_QUANTILE latency is duplicated on the next backend
+# (LLM_HEDGE_DELAY seconds until LLM_HEDGE_MIN_SAMPLES completions were timed; 0 disables hedging)
+LLM_HEDGE_QUANTILE = float(os.environ.get("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY", "2"))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Knowledge graph orchestrator client settings
+KG_BASE_URL = os.environ.get("KG_BASE_URL")
+KG_POOL_SIZE = int(os.environ.get("KG_POOL_SIZE", "10"))
+KG_CONNECT_TIMEOUT = float(os.environ.get("KG_CONNECT_TIMEOUT", "5"))
+KG_READ_TIMEOUT = float(os.environ.get("KG_READ_TIMEOUT", "30"))
+KG_MAX_RETRIES = int(os.environ.get("KG_MAX_RETRIES", "3"))
+KG_RETRY_BACKOFF = float(os.environ.get("KG_RETRY_BACKOFF", "0.5"))
+
+# Upstream protection for the orchestrator and ASI:One. *_TIMEOUT caps each call in seconds, retries included (0 disables).
+# A circuit opens after UPSTREAM_BREAKER_FAILURES consecutive failures and stays open for UPSTREAM_BREAKER_RESET seconds.
+# Concurrency adapts (AIMD) up to KG_POOL_SIZE / ASI_ONE_MAX_CONCURRENCY, backing off on failures and on calls slower
+# than *_LATENCY_TARGET; calls over the limit queue (at most UPSTREAM_MAX_QUEUE, for UPSTREAM_QUEUE_TIMEOUT seconds) or are shed.
+KG_TIMEOUT = float(os.environ.get("KG_TIMEOUT", "60")) or None
+KG_LATENCY_TARGET = float(os.environ.get("KG_LATENCY_TARGET", "5")) or None
+ASI_ONE_TIMEOUT = float(os.environ.get("ASI_ONE_TIMEOUT", "60")) or None
+ASI_ONE_MAX_CONCURRENCY = int(os.environ.get("ASI_ONE_MAX_CONCURRENCY", "32"))
+ASI_ONE_LATENCY_TARGET = float(os.environ.get("ASI_ONE_LATENCY_TARGET", "20")) or None
+UPSTREAM_BREAKER_FAILURES = int(os.environ.get("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET = float(os.environ.get("UPSTREAM_BREAKER_RESET", "30"))
+UPSTREAM_MAX_QUEUE = int(os.environ.get("UPSTREAM_MAX_QUEUE", "100"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.environ.get("UPSTREAM_QUEUE_TIMEOUT", "10")) or None
+
+# Brand summary cache settings (BRAND_CACHE_SIZE=0 disables the cache)
+BRAND_CACHE_SIZE = int(os.environ.get("BRAND_CACHE_SIZE", "256"))
+BRAND_CACHE_TTL = float(os.environ.get("BRAND_CACHE_TTL", "300"))
+BRAND_CACHE_STALE_TTL = float(os.environ.get("BRAND_CACHE_STALE_TTL", "600"))
+
+# LLM response cache: LLM_CACHE_BACKEND is "memory", "sqlite" or "none"
+LLM_CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+
+# Classify unambiguous chat queries locally and generate+explain voting questions in one completion
+LOCAL_INTENT = os.environ.get("LOCAL_INTENT", "true").lower() == "true"
+COMBINED_PROMPTS = os.environ.get("COMBINED_PROMPTS", "true").lower() == "true"
+
+# Stream chat answers as chunked messages between start-stream/end-stream markers
+CHAT_STREAMING = os.environ.get("CHAT_STREAMING", "false").lower() == "true"
+CHAT_STREAM_CHUNK_CHARS = int(os.environ.get("CHAT_STREAM_CHUNK_CHARS", "200"))
+CHAT_STREAM_FLUSH_SECONDS = float(os.environ.get("CHAT_STREAM_FLUSH_SECONDS", "0.5"))
+
+# Minimum similarity (0-1) for a chat query to be answered from the local FAQ store
+FAQ_MIN_SCORE = float(os.environ.get("FAQ_MIN_SCORE", "0.6"))
+
+# Cap on FAQ atoms learned at runtime; least recently used ones are evicted beyond it
+MAX_LEARNED_KNOWLEDGE = int(os.environ.get("MAX_LEARNED_KNOWLEDGE", "1000"))
+
+# Knowledge space snapshot file (unset disables snapshots) and seconds between saves
+KNOWLEDGE_SNAPSHOT_PATH = os.environ.get("KNOWLEDGE_SNAPSHOT_PATH")
+KNOWLEDGE_SNAPSHOT_INTERVAL = float(os.environ.get("KNOWLEDGE_SNAPSHOT_INTERVAL", "300"))
+
+# Upper bound on questions per /voting/questions request or chat command
+MAX_QUESTIONS_PER_REQUEST = int(os.environ.get("MAX_QUESTIONS_PER_REQUEST", "10"))
+
+# Batch voting endpoint limits
+BATCH_MAX_BRANDS = int(os.environ.get("BATCH_MAX_BRANDS", "500"))
+BATCH_FETCH_CONCURRENCY = int(os.environ.get("BATCH_FETCH_CONCURRENCY", "8"))
+BATCH_LLM_CONCURRENCY = int(os.environ.get("BATCH_LLM_CONCURRENCY", "4"))
+
+# Work scheduler shared by chat ("chat"), single-brand REST ("rest") and /voting/batch ("batch") work, served in that
+# priority order. REST and batch work may only take *_MAX_RUNNING of the SCHEDULER_CONCURRENCY slots, keeping the rest
+# for chat; chat runs one message per sender at a time. *_DEADLINE drops work still queued after that many seconds (0 disables)
+SCHEDULER_CONCURRENCY = int(os.environ.get("SCHEDULER_CONCURRENCY", "32"))
+SCHEDULER_REST_MAX_RUNNING = int(os.environ.get("SCHEDULER_REST_MAX_RUNNING", "24"))
+SCHEDULER_BATCH_MAX_RUNNING = int(os.environ.get("SCHEDULER_BATCH_MAX_RUNNING", "4"))
+SCHEDULER_MAX_QUEUE = int(os.environ.get("SCHEDULER_MAX_QUEUE", "200"))
+SCHEDULER_BATCH_MAX_QUEUE = int(os.environ.get("SCHEDULER_BATCH_MAX_QUEUE", "2000"))
+SCHEDULER_SENDER_MAX_QUEUE = int(os.environ.get("SCHEDULER_SENDER_MAX_QUEUE", "5"))
+SCHEDULER_CHAT_DEADLINE = float(os.environ.get("SCHEDULER_CHAT_DEADLINE", "30")) or None
+SCHEDULER_REST_DEADLINE = float(os.environ.get("SCHEDULER_REST_DEADLINE", "60")) or None
+SCHEDULER_BATCH_DEADLINE = float(os.environ.get("SCHEDULER_BATCH_DEADLINE", "0")) or None
+
+# Largest per-source limit accepted by /brand/negative-data; requests without a limit get every item
+NEGATIVE_DATA_MAX_PAGE_SIZE = int(os.environ.get("NEGATIVE_DATA_MAX_PAGE_SIZE", "1000"))
+
+# Seconds between brand catalogue refreshes from the orchestrator
+BRAND_CATALOGUE_TTL = float(os.environ.get("BRAND_CATALOGUE_TTL", "300"))
+
+# Feedback condensation before LLM prompts: "themes" (clusters over every item) or "samples" (representative items),
+# token budget per source and per-item cap for samples, near-duplicate threshold, themes shown
+FEEDBACK_SUMMARY = os.environ.get("FEEDBACK_SUMMARY", "themes")
+FEEDBACK_MAX_THEMES = int(os.environ.get("FEEDBACK_MAX_THEMES", "8"))
+FEEDBACK_TOKEN_BUDGET = int(os.environ.get("FEEDBACK_TOKEN_BUDGET", "300"))
+FEEDBACK_ITEM_TOKENS = int(os.environ.get("FEEDBACK_ITEM_TOKENS", "80"))
+FEEDBACK_DUP_SIMILARITY = float(os.environ.get("FEEDBACK_DUP_SIMILARITY", "0.5"))
+
+# Default voting question generator: "llm" or "template" (rule-based, no LLM call); requests may override it.
+# LLM_TIMEOUT > 0 caps each question generation call in seconds before falling back to templates
+GENERATION_MODE = os.environ.get("GENERATION_MODE", "llm")
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "0")) or None
+
+# Optional plain-text Prometheus scrape port (GET /metrics); unset serves metrics only through the agent's JSON endpoint
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Returned while the KG orchestrator's circuit breaker is open or it is shedding load
+KG_UNAVAILABLE_MESSAGE = "The knowledge graph is temporarily unavailable. Please try again shortly."
+
 # Initialize agent
 agent = Agent(
     name="voting_agent",
@@ -45,6 +202,7 @@ agent = Agent(
 # REST API Models
 class VotingRequest(Model):
     brand_name: str
+    mode: Optional[str] = None
 
 class VotingResponse(Model):
     success: bool
@@ -54,8 +212,43 @@ class VotingResponse(Model):
     timestamp: str
     agent_address: str
 
+class MultipleVotingRequest(Model):
+    brand_name: str
+    count: int = 5
+    mode: Optional[str] = None
+
+class MultipleVotingResponse(Model):
+    success: bool
+    brand_name: str
+    voting_questions: List[str]
+    negative_data_summary: Dict
+    timestamp: str
+    agent_address: str
+
+class BatchVotingRequest(Model):
+    brand_names: List[str]
+    llm_concurrency: Optional[int] = None
+    mode: Optional[str] = None
+
+class BatchVotingResult(Model):
+    brand_name: str
+    success: bool
+    voting_question: Optional[str] = None
+    negative_data_summary: Dict
+    error: Optional[str] = None
+
+class BatchVotingResponse(Model):
+    success: bool
+    results: List[BatchVotingResult]
+    succeeded: int
+    failed: int
+    timestamp: str
+    agent_address: str
+
 class BrandNegativeDataRequest(Model):
     brand_name: str
+    limit: Optional[int] = None
+    offset: int = 0
 
 class BrandNegativeDataResponse(Model):
     success: bool
@@ -65,12 +258,133 @@ class BrandNegativeDataResponse(Model):
     negative_social: List[str]
     timestamp: str
     agent_address: str
+    offset: int = 0
+    limit: Optional[int] = None
+    totals: Dict[str, int] = {}
+    next_offset: Optional[int] = None
+
+class CacheStatsResponse(Model):
+    caches: Dict
+    timestamp: str
+
+class MetricsResponse(Model):
+    content_type: str
+    text: str
+    quantiles: Dict
+    timestamp: str
 
 # Initialize global components
 metta = MeTTa()
-initialize_knowledge_graph(metta)
-rag = VotingRAG(metta)
-llm = LLM(api_key=ASI_ONE_API_KEY)
+learned_knowledge = load_knowledge_snapshot(metta, KNOWLEDGE_SNAPSHOT_PATH) if KNOWLEDGE_SNAPSHOT_PATH else None
+if learned_knowledge is None:
+    initialize_knowledge_graph(metta)
+rag = VotingRAG(
+    metta,
+    kg_base_url=KG_BASE_URL,
+    pool_size=KG_POOL_SIZE,
+    connect_timeout=KG_CONNECT_TIMEOUT,
+    read_timeout=KG_READ_TIMEOUT,
+    max_retries=KG_MAX_RETRIES,
+    retry_backoff=KG_RETRY_BACKOFF,
+    cache_size=BRAND_CACHE_SIZE,
+    cache_ttl=BRAND_CACHE_TTL,
+    cache_stale_ttl=BRAND_CACHE_STALE_TTL,
+    catalogue_ttl=BRAND_CATALOGUE_TTL,
+    faq_min_score=FAQ_MIN_SCORE,
+    max_learned_knowledge=MAX_LEARNED_KNOWLEDGE,
+    guard=UpstreamGuard(
+        "kg",
+        timeout=KG_TIMEOUT,
+        failure_threshold=UPSTREAM_BREAKER_FAILURES,
+        reset_timeout=UPSTREAM_BREAKER_RESET,
+        max_concurrency=KG_POOL_SIZE,
+        latency_target=KG_LATENCY_TARGET,
+        max_queue=UPSTREAM_MAX_QUEUE,
+        queue_timeout=UPSTREAM_QUEUE_TIMEOUT,
+    ),
+)
+if learned_knowledge:
+    rag.register_learned_knowledge(learned_knowledge)
+llm = LLM(
+    cache=create_cache(LLM_CACHE_BACKEND, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, path=LLM_CACHE_PATH),
+    backends=[
+        LLMBackend(
+            name,
+            model,
+            base_url or ASI_ONE_BASE_URL,
+            os.environ.get(f"LLM_{name.upper()}_API_KEY", ASI_ONE_API_KEY),
+            guard=UpstreamGuard(
+                name,
+                timeout=ASI_ONE_TIMEOUT,
+                failure_threshold=UPSTREAM_BREAKER_FAILURES,
+                reset_timeout=UPSTREAM_BREAKER_RESET,
+                max_concurrency=ASI_ONE_MAX_CONCURRENCY,
+                latency_target=ASI_ONE_LATENCY_TARGET,
+                max_queue=UPSTREAM_MAX_QUEUE,
+                queue_timeout=UPSTREAM_QUEUE_TIMEOUT,
+            ),
+            structured_output=os.environ.get(f"LLM_{name.upper()}_STRUCTURED_OUTPUT", "none"),
+        )
+        for name, model, base_url in parse_llm_backends(LLM_BACKENDS)
+    ],
+    routes=parse_llm_routes(LLM_ROUTES),
+    hedge_quantile=LLM_HEDGE_QUANTILE,
+    hedge_delay=LLM_HEDGE_DELAY,
+    hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+)
+configure_condenser(
+    token_budget=FEEDBACK_TOKEN_BUDGET,
+    max_item_tokens=FEEDBACK_ITEM_TOKENS,
+    similarity=FEEDBACK_DUP_SIMILARITY,
+    mode=FEEDBACK_SUMMARY,
+    max_themes=FEEDBACK_MAX_THEMES,
+)
+REGISTRY.add_collector(
+    "Cache counters and hit ratios, by cache",
+    cache_stats_collector(
+        lambda: {**rag.cache_stats(), "llm_response": llm.cache_stats(), "voting_generation": generation_flight.stats()}
+    ),
+)
+REGISTRY.add_collector(
+    "Circuit breaker and adaptive concurrency limiter state, by upstream",
+    upstream_stats_collector(lambda: {**rag.upstream_stats(), **llm.upstream_stats()}),
+)
+# Concurrent identical /voting and /voting/questions requests share one KG fetch and one generation
+generation_flight = SingleFlight()
+scheduler = WorkScheduler(
+    [
+        WorkClass(
+            "chat",
+            0,
+            max_queue=SCHEDULER_MAX_QUEUE,
+            max_sender_queue=SCHEDULER_SENDER_MAX_QUEUE,
+            sender_concurrency=1,
+            deadline=SCHEDULER_CHAT_DEADLINE,
+        ),
+        WorkClass(
+            "rest",
+            1,
+            max_running=SCHEDULER_REST_MAX_RUNNING,
+            max_queue=SCHEDULER_MAX_QUEUE,
+            deadline=SCHEDULER_REST_DEADLINE,
+        ),
+        WorkClass(
+            "batch",
+            2,
+            max_running=SCHEDULER_BATCH_MAX_RUNNING,
+            max_queue=SCHEDULER_BATCH_MAX_QUEUE,
+            deadline=SCHEDULER_BATCH_DEADLINE,
+        ),
+    ],
+    concurrency=SCHEDULER_CONCURRENCY,
+)
+REGISTRY.add_collector(
+    "Running, queued, admitted, rejected and expired work, by scheduler work class",
+    scheduler_stats_collector(scheduler.stats),
+)
+# Chat answers running in the background, referenced until they finish
+chat_tasks = set()
+metrics_server = None
 
 # Protocol setup
 chat_proto = Protocol(spec=chat_protocol_spec)
@@ -86,6 +400,21 @@ def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
         content=content,
     )
 
+def create_stream_chat(text: str, stream_id, start: bool = False, end: bool = False) -> ChatMessage:
+    """Create one chunk of a streamed chat answer, with start/end stream markers as needed."""
+    content = []
+    if start:
+        content.append(StartStreamContent(stream_id=stream_id))
+    if text:
+        content.append(TextContent(type="text", text=text))
+    if end:
+        content.append(EndStreamContent(stream_id=stream_id))
+    return ChatMessage(
+        timestamp=datetime.now(timezone.utc),
+        msg_id=uuid4(),
+        content=content,
+    )
+
 # Startup Handler
 @agent.on_event("startup")
 async def startup_handler(ctx: Context):
@@ -93,18 +422,85 @@ async def startup_handler(ctx: Context):
     ctx.logger.info("Agent is ready to create voting questions based on negative feedback!")
     ctx.logger.info("REST API endpoints available:")
     ctx.logger.info("- POST http://localhost:8080/voting")
+    ctx.logger.info("- POST http://localhost:8080/voting/questions")
+    ctx.logger.info("- POST http://localhost:8080/voting/batch")
     ctx.logger.info("- POST http://localhost:8080/brand/negative-data")
+    ctx.logger.info("- GET http://localhost:8080/stats/cache")
+    ctx.logger.info("- GET http://localhost:8080/metrics")
+    if METRICS_PORT:
+        global metrics_server
+        metrics_server = await start_metrics_server(METRICS_PORT)
+        ctx.logger.info(f"Serving Prometheus metrics on http://localhost:{METRICS_PORT}/metrics")
+    brands = await rag.arefresh_brand_catalogue()
+    ctx.logger.info(f"Loaded brand catalogue with {len(brands)} brands")
+    if FEEDBACK_SUMMARY == "themes":
+        ctx.logger.info(f"Clustering feedback themes with the {CLUSTERING_BACKEND} implementation")
+
+@agent.on_interval(period=BRAND_CATALOGUE_TTL)
+async def refresh_brand_catalogue(ctx: Context):
+    """Keep the local brand catalogue in sync with the orchestrator."""
+    try:
+        await rag.arefresh_brand_catalogue()
+    except UpstreamUnavailable as e:
+        ctx.logger.warning(f"Brand catalogue not loaded yet: {e}")
+
+saved_knowledge_changes = rag.knowledge_changes
+
+def persist_knowledge(ctx: Context):
+    """Write the knowledge space snapshot if learned knowledge changed since the last save."""
+    global saved_knowledge_changes
+    if not KNOWLEDGE_SNAPSHOT_PATH or rag.knowledge_changes == saved_knowledge_changes:
+        return
+    try:
+        count = rag.save_knowledge(KNOWLEDGE_SNAPSHOT_PATH)
+        saved_knowledge_changes = rag.knowledge_changes
+        ctx.logger.info(f"Saved {count} atoms to knowledge snapshot {KNOWLEDGE_SNAPSHOT_PATH}")
+    except OSError as e:
+        ctx.logger.error(f"Failed to save knowledge snapshot: {e}")
+
+@agent.on_interval(period=KNOWLEDGE_SNAPSHOT_INTERVAL)
+async def snapshot_knowledge(ctx: Context):
+    """Periodically persist learned knowledge so it survives instance restarts."""
+    persist_knowledge(ctx)
+
+# Shutdown Handler
+@agent.on_event("shutdown")
+async def shutdown_handler(ctx: Context):
+    persist_knowledge(ctx)
+    if metrics_server is not None:
+        await metrics_server.cleanup()
+    await rag.close()
+    ctx.logger.info("Closed knowledge graph HTTP session")
 
 # Chat Protocol Handlers
 @chat_proto.on_message(ChatMessage)
 async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
-    """Handle incoming chat messages and process voting question requests."""
+    """Acknowledge a chat message and answer it as scheduled chat work.
+    
+    The agent handles messages one at a time, so answering in the background
+    keeps one slow answer from holding up every other sender's messages.
+    """
     ctx.storage.set(str(ctx.session), sender)
     await ctx.send(
         sender,
         ChatAcknowledgement(timestamp=datetime.now(timezone.utc), acknowledged_msg_id=msg.msg_id),
     )
+    task = asyncio.create_task(answer_message(ctx, sender, msg))
+    chat_tasks.add(task)
+    task.add_done_callback(chat_tasks.discard)
 
+@instrumented(REQUEST_SECONDS, endpoint="chat")
+async def answer_message(ctx: Context, sender: str, msg: ChatMessage):
+    """Process voting question requests in a chat message, queued behind the sender's earlier messages."""
+    try:
+        async with scheduler.slot("chat", sender):
+            await answer_message_content(ctx, sender, msg)
+    except WorkRejected as e:
+        ctx.logger.warning(f"Dropped chat message from {sender}: {e}")
+        await ctx.send(sender, create_text_chat("I'm handling too many requests right now. Please try again in a moment."))
+
+async def answer_message_content(ctx: Context, sender: str, msg: ChatMessage):
+    """Answer each text item of a chat message."""
     for item in msg.content:
         if isinstance(item, StartSessionContent):
             ctx.logger.info(f"Got a start session message from {sender}")
@@ -113,9 +509,18 @@ async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
             user_query = item.text.strip()
             ctx.logger.info(f"Got a voting question request from {sender}: {user_query}")
             
+            command = parse_questions_command(user_query, MAX_QUESTIONS_PER_REQUEST)
+            if command:
+                await send_streamed_questions(ctx, sender, *command)
+                continue
+            
+            if CHAT_STREAMING:
+                await send_streamed_answer(ctx, sender, user_query)
+                continue
+            
             try:
                 # Process the query using the voting question generation logic
-                response = process_query(user_query, rag, llm)
+                response = await process_query(user_query, rag, llm, local_intent=LOCAL_INTENT, combined=COMBINED_PROMPTS)
                 
                 # Format the response
                 if isinstance(response, dict):
@@ -135,34 +540,87 @@ async def handle_message(ctx: Context, sender: str, msg: ChatMessage):
         else:
             ctx.logger.info(f"Got unexpected content from {sender}")
 
+async def send_streamed_answer(ctx: Context, sender: str, user_query: str):
+    """Forward the final completion for a chat query in chunks as it streams in."""
+    stream_id = uuid4()
+    started = False
+    buffer = ""
+    last_flush = time.monotonic()
+    try:
+        async for text in stream_query_answer(user_query, rag, llm, local_intent=LOCAL_INTENT, combined=COMBINED_PROMPTS):
+            buffer += text
+            if len(buffer) >= CHAT_STREAM_CHUNK_CHARS or time.monotonic() - last_flush >= CHAT_STREAM_FLUSH_SECONDS:
+                await ctx.send(sender, create_stream_chat(buffer, stream_id, start=not started))
+                started = True
+                buffer = ""
+                last_flush = time.monotonic()
+    except Exception as e:
+        ctx.logger.error(f"Error streaming voting question answer: {e}")
+        buffer += "\n\nI apologize, but I encountered an error processing your voting question request. Please try again."
+    await ctx.send(sender, create_stream_chat(buffer, stream_id, start=not started, end=True))
+
+async def send_streamed_questions(ctx: Context, sender: str, count: int, brand_name: str):
+    """Answer a "<N> questions for <brand>" chat command, one message per question as it streams in."""
+    try:
+        negative_data = await rag.aget_brand_negative_data(brand_name)
+        if not has_negative_data(negative_data):
+            await ctx.send(sender, create_text_chat(f"No negative feedback data found for {brand_name}."))
+            return
+        await ctx.send(sender, create_text_chat(f"**{count} voting questions for {brand_name}:**"))
+        index = 0
+        async for question in stream_multiple_voting_questions(
+            brand_name, negative_data, llm, count, GENERATION_MODE, LLM_TIMEOUT
+        ):
+            index += 1
+            await ctx.send(sender, create_text_chat(f"{index}. {question}"))
+    except UpstreamUnavailable as e:
+        ctx.logger.warning(f"Can't stream voting questions for {brand_name}: {e}")
+        await ctx.send(sender, create_text_chat(KG_UNAVAILABLE_MESSAGE))
+    except Exception as e:
+        ctx.logger.error(f"Error streaming voting questions: {e}")
+        await ctx.send(
+            sender,
+            create_text_chat("I apologize, but I encountered an error generating voting questions. Please try again.")
+        )
+
 @chat_proto.on_message(ChatAcknowledgement)
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
     """Handle chat acknowledgements."""
     ctx.logger.info(f"Got an acknowledgement from {sender} for {msg.acknowledged_msg_id}")
 
+def resolve_generation_mode(mode: Optional[str]) -> str:
+    """The request's generation mode, or GENERATION_MODE if it didn't set one."""
+    mode = (mode or GENERATION_MODE).lower()
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode {mode!r}; expected one of {', '.join(GENERATION_MODES)}")
+    return mode
+
 # REST API Handlers
 @agent.on_rest_post("/voting", VotingRequest, VotingResponse)
+@instrumented(REQUEST_SECONDS, endpoint="/voting")
 async def handle_voting(ctx: Context, req: VotingRequest) -> VotingResponse:
     """Handle voting question generation requests."""
     ctx.logger.info(f"Received voting question request for: {req.brand_name}")
     
     try:
-        # Get negative data for the brand
-        negative_data = rag.get_brand_negative_data(req.brand_name)
+        mode = resolve_generation_mode(req.mode)
+        async with scheduler.slot("rest", "/voting"):
+            # Get negative data for the brand and generate a single voting question
+            negative_data, voting_question = await coalesced_generation(
+                generation_flight,
+                rag,
+                req.brand_name,
+                mode,
+                lambda brand_name, data: generate_voting_question(brand_name, data, llm, mode, LLM_TIMEOUT),
+                "question",
+            )
         
-        if negative_data and (negative_data.get('negative_reviews') or negative_data.get('negative_reddit') or negative_data.get('negative_social')):
-            # Generate single voting question
-            voting_question = generate_voting_question(req.brand_name, negative_data, llm)
-            
+        if voting_question is not None:
             return VotingResponse(
                 success=True,
                 brand_name=req.brand_name,
                 voting_question=voting_question,
-                negative_data_summary={
-                    "negative_reviews_count": len(negative_data.get('negative_reviews', [])),
-                    "negative_reddit_count": len(negative_data.get('negative_reddit', [])),
-                    "negative_social_count": len(negative_data.get('negative_social', []))
-                },
+                negative_data_summary=summarize_negative_data(negative_data),
                 timestamp=datetime.now(timezone.utc).isoformat(),
                 agent_address=ctx.agent.address
             )
@@ -176,6 +634,16 @@ async def handle_voting(ctx: Context, req: VotingRequest) -> VotingResponse:
                 agent_address=ctx.agent.address
             )
         
+    except UpstreamUnavailable as e:
+        ctx.logger.warning(f"Can't generate a voting question for {req.brand_name}: {e}")
+        return VotingResponse(
+            success=False,
+            brand_name=req.brand_name,
+            voting_question=KG_UNAVAILABLE_MESSAGE,
+            negative_data_summary={},
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            agent_address=ctx.agent.address
+        )
     except Exception as e:
         error_msg = f"Error processing voting question for {req.brand_name}: {str(e)}"
         ctx.logger.error(error_msg)
@@ -190,14 +658,133 @@ async def handle_voting(ctx: Context, req: VotingRequest) -> VotingResponse:
         )
 
 
+@agent.on_rest_post("/voting/questions", MultipleVotingRequest, MultipleVotingResponse)
+@instrumented(REQUEST_SECONDS, endpoint="/voting/questions")
+async def handle_voting_questions(ctx: Context, req: MultipleVotingRequest) -> MultipleVotingResponse:
+    """Handle requests for several voting questions for one brand."""
+    ctx.logger.info(f"Received request for {req.count} voting questions for: {req.brand_name}")
+    count = max(1, min(req.count, MAX_QUESTIONS_PER_REQUEST))
+    
+    try:
+        mode = resolve_generation_mode(req.mode)
+        
+        async def generate(brand_name: str, data: Dict) -> List[str]:
+            # Streaming lets generation stop as soon as `count` questions have been parsed
+            return [
+                question async for question in stream_multiple_voting_questions(
+                    brand_name, data, llm, count, mode, LLM_TIMEOUT
+                )
+            ]
+        
+        async with scheduler.slot("rest", "/voting/questions"):
+            negative_data, voting_questions = await coalesced_generation(
+                generation_flight, rag, req.brand_name, mode, generate, "questions", count
+            )
+        if voting_questions is None:
+            return MultipleVotingResponse(
+                success=False,
+                brand_name=req.brand_name,
+                voting_questions=[],
+                negative_data_summary={},
+                timestamp=datetime.now(timezone.utc).isoformat(),
+                agent_address=ctx.agent.address
+            )
+        return MultipleVotingResponse(
+            success=True,
+            brand_name=req.brand_name,
+            voting_questions=voting_questions,
+            negative_data_summary=summarize_negative_data(negative_data),
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            agent_address=ctx.agent.address
+        )
+    except UpstreamUnavailable as e:
+        ctx.logger.warning(f"Can't generate voting questions for {req.brand_name}: {e}")
+        return MultipleVotingResponse(
+            success=False,
+            brand_name=req.brand_name,
+            voting_questions=[],
+            negative_data_summary={},
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            agent_address=ctx.agent.address
+        )
+    except Exception as e:
+        ctx.logger.error(f"Error generating voting questions for {req.brand_name}: {str(e)}")
+        return MultipleVotingResponse(
+            success=False,
+            brand_name=req.brand_name,
+            voting_questions=[],
+            negative_data_summary={},
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            agent_address=ctx.agent.address
+        )
+
+@agent.on_rest_post("/voting/batch", BatchVotingRequest, BatchVotingResponse)
+@instrumented(REQUEST_SECONDS, endpoint="/voting/batch")
+async def handle_voting_batch(ctx: Context, req: BatchVotingRequest) -> BatchVotingResponse:
+    """Handle voting question generation for many brands at once."""
+    ctx.logger.info(f"Received batch voting question request for {len(req.brand_names)} brands")
+    
+    try:
+        mode = resolve_generation_mode(req.mode)
+        error = f"Batch exceeds the limit of {BATCH_MAX_BRANDS} brands" if len(req.brand_names) > BATCH_MAX_BRANDS else None
+    except ValueError as e:
+        error = str(e)
+    if error:
+        return BatchVotingResponse(
+            success=False,
+            results=[
+                BatchVotingResult(
+                    brand_name=brand_name,
+                    success=False,
+                    negative_data_summary={},
+                    error=error
+                )
+                for brand_name in req.brand_names
+            ],
+            succeeded=0,
+            failed=len(req.brand_names),
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            agent_address=ctx.agent.address
+        )
+    
+    llm_concurrency = min(req.llm_concurrency or BATCH_LLM_CONCURRENCY, BATCH_LLM_CONCURRENCY)
+    results = await generate_voting_questions_batch(
+        req.brand_names,
+        rag,
+        llm,
+        fetch_concurrency=BATCH_FETCH_CONCURRENCY,
+        llm_concurrency=max(1, llm_concurrency),
+        mode=mode,
+        timeout=LLM_TIMEOUT,
+        scheduler=scheduler,
+        sender=str(uuid4()),
+    )
+    succeeded = sum(1 for result in results if result["success"])
+    ctx.logger.info(f"Batch voting questions: {succeeded} succeeded, {len(results) - succeeded} failed")
+    
+    return BatchVotingResponse(
+        success=succeeded > 0,
+        results=[BatchVotingResult(**result) for result in results],
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        agent_address=ctx.agent.address
+    )
+
 @agent.on_rest_post("/brand/negative-data", BrandNegativeDataRequest, BrandNegativeDataResponse)
+@instrumented(REQUEST_SECONDS, endpoint="/brand/negative-data")
 async def handle_brand_negative_data(ctx: Context, req: BrandNegativeDataRequest) -> BrandNegativeDataResponse:
-    """Handle requests for raw negative data."""
+    """Handle requests for raw negative data, one page of each source at a time."""
     ctx.logger.info(f"Received negative data request for: {req.brand_name}")
+    limit = max(1, min(req.limit, NEGATIVE_DATA_MAX_PAGE_SIZE)) if req.limit else None
+    offset = max(0, req.offset)
     
     try:
-        # Get negative data for the brand
-        negative_data = rag.get_brand_negative_data(req.brand_name)
+        # Get one page of negative data for the brand
+        async with scheduler.slot("rest", "/brand/negative-data"):
+            with span("kg_fetch"):
+                negative_data = await rag.aget_brand_negative_data_page(req.brand_name, limit=limit, offset=offset)
+        totals = negative_data.get("totals", {})
         
         return BrandNegativeDataResponse(
             success=True,
@@ -206,9 +793,24 @@ async def handle_brand_negative_data(ctx: Context, req: BrandNegativeDataRequest
             negative_reddit=negative_data.get('negative_reddit', []),
             negative_social=negative_data.get('negative_social', []),
             timestamp=datetime.now(timezone.utc).isoformat(),
-            agent_address=ctx.agent.address
+            agent_address=ctx.agent.address,
+            offset=offset,
+            limit=limit,
+            totals=totals,
+            next_offset=offset + limit if limit and any(total > offset + limit for total in totals.values()) else None,
         )
         
+    except UpstreamUnavailable as e:
+        ctx.logger.warning(f"Can't serve negative data for {req.brand_name}: {e}")
+        return BrandNegativeDataResponse(
+            success=False,
+            brand_name=req.brand_name,
+            negative_reviews=[],
+            negative_reddit=[],
+            negative_social=[],
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            agent_address=ctx.agent.address
+        )
     except Exception as e:
         error_msg = f"Error processing negative data request for {req.brand_name}: {str(e)}"
         ctx.logger.error(error_msg)
@@ -223,34 +825,58 @@ async def handle_brand_negative_data(ctx: Context, req: BrandNegativeDataRequest
             agent_address=ctx.agent.address
         )
 
+@agent.on_rest_get("/stats/cache", CacheStatsResponse)
+async def handle_cache_stats(ctx: Context) -> CacheStatsResponse:
+    """Report cache hit/miss/eviction counters."""
+    return CacheStatsResponse(
+        caches={
+            **rag.cache_stats(),
+            "llm_response": llm.cache_stats(),
+            "voting_generation": generation_flight.stats(),
+            "knowledge": rag.knowledge_stats(),
+        },
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+
+@agent.on_rest_get("/metrics", MetricsResponse)
+async def handle_metrics(ctx: Context) -> MetricsResponse:
+    """Report stage latency histograms, token usage and cache gauges.
+    
+    REST handlers can only return JSON, so the Prometheus exposition text is
+    wrapped in the `text` field; set METRICS_PORT for a plain-text scrape target.
+    """
+    return MetricsResponse(
+        content_type=METRICS_CONTENT_TYPE,
+        text=REGISTRY.render(),
+        quantiles=REGISTRY.summary(),
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+
 # Include the chat protocol
 agent.include(chat_proto, publish_manifest=True)
 
 if __name__ == '__main__':
-    print("🗳️ Starting Voting Agent...")
-    print(f"✅ Agent address: {agent.address}")
-    print("📡 Ready to create voting questions based on negative feedback from Knowledge Graph")
-    print("🧠 Powered by ASI:One AI reasoning and MeTTa Knowledge Graph")
-    print("\n🌐 REST API Endpoints:")
-    print("POST http://localhost:8080/voting")
-    print("Body: {\"brand_name\": \"iPhone\"}")
-    print("Returns: Single voting question based on negative feedback")
-    print("\nPOST http://localhost:8080/brand/negative-data")
-    print("Body: {\"brand_name\": \"iPhone\"}")
-    print("Returns: Raw negative data (reviews, reddit, social)")
-    print("\n🧪 Test queries:")
-    print("- 'Create voting question for iPhone'")
-    print("- 'Generate voting question for Tesla'")
-    print("- 'What negative data exists for Samsung?'")
-    print("\n📊 Voting Question Generation includes:")
-    print("- Analysis of negative reviews")
-    print("- Analysis of negative Reddit discussions")
-    print("- Analysis of negative social media")
-    print("- AI-generated single actionable voting question")
-    print("\nPress CTRL+C to stop the agent")
+    logger.info("Starting Voting Agent", extra={
+        "address": agent.address,
+        "endpoints": [
+            "POST http://localhost:8080/voting",
+            "POST http://localhost:8080/voting/questions",
+            "POST http://localhost:8080/voting/batch",
+            "POST http://localhost:8080/brand/negative-data",
+            "GET http://localhost:8080/stats/cache",
+            "GET http://localhost:8080/metrics",
+        ],
+    })
+    logger.debug("Example chat queries", extra={
+        "queries": [
+            "Create voting question for iPhone",
+            "Generate voting question for Tesla",
+            "What negative data exists for Samsung?",
+            "3 voting questions for iPhone",
+        ],
+    })
     
     try:
         agent.run()
     except KeyboardInterrupt:
-        print("\n🛑 Shutting down Voting Agent...")
-        print("✅ Agent stopped.")
+        logger.info("Voting Agent stopped")
@@ -0,0 +1,293 @@
+# benchmark.py
+"""Offline benchmark of the voting agent against local fake upstreams (bench/fakes.py).
+
+Each scenario is driven at a fixed concurrency and reports throughput, p50/p95/p99
+latency, upstream calls per request and traced memory per request. No network
+access or API tokens are needed.
+
+    python -m bench.benchmark
+    python -m bench.benchmark --scenarios voting,process_query --requests 500 --concurrency 32
+    python -m bench.benchmark --json baseline.json
+    python -m bench.benchmark --compare baseline.json --tolerance 0.2
+
+By default the agent's handlers are called in-process. With --agent-url the REST
+scenarios are POSTed to a running agent instead; start it with KG_BASE_URL and
+ASI_ONE_BASE_URL pointing at `python -m bench.fakes`.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from .fakes import FakeUpstreams, add_arguments, from_arguments
+
+SCENARIOS = ("process_query", "voting", "voting_template", "voting_questions", "negative_data", "voting_batch")
+
+# Scenario -> (REST path, payload builder) for --agent-url runs; process_query has no REST endpoint
+REST_SCENARIOS = {
+    "voting": ("/voting", lambda brand, args: {"brand_name": brand}),
+    "voting_template": ("/voting", lambda brand, args: {"brand_name": brand, "mode": "template"}),
+    "voting_questions": ("/voting/questions", lambda brand, args: {"brand_name": brand, "count": args.count}),
+    "negative_data": ("/brand/negative-data", lambda brand, args: {"brand_name": brand}),
+    "voting_batch": ("/voting/batch", None),
+}
+
+
+class BenchContext:
+    """The parts of a uagents Context the REST handlers use."""
+
+    def __init__(self, address: str = "agent1qbench"):
+        self.logger = logging.getLogger("bench.handler")
+        self.agent = type("BenchAgent", (), {"address": address})()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(q * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def succeeded(result: Any) -> bool:
+    if isinstance(result, dict):
+        return bool(result.get("success", True))
+    return bool(getattr(result, "success", True))
+
+
+async def drive(call: Callable[[int], Awaitable[Any]], total: int, concurrency: int) -> Dict:
+    """Run call(0..total-1) with `concurrency` requests in flight and collect latencies."""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                ok = succeeded(await call(index))
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def traced_memory(call: Callable[[int], Awaitable[Any]], samples: int, offset: int) -> Dict:
+    """Peak Python heap growth per request, from tracemalloc over sequential requests."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for index in range(samples):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                await call(offset + index)
+            except Exception:
+                pass
+            peaks.append(max(0, tracemalloc.get_traced_memory()[1] - baseline))
+    finally:
+        tracemalloc.stop()
+    if not peaks:
+        return {"mem_mean_kib": 0.0, "mem_max_kib": 0.0}
+    return {"mem_mean_kib": sum(peaks) / len(peaks) / 1024, "mem_max_kib": max(peaks) / 1024}
+
+
+def in_process_scenarios(agent, args, brands: List[str]) -> Dict[str, Callable[[int], Awaitable[Any]]]:
+    from voting.utils import process_query
+
+    ctx = BenchContext()
+
+    def brand(index: int) -> str:
+        return brands[index % len(brands)]
+
+    return {
+        "process_query": lambda i: process_query(
+            f"Create a voting question for {brand(i)}", agent.rag, agent.llm, agent.LOCAL_INTENT, agent.COMBINED_PROMPTS
+        ),
+        "voting": lambda i: agent.handle_voting(ctx, agent.VotingRequest(brand_name=brand(i))),
+        "voting_template": lambda i: agent.handle_voting(ctx, agent.VotingRequest(brand_name=brand(i), mode="template")),
+        "voting_questions": lambda i: agent.handle_voting_questions(
+            ctx, agent.MultipleVotingRequest(brand_name=brand(i), count=args.count)
+        ),
+        "negative_data": lambda i: agent.handle_brand_negative_data(ctx, agent.BrandNegativeDataRequest(brand_name=brand(i))),
+        "voting_batch": lambda i: agent.handle_voting_batch(
+            ctx, agent.BatchVotingRequest(brand_names=[brand(i + j) for j in range(args.batch_size)])
+        ),
+    }
+
+
+def rest_scenarios(session: aiohttp.ClientSession, args, brands: List[str]) -> Dict[str, Callable[[int], Awaitable[Any]]]:
+    base_url = args.agent_url.rstrip("/")
+
+    def make(path: str, payload: Callable[[int], Dict]):
+        async def call(index: int):
+            async with session.post(f"{base_url}{path}", json=payload(index)) as response:
+                response.raise_for_status()
+                return await response.json()
+        return call
+
+    scenarios = {}
+    for name, (path, build) in REST_SCENARIOS.items():
+        if build is None:
+            payload = lambda i: {"brand_names": [brands[(i + j) % len(brands)] for j in range(args.batch_size)]}
+        else:
+            payload = lambda i, build=build: build(brands[i % len(brands)], args)
+        scenarios[name] = make(path, payload)
+    return scenarios
+
+
+def configure_agent_environment(upstream_url: str, args):
+    """Point the agent at the fakes; caches are off unless --cache, so every request does the full work."""
+    os.environ["KG_BASE_URL"] = upstream_url
+    os.environ["ASI_ONE_BASE_URL"] = f"{upstream_url}/v1"
+    os.environ.setdefault("ASI_ONE_API_KEY", "bench")
+    os.environ.setdefault("AGENTVERSE_API_KEY", "bench")
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ["METRICS_PORT"] = "0"
+    if not args.cache:
+        os.environ["LLM_CACHE_BACKEND"] = "none"
+        os.environ["BRAND_CACHE_SIZE"] = "0"
+
+
+def print_report(results: Dict[str, Dict]):
+    # (header, result key, width, value format)
+    columns = [
+        ("req", "requests", 6, "d"), ("err", "errors", 5, "d"), ("rps", "throughput_rps", 9, ".1f"),
+        ("p50 ms", "p50_ms", 9, ".1f"), ("p95 ms", "p95_ms", 9, ".1f"), ("p99 ms", "p99_ms", 9, ".1f"),
+        ("kg/req", "kg_calls_per_request", 7, ".2f"), ("llm/req", "llm_calls_per_request", 8, ".2f"),
+        ("mem KiB", "mem_mean_kib", 9, ".1f"), ("max KiB", "mem_max_kib", 9, ".1f"),
+    ]
+    print(f"{'scenario':<17}" + "".join(f" {title:>{width}}" for title, _, width, _ in columns))
+    for name, result in results.items():
+        print(f"{name:<17}" + "".join(f" {result.get(key, 0):>{width}{spec}}" for _, key, width, spec in columns))
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Describe every scenario whose p95 latency or throughput is worse than baseline by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} ms -> {result['p95_ms']:.1f} ms")
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+async def run(args) -> Dict[str, Dict]:
+    upstreams: FakeUpstreams = from_arguments(args)
+    runner = await upstreams.start()
+    port = runner.addresses[0][1]
+    upstream_url = f"http://127.0.0.1:{port}"
+    session = None
+    agent = None
+    try:
+        if args.agent_url:
+            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120))
+            scenarios = rest_scenarios(session, args, upstreams.brands)
+        else:
+            configure_agent_environment(upstream_url, args)
+            agent = importlib.import_module("agent")
+            await agent.rag.arefresh_brand_catalogue()
+            scenarios = in_process_scenarios(agent, args, upstreams.brands)
+
+        results = {}
+        for name in args.scenarios:
+            if name not in scenarios:
+                print(f"Skipping {name}: not available over REST", file=sys.stderr)
+                continue
+            call = scenarios[name]
+            await drive(call, args.warmup, args.concurrency)
+            calls_before = dict(upstreams.calls)
+            result = await drive(call, args.requests, args.concurrency)
+            result["kg_calls_per_request"] = (upstreams.calls["kg"] - calls_before["kg"]) / args.requests
+            result["llm_calls_per_request"] = (upstreams.calls["llm"] - calls_before["llm"]) / args.requests
+            if args.memory_samples and not args.agent_url:
+                result.update(await traced_memory(call, args.memory_samples, args.requests))
+            results[name] = result
+        return results
+    finally:
+        if session is not None:
+            await session.close()
+        if agent is not None:
+            await agent.rag.close()
+        await runner.cleanup()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline voting agent benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per scenario before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--memory-samples", type=int, default=20, help="sequential requests traced for memory (0 skips)")
+    parser.add_argument("--count", type=int, default=5, help="questions per voting_questions request")
+    parser.add_argument("--batch-size", type=int, default=10, help="brands per voting_batch request")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM and brand summary caches enabled")
+    parser.add_argument("--agent-url", help="POST the REST scenarios to this running agent instead of calling handlers")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results file; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression for --compare")
+    parser.add_argument("--log-level", default="WARNING", help="agent LOG_LEVEL during the run")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    print_report(results)
+    # ru_maxrss is in KiB on Linux
+    print(f"\nprocess max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("json_path", "compare")}, "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# fakes.py
+"""Local stand-ins for the KG orchestrator and the ASI:One completion API.
+
+Both run in one aiohttp app with configurable latency and payload sizes, so
+benchmarks exercise the real HTTP clients without network access or tokens.
+
+    python -m bench.fakes --port 8790 --kg-latency 0.05 --llm-latency 0.4
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from typing import Dict, List
+
+from aiohttp import web
+
+# Phrases combined into synthetic complaints, so theme clustering and template matching see realistic text
+SUBJECTS = [
+    "battery", "customer support", "screen", "warranty claim", "delivery", "refund", "app", "latest update",
+    "price", "charger", "camera", "subscription", "repair", "packaging", "installation", "sound",
+]
+PROBLEMS = [
+    "stopped working after a week", "is way too expensive", "drains overnight", "never answered my ticket",
+    "arrived damaged", "keeps crashing", "took forever", "was rude and unhelpful", "overheats constantly",
+    "is full of bugs", "got refused without explanation", "feels cheap and flimsy", "is confusing to set up",
+]
+ENDINGS = ["", " Really disappointed.", " Never buying again.", " Support was useless.", " Fix this please!"]
+
+DEFAULT_BRANDS = ["iPhone", "Tesla", "Samsung", "Nike", "Sony", "Dell", "Peloton", "Dyson"]
+
+
+class FakeUpstreams:
+    """Configuration and request counters for the fake orchestrator and completion server."""
+
+    def __init__(self, brands: List[str] = None, items_per_source: int = 50, item_chars: int = 160,
+                 kg_latency: float = 0.0, llm_latency: float = 0.0, llm_chunks: int = 8, llm_chunk_latency: float = 0.0,
+                 seed: int = 0):
+        self.brands = list(brands or DEFAULT_BRANDS)
+        self.items_per_source = items_per_source
+        self.item_chars = item_chars
+        self.kg_latency = kg_latency
+        self.llm_latency = llm_latency
+        self.llm_chunks = llm_chunks
+        self.llm_chunk_latency = llm_chunk_latency
+        self.seed = seed
+        self.calls: Dict[str, int] = {"kg": 0, "llm": 0}
+        self._summaries: Dict[str, bytes] = {}
+
+    def complaint(self, rng: random.Random) -> str:
+        text = f"The {rng.choice(SUBJECTS)} {rng.choice(PROBLEMS)}.{rng.choice(ENDINGS)}"
+        while len(text) < self.item_chars:
+            text += f" Also the {rng.choice(SUBJECTS)} {rng.choice(PROBLEMS)}."
+        return text[:self.item_chars]
+
+    def summary(self, brand_name: str) -> bytes:
+        """The encoded /kg/get_brand_summary payload for a brand, generated once per brand."""
+        payload = self._summaries.get(brand_name)
+        if payload is None:
+            rng = random.Random(f"{self.seed}:{brand_name}")
+            summary = {
+                key: [self.complaint(rng) for _ in range(self.items_per_source)]
+                for key in ("negative_reviews", "negative_reddit", "negative_social")
+            }
+            payload = self._summaries[brand_name] = json.dumps({"brand_name": brand_name, "summary": summary}).encode()
+        return payload
+
+    def completion_text(self, prompt: str) -> str:
+        """A plausible answer for each prompt the agent sends."""
+        brand = next((b for b in self.brands if b in prompt), "the brand")
+        if "Classify the intent" in prompt:
+            return json.dumps({"intent": "voting_question_generation", "keyword": brand})
+        count = re.search(r"create (\d+) different voting questions", prompt)
+        if count:
+            return json.dumps([f"Should {brand} fix issue number {i + 1}?" for i in range(int(count.group(1)))])
+        if "Selected Question" in prompt:
+            return (f"Selected Question: Should {brand} improve its battery life?\n"
+                    f"Humanized Answer: Customers keep reporting that the battery drains too fast.")
+        return f"Should {brand} improve its customer support response time?"
+
+    async def handle_brand_summary(self, request: web.Request) -> web.Response:
+        self.calls["kg"] += 1
+        await asyncio.sleep(self.kg_latency)
+        brand_name = request.query.get("brand_name", "")
+        if brand_name not in self.brands:
+            return web.json_response({"brand_name": brand_name, "summary": {}})
+        return web.Response(body=self.summary(brand_name), content_type="application/json")
+
+    async def handle_all_brands(self, request: web.Request) -> web.Response:
+        self.calls["kg"] += 1
+        await asyncio.sleep(self.kg_latency)
+        return web.json_response({"brands": self.brands})
+
+    async def handle_query_brand_data(self, request: web.Request) -> web.Response:
+        self.calls["kg"] += 1
+        await asyncio.sleep(self.kg_latency)
+        rng = random.Random(f"{self.seed}:{request.query_string}")
+        return web.json_response({"results": [self.complaint(rng) for _ in range(self.items_per_source)]})
+
+    async def handle_completion(self, request: web.Request) -> web.StreamResponse:
+        self.calls["llm"] += 1
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        content = self.completion_text(prompt)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        await asyncio.sleep(self.llm_latency)
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "bench", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        size = max(1, -(-len(content) // self.llm_chunks))
+        try:
+            for start in range(0, len(content), size):
+                chunk = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": content[start:start + size]}, "finish_reason": None}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(self.llm_chunk_latency)
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            # The agent closes streams early once it has parsed enough questions
+            pass
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/kg/get_brand_summary", self.handle_brand_summary)
+        app.router.add_get("/kg/get_all_brands", self.handle_all_brands)
+        app.router.add_get("/kg/query_brand_data", self.handle_query_brand_data)
+        app.router.add_post("/v1/chat/completions", self.handle_completion)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        """Serve on host:port (0 picks a free port) and return the runner; the bound port is in runner.addresses."""
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--brands", type=int, default=len(DEFAULT_BRANDS), help="number of known brands")
+    parser.add_argument("--items", type=int, default=50, help="negative items per source per brand")
+    parser.add_argument("--item-chars", type=int, default=160, help="characters per negative item")
+    parser.add_argument("--kg-latency", type=float, default=0.02, help="seconds added to every KG response")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds before a completion starts")
+    parser.add_argument("--llm-chunks", type=int, default=8, help="chunks per streamed completion")
+    parser.add_argument("--llm-chunk-latency", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args: argparse.Namespace) -> FakeUpstreams:
+    brands = DEFAULT_BRANDS[:args.brands] + [f"Brand{i}" for i in range(len(DEFAULT_BRANDS), args.brands)]
+    return FakeUpstreams(
+        brands=brands,
+        items_per_source=args.items,
+        item_chars=args.item_chars,
+        kg_latency=args.kg_latency,
+        llm_latency=args.llm_latency,
+        llm_chunks=args.llm_chunks,
+        llm_chunk_latency=args.llm_chunk_latency,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake KG orchestrator and ASI:One endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    add_arguments(parser)
+    args = parser.parse_args()
+    upstreams = from_arguments(args)
+    print(f"Fake upstreams on http://{args.host}:{args.port}")
+    print(f"  KG_BASE_URL=http://{args.host}:{args.port}")
+    print(f"  ASI_ONE_BASE_URL=http://{args.host}:{args.port}/v1")
+    web.run_app(upstreams.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
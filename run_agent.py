@@ -104,8 +104,9 @@ def main():
     print("   - REST API: http://localhost:8081")
     print("   - Chat Protocol: Available for A2A communication")
     print("\n📡 Available endpoints:")
-    print("   - POST /voting/question")
-    print("   - POST /voting/questions") 
+    print("   - POST /voting")
+    print("   - POST /voting/questions")
+    print("   - POST /voting/batch")
     print("   - POST /brand/negative-data")
     print("\n🧪 Test the agent with:")
     print("   python test_voting_endpoints.py")
@@ -29,6 +29,33 @@ def test_voting_endpoint():
         print(f"❌ Exception: {e}")
 
 
+def test_multiple_questions_endpoint():
+    """Test the multiple voting questions endpoint."""
+    print("\n🧪 Testing multiple voting questions endpoint...")
+    
+    url = "http://localhost:8081/voting/questions"
+    payload = {
+        "brand_name": "iPhone",
+        "count": 3
+    }
+    
+    try:
+        response = requests.post(url, json=payload, timeout=30)
+        print(f"📡 Response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            data = response.json()
+            print(f"✅ Success: {data['success']}")
+            print(f"🏷️ Brand: {data['brand_name']}")
+            for i, question in enumerate(data['voting_questions'], 1):
+                print(f"   {i}. {question}")
+            print(f"📊 Negative Data Summary: {data['negative_data_summary']}")
+        else:
+            print(f"❌ Error: {response.text}")
+    except Exception as e:
+        print(f"❌ Exception: {e}")
+
+
 def test_negative_data_endpoint():
     """Test the negative data endpoint."""
     print("\n🧪 Testing negative data endpoint...")
@@ -90,6 +117,32 @@ def test_different_brands():
         
         time.sleep(1)  # Small delay between requests
 
+def test_batch_voting_endpoint():
+    """Test the batch voting question endpoint."""
+    print("\n🧪 Testing batch voting question endpoint...")
+    
+    url = "http://localhost:8081/voting/batch"
+    payload = {
+        "brand_names": ["iPhone", "Tesla", "Samsung", "Nike", "Apple"]
+    }
+    
+    try:
+        response = requests.post(url, json=payload, timeout=120)
+        print(f"📡 Response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            data = response.json()
+            print(f"✅ Success: {data['success']} ({data['succeeded']} succeeded, {data['failed']} failed)")
+            for result in data['results']:
+                if result['success']:
+                    print(f"   🗳️ {result['brand_name']}: {result['voting_question']}")
+                else:
+                    print(f"   ❌ {result['brand_name']}: {result['error']}")
+        else:
+            print(f"❌ Error: {response.text}")
+    except Exception as e:
+        print(f"❌ Exception: {e}")
+
 if __name__ == "__main__":
     print("🚀 Starting Voting Agent Endpoint Tests")
     print("=" * 50)
@@ -100,8 +153,10 @@ if __name__ == "__main__":
     
     # Run tests
     test_voting_endpoint()
+    test_multiple_questions_endpoint()
     test_negative_data_endpoint()
     test_different_brands()
+    test_batch_voting_endpoint()
     
     print("\n" + "=" * 50)
     print("✅ All tests completed!")
@@ -0,0 +1,47 @@
+# conftest.py
+import asyncio
+import contextlib
+import importlib
+import os
+
+import pytest
+
+from bench.fakes import FakeUpstreams
+
+
+@contextlib.asynccontextmanager
+async def _serve(**kwargs):
+    upstreams = FakeUpstreams(**kwargs)
+    runner = await upstreams.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        yield upstreams, f"http://{host}:{port}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def fake_upstreams():
+    """Factory for the offline KG orchestrator and completion server (bench.fakes).
+
+    Use as `async with fake_upstreams(**options) as (upstreams, base_url):` inside
+    the test's event loop; upstreams.calls counts requests per upstream.
+    """
+    return _serve
+
+
+@pytest.fixture(scope="session")
+def agent_module():
+    """The agent module, imported once with dummy API keys and its upstreams pointing at a closed port."""
+    for name, value in {
+        "ASI_ONE_API_KEY": "test",
+        "AGENTVERSE_API_KEY": "test",
+        "KG_BASE_URL": "http://127.0.0.1:9",
+        "ASI_ONE_BASE_URL": "http://127.0.0.1:9/v1",
+        "LLM_CACHE_BACKEND": "none",
+        "METRICS_PORT": "0",
+    }.items():
+        os.environ.setdefault(name, value)
+    # uagents binds the agent to the current event loop at import; tests drive their own loops with asyncio.run
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    return importlib.import_module("agent")
@@ -0,0 +1,44 @@
+# test_batch.py
+import asyncio
+import time
+
+from hyperon import MeTTa
+
+from voting.utils import LLM, generate_voting_questions_batch
+from voting.votingrag import VotingRAG
+
+
+async def run_batch(fake_upstreams, brand_names, upstream_options=None, **options):
+    async with fake_upstreams(**(upstream_options or {})) as (upstreams, base_url):
+        rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+        llm = LLM(api_key="test", base_url=base_url + "/v1")
+        try:
+            return upstreams, await generate_voting_questions_batch(brand_names, rag, llm, **options)
+        finally:
+            await rag.close()
+
+
+def test_batch_keeps_input_order_and_generates_repeated_brands_once(fake_upstreams):
+    upstreams, results = asyncio.run(run_batch(fake_upstreams, ["Tesla", "Nobody", " tesla", "Nike"]))
+    assert [result["brand_name"] for result in results] == ["Tesla", "Nobody", " tesla", "Nike"]
+    assert [result["success"] for result in results] == [True, False, True, True]
+    assert results[1]["error"] == "No negative feedback data found for Nobody"
+    assert results[0]["voting_question"] == results[2]["voting_question"]
+    assert "Nike" in results[3]["voting_question"]
+    assert results[0]["negative_data_summary"]
+    assert upstreams.calls == {"kg": 3, "llm": 2}
+
+
+def test_template_batch_makes_no_llm_calls(fake_upstreams):
+    upstreams, results = asyncio.run(run_batch(fake_upstreams, ["Tesla", "Nike"], mode="template"))
+    assert all(result["success"] and result["voting_question"] for result in results)
+    assert upstreams.calls["llm"] == 0
+
+
+def test_batch_bounds_concurrent_llm_calls(fake_upstreams):
+    started = time.monotonic()
+    upstreams, results = asyncio.run(run_batch(
+        fake_upstreams, ["Tesla", "Nike", "Sony"], upstream_options={"llm_latency": 0.1}, llm_concurrency=1,
+    ))
+    assert all(result["success"] for result in results)
+    assert time.monotonic() - started >= 0.3
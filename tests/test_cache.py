@@ -0,0 +1,139 @@
+# test_cache.py
+import asyncio
+import threading
+import time
+
+from voting.cache import SQLiteCache, SingleFlight, TTLCache, create_cache
+from voting.utils import LLM
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_serves_stale_then_expires():
+    cache = TTLCache(maxsize=4, ttl=0.02, stale_ttl=0.05)
+    cache.set("key", "value")
+    assert cache.lookup("key") == ("value", False)
+    time.sleep(0.03)
+    assert cache.lookup("key") == ("value", True)
+    assert cache.get("key") is None
+    time.sleep(0.05)
+    assert cache.lookup("key") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_disabled_with_zero_size():
+    cache = TTLCache(maxsize=0)
+    cache.set("key", "value")
+    assert cache.get("key") is None
+
+
+def test_sqlite_cache_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, maxsize=2, ttl=60)
+    cache.set("a", {"answer": [1, 2]})
+    cache.set("b", "two")
+    cache.set("c", "three")
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    cache.close()
+
+    reopened = SQLiteCache(path, maxsize=2, ttl=60)
+    assert reopened.get("b") == "two"
+    assert reopened.pop("c") == "three"
+    assert reopened.get("c") is None
+    assert len(reopened) == 1
+    reopened.close()
+
+
+def test_sqlite_cache_expires_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl=0.01)
+    cache.set("key", "value")
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+    cache.close()
+
+
+def test_create_cache_backends(tmp_path):
+    assert isinstance(create_cache("memory", maxsize=1, ttl=1), TTLCache)
+    assert create_cache("none", maxsize=1, ttl=1) is None
+    sqlite = create_cache("sqlite", maxsize=1, ttl=1, path=str(tmp_path / "c.sqlite3"))
+    assert isinstance(sqlite, SQLiteCache)
+    sqlite.close()
+
+
+class RecordingSQLiteCache(SQLiteCache):
+    """SQLiteCache that records the threads its reads and writes run on."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, key, default=None):
+        self.threads.append(threading.get_ident())
+        return super().get(key, default)
+
+    def set(self, key, value):
+        self.threads.append(threading.get_ident())
+        super().set(key, value)
+
+
+def test_llm_uses_sqlite_cache_off_the_event_loop(tmp_path, fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            cache = RecordingSQLiteCache(str(tmp_path / "llm.sqlite3"))
+            llm = LLM(api_key="test", cache=cache, base_url=base_url + "/v1")
+            first = await llm.acreate_completion("Which brand?")
+            assert await llm.acreate_completion("Which brand?") == first
+            streamed = "".join([delta async for delta in llm.astream_completion("Which phone?")])
+            assert [delta async for delta in llm.astream_completion("Which phone?")] == [streamed]
+            assert upstreams.calls["llm"] == 2
+            assert len(cache.threads) == 6 and threading.get_ident() not in cache.threads
+            cache.close()
+
+    asyncio.run(main())
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flight.do("key", fetch) for _ in range(5)])
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4}
+
+    asyncio.run(main())
+
+
+def test_single_flight_survives_cancelled_waiter():
+    async def main():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "result"
+
+    asyncio.run(main())
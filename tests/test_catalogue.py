@@ -0,0 +1,55 @@
+# test_catalogue.py
+import asyncio
+
+from hyperon import MeTTa
+
+from voting.votingrag import VotingRAG, normalize_brand_name
+
+
+def test_catalogue_resolves_spellings_and_finds_brands_in_text(fake_upstreams):
+    async def main():
+        async with fake_upstreams(brands=["iPhone", "Tesla", "Nike", "Dyson Airwrap"]) as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                assert await rag.arefresh_brand_catalogue() == ["Dyson Airwrap", "Nike", "Tesla", "iPhone"]
+            finally:
+                await rag.close()
+        assert rag.resolve_brand("  IPHONE ") == "iPhone"
+        assert rag.resolve_brand("Samsung") is None
+        assert rag.find_brands_in_text("Is tesla better than Nike's or the dyson  airwrap? Tesla!") == ["Tesla", "Nike", "Dyson Airwrap"]
+
+    asyncio.run(main())
+
+
+def test_unknown_brand_short_circuits_without_a_kg_request(fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                await rag.arefresh_brand_catalogue()
+                assert upstreams.calls["kg"] == 1
+                assert await rag.aget_brand_negative_data("Nobody") == {}
+                assert rag.catalogue_short_circuits == 1
+                assert upstreams.calls["kg"] == 1
+                # Known brands are requested, and cached, under their catalogue spelling
+                negative_data = await rag.aget_brand_negative_data(" tesla ")
+                assert negative_data["negative_reviews"]
+                assert await rag.aget_brand_negative_data("TESLA") is negative_data
+                assert upstreams.calls["kg"] == 2
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
+
+
+def test_refresh_drops_removed_brands_and_their_summaries():
+    rag = VotingRAG(MeTTa(), kg_base_url="http://127.0.0.1:9")
+    rag._apply_catalogue(["Tesla", "Nike"])
+    rag.brand_cache.set(normalize_brand_name("Nike"), {"negative_reviews": ["laces snap"]})
+    rag._apply_catalogue(["Tesla", "NIKE", "Sony"])
+    assert rag.brand_catalogue == {"Tesla", "NIKE", "Sony"}
+    assert rag.resolve_brand("nike") == "NIKE"
+    rag._apply_catalogue(["Tesla"])
+    assert rag.brand_catalogue == {"Tesla"}
+    assert normalize_brand_name("Nike") not in rag.brand_cache
+    assert rag.catalogue_refreshes == 3
@@ -0,0 +1,56 @@
+# test_intent.py
+import asyncio
+
+import pytest
+from hyperon import MeTTa
+
+from voting.utils import LLM, classify_intent_locally, process_query
+from voting.votingrag import VotingRAG
+
+
+@pytest.fixture
+def rag():
+    rag = VotingRAG(MeTTa(), kg_base_url="http://127.0.0.1:9")
+    rag._apply_catalogue(["Tesla", "Nike", "iPhone"])
+    return rag
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Create voting questions for Tesla", ("voting_question_generation", "Tesla")),
+    ("What are the complaints about nike?", ("negative_data_analysis", "Nike")),
+    ("Compare Tesla vs Nike", ("brand_comparison", "Tesla")),
+    ("Hello", ("faq", "Hello")),
+    ("What brands do you support?", ("faq", "What brands do you support?")),
+])
+def test_unambiguous_queries_are_classified_locally(rag, query, expected):
+    assert classify_intent_locally(query, rag) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "Tell me about Tesla",
+    "Generate a poll about Tesla and Nike",
+    "vote on issues for Tesla",
+    "How are you",
+])
+def test_ambiguous_queries_are_left_to_the_llm(rag, query):
+    assert classify_intent_locally(query, rag) is None
+
+
+def test_locally_classified_query_takes_one_llm_round_trip(fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            llm = LLM(api_key="test", base_url=base_url + "/v1")
+            try:
+                await rag.arefresh_brand_catalogue()
+                result = await process_query("Create voting questions for Tesla", rag, llm)
+                assert upstreams.calls["llm"] == 1
+                assert "Tesla" in result["selected_question"] and result["humanized_answer"]
+
+                await process_query("Tell me about Tesla", rag, llm)
+                # Classification goes to the LLM, then the answer
+                assert upstreams.calls["llm"] == 3
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+# test_knowledge.py
+import asyncio
+import json
+
+from hyperon import MeTTa
+
+from voting.faq import FAQIndex
+from voting.knowledge import initialize_knowledge_graph, load_knowledge_snapshot
+from voting.votingrag import VotingRAG
+
+
+def make_rag(metta=None, **kwargs):
+    if metta is None:
+        metta = MeTTa()
+        initialize_knowledge_graph(metta)
+    return VotingRAG(metta, **kwargs)
+
+
+def close(rag):
+    asyncio.run(rag.close())
+
+
+def test_faq_index_replaces_normalized_duplicates():
+    index = FAQIndex()
+    key = index.add("How do I vote?", "Pick an option.")
+    assert index.add("how do i VOTE", "Choose one.") == key
+    assert len(index) == 1
+    assert index.lookup("How do I vote?") == (key, "Choose one.", 1.0)
+
+
+def test_faq_index_similarity_lookup_and_remove():
+    index = FAQIndex(min_score=0.5)
+    key = index.add("How are voting results calculated?", "By counting votes.")
+    index.add("What brands are supported?", "Many.")
+    found = index.lookup("How are the voting results counted?")
+    assert found is not None and found[0] == key and found[2] < 1.0
+    assert index.lookup("weather forecast tomorrow") is None
+    assert index.remove(key) == ("How are voting results calculated?", "By counting votes.")
+    assert index.lookup("How are the voting results counted?") is None
+    assert index.remove(key) is None
+
+
+def test_add_knowledge_deduplicates_subjects():
+    rag = make_rag()
+    rag.add_knowledge("faq", "Can I change my vote?", "Yes, until the poll closes.")
+    rag.add_knowledge("faq", "can i change my vote", "No.")
+    assert rag.query_faq("Can I change my vote?") == "No."
+    assert rag.knowledge_stats()["learned"] == 1 and rag.knowledge_deduplicated == 1
+    # Seed FAQs are kept rather than overwritten
+    seed_question = rag.faq_index.questions()[0]
+    answer = rag.query_faq(seed_question)
+    assert rag.add_knowledge("faq", seed_question, "Something else").startswith("Kept existing")
+    assert rag.query_faq(seed_question) == answer
+    close(rag)
+
+
+def test_learned_knowledge_is_evicted_least_recently_used_first():
+    rag = make_rag(max_learned_knowledge=2)
+    atoms = rag.metta.space().atom_count()
+    rag.add_knowledge("faq", "Is voting anonymous?", "Yes.")
+    rag.add_knowledge("faq", "Can I see past polls?", "Yes, in the archive.")
+    # Using a FAQ makes it recently used, so the other one is evicted
+    assert rag.query_faq("Is voting anonymous?") == "Yes."
+    rag.add_knowledge("faq", "Do polls expire?", "After a week.")
+    assert rag.knowledge_evictions == 1
+    assert rag.query_faq("Can I see past polls?") is None
+    assert rag.query_faq("Is voting anonymous?") == "Yes."
+    assert rag.metta.space().atom_count() == atoms + 2
+    close(rag)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "knowledge.snapshot")
+    rag = make_rag()
+    rag.add_knowledge("faq", "Is voting anonymous?", "Yes.")
+    saved = rag.save_knowledge(path)
+    atoms = rag.metta.space().atom_count()
+    close(rag)
+
+    metta = MeTTa()
+    learned = load_knowledge_snapshot(metta, path)
+    assert learned is not None and len(learned) == 1
+    assert metta.space().atom_count() == atoms == saved
+    restored = make_rag(metta, max_learned_knowledge=1)
+    restored.register_learned_knowledge(learned)
+    assert restored.query_faq("Is voting anonymous?") == "Yes."
+    # Restored atoms are tracked as learned knowledge, so they can still be evicted
+    restored.add_knowledge("faq", "Do polls expire?", "After a week.")
+    assert restored.knowledge_evictions == 1 and restored.query_faq("Is voting anonymous?") is None
+    close(restored)
+
+
+def test_snapshot_with_bad_checksum_or_missing_file_is_ignored(tmp_path):
+    path = tmp_path / "knowledge.snapshot"
+    rag = make_rag()
+    rag.save_knowledge(str(path))
+    close(rag)
+    data = path.read_bytes()
+    path.write_bytes(data[:-1] + bytes([data[-1] ^ 0xFF]))
+
+    metta = MeTTa()
+    assert load_knowledge_snapshot(metta, str(path)) is None
+    assert load_knowledge_snapshot(metta, str(tmp_path / "missing")) is None
+    assert metta.space().atom_count() == 0
+
+
+def test_snapshot_from_older_seed_reseeds_and_keeps_learned_atoms(tmp_path):
+    path = tmp_path / "knowledge.snapshot"
+    rag = make_rag()
+    rag.add_knowledge("faq", "Is voting anonymous?", "Yes.")
+    rag.metta.space().add_atom(rag.metta.parse_single("(stale seed)"))
+    rag.save_knowledge(str(path))
+    atoms = rag.metta.space().atom_count()
+    close(rag)
+    header, payload = path.read_bytes().split(b"\n", 1)
+    header = json.loads(header)
+    header["seed_version"] -= 1
+    path.write_bytes(json.dumps(header).encode("utf-8") + b"\n" + payload)
+
+    metta = MeTTa()
+    learned = load_knowledge_snapshot(metta, str(path))
+    assert len(learned) == 1
+    # The seed atoms come from initialize_knowledge_graph, not the stale snapshot
+    assert metta.space().atom_count() == atoms - 1
+    assert VotingRAG(metta).query_faq("Is voting anonymous?") == "Yes."
@@ -0,0 +1,77 @@
+# test_llm.py
+import asyncio
+
+import pytest
+
+from voting.cache import TTLCache
+from voting.resilience import UpstreamGuard
+from voting.utils import LLM, LLMBackend
+
+
+def backend(name, base_url, **guard_options):
+    return LLMBackend(name, "bench-model", base_url, "test", UpstreamGuard(name, **guard_options))
+
+
+def test_hedge_wins_over_slow_backend(fake_upstreams):
+    async def main():
+        async with fake_upstreams(llm_latency=2.0) as (slow, slow_url), fake_upstreams() as (fast, fast_url):
+            llm = LLM(backends=[backend("slow", slow_url + "/v1"), backend("fast", fast_url + "/v1")],
+                      hedge_delay=0.05, hedge_min_samples=1000)
+            started = asyncio.get_running_loop().time()
+            answer = await llm.acreate_completion("Which brand?", use_cache=False)
+            assert answer
+            assert asyncio.get_running_loop().time() - started < 1.0
+            assert slow.calls["llm"] == 1 and fast.calls["llm"] == 1
+
+    asyncio.run(main())
+
+
+def test_failed_backend_falls_back_to_next(fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            # The first backend is missing the /v1 prefix, so every request is a 404
+            llm = LLM(backends=[backend("broken", base_url), backend("working", base_url + "/v1")],
+                      hedge_delay=10.0, hedge_min_samples=1000)
+            assert await llm.acreate_completion("Which brand?", use_cache=False)
+            assert llm.backends[0].guard.failures == 1 and llm.backends[1].guard.failures == 0
+
+    asyncio.run(main())
+
+
+def test_long_stream_does_not_lower_concurrency_limit(fake_upstreams):
+    async def main():
+        async with fake_upstreams(llm_chunks=8, llm_chunk_latency=0.03) as (upstreams, base_url):
+            streaming = backend("streaming", base_url + "/v1", max_concurrency=8, latency_target=0.1)
+            llm = LLM(backends=[streaming])
+            for _ in range(2):
+                assert "".join([delta async for delta in llm.astream_completion("Which brand?", use_cache=False)])
+            # Each stream lasts about 0.24s, but its first chunk arrives well within the latency target
+            assert streaming.guard.limiter.limit == 8 and streaming.guard.limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_request_params_follow_structured_output_support():
+    schema = {"title": "intent", "type": "object"}
+    none = LLMBackend("plain", "m", "http://127.0.0.1:9/v1", "test")
+    json_object = LLMBackend("json", "m", "http://127.0.0.1:9/v1", "test", structured_output="json_object")
+    json_schema = LLMBackend("schema", "m", "http://127.0.0.1:9/v1", "test", structured_output="json_schema")
+    assert none.request_params({"temperature": 0}, schema) == {"temperature": 0}
+    assert json_object.request_params({}, schema) == {"response_format": {"type": "json_object"}}
+    assert json_schema.request_params({}, schema)["response_format"]["json_schema"] == {"name": "intent", "schema": schema, "strict": True}
+    assert json_schema.request_params({}, None) == {}
+
+
+def test_unusable_json_answer_is_evicted_from_the_cache(fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            llm = LLM(api_key="test", cache=TTLCache(), base_url=base_url + "/v1")
+            intent = await llm.acreate_json("Classify the intent of: Tesla battery", {"type": "object"})
+            assert intent["keyword"] == "Tesla"
+            # A plain-text answer can't be decoded, so it isn't served again from the cache
+            for _ in range(2):
+                with pytest.raises(ValueError):
+                    await llm.acreate_json("Which brand?", {"type": "object"})
+            assert len(llm.cache) == 1 and upstreams.calls["llm"] == 3
+
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+# test_negative_data.py
+import asyncio
+
+from hyperon import MeTTa
+
+from voting.votingrag import NEGATIVE_DATA_KEYS, VotingRAG
+
+
+def test_bulk_queries_are_deduplicated_and_run_concurrently(fake_upstreams):
+    async def main():
+        async with fake_upstreams(items_per_source=3, kg_latency=0.2) as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                started = asyncio.get_running_loop().time()
+                bulk = await rag.aquery_brand_data_bulk([
+                    ("Tesla", "reviews", "negative"), ("Tesla", "reviews", "negative"), ("Nike", "", None),
+                ])
+                assert asyncio.get_running_loop().time() - started < 0.35
+            finally:
+                await rag.close()
+        assert list(bulk) == [("Tesla", "reviews", "negative"), ("Nike", None, None)]
+        assert all(outcome["success"] and len(outcome["results"]) == 3 and outcome["error"] is None for outcome in bulk.values())
+        assert upstreams.calls["kg"] == 2
+
+    asyncio.run(main())
+
+
+def test_negative_data_bulk_reports_failed_sources_per_brand(fake_upstreams):
+    async def main():
+        async with fake_upstreams(items_per_source=3) as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            aget = rag._aget
+
+            async def flaky_aget(path, params=None, parser=None):
+                if params.get("brand_name") == "Nike" and params.get("data_type") == "reddit_threads":
+                    raise ConnectionError("reset by peer")
+                return await aget(path, params, parser)
+
+            rag._aget = flaky_aget
+            try:
+                negative_data = await rag.aquery_negative_data_bulk(["Tesla", "Nike", "Tesla"])
+            finally:
+                await rag.close()
+        assert list(negative_data) == ["Tesla", "Nike"]
+        assert all(len(negative_data["Tesla"][key]) == 3 for key in NEGATIVE_DATA_KEYS)
+        assert negative_data["Tesla"]["errors"] == {}
+        assert negative_data["Nike"]["negative_reddit"] == [] and len(negative_data["Nike"]["negative_reviews"]) == 3
+        assert negative_data["Nike"]["errors"] == {"negative_reddit": "ConnectionError: reset by peer"}
+        assert upstreams.calls["kg"] == 5
+
+    asyncio.run(main())
+
+
+def test_sync_bulk_matches_async_bulk(fake_upstreams):
+    async def main():
+        async with fake_upstreams(items_per_source=3) as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            queries = [("Tesla", "reviews", "negative"), ("Sony", "social_comments", "negative")]
+            try:
+                # The sync client blocks, so it runs in a thread while this loop serves the fakes
+                assert await asyncio.to_thread(rag.query_brand_data_bulk, queries) == await rag.aquery_brand_data_bulk(queries)
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
+
+
+def test_pages_are_sliced_from_one_cached_fetch(fake_upstreams):
+    async def main():
+        async with fake_upstreams(items_per_source=10, kg_latency=0.02) as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                # Concurrent misses share one request; later pages are cache hits
+                first, second = await asyncio.gather(
+                    rag.aget_brand_negative_data_page("Tesla", limit=4),
+                    rag.aget_brand_negative_data_page("Tesla", limit=4, offset=4),
+                )
+                last = await rag.aget_brand_negative_data_page("Tesla", limit=4, offset=8)
+                full = await rag.aget_brand_negative_data_page("Tesla")
+                assert upstreams.calls["kg"] == 1
+            finally:
+                await rag.close()
+
+        for key in NEGATIVE_DATA_KEYS:
+            assert full["totals"][key] == len(full[key]) == 10
+            assert first[key] + second[key] + last[key] == full[key]
+            assert len(last[key]) == 2
+            assert first["totals"] == full["totals"]
+
+    asyncio.run(main())
+
+
+def test_unknown_brand_returns_empty_page(fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                page = await rag.aget_brand_negative_data_page("Nobody", limit=5)
+                assert not any(page.get(key) for key in NEGATIVE_DATA_KEYS)
+                assert not any(page.get("totals", {}).values())
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
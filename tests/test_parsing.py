@@ -0,0 +1,120 @@
+# test_parsing.py
+import json
+
+import pytest
+
+from voting.parsing import (
+    JSONArrayStreamParser,
+    JSONListsStreamParser,
+    loads_lenient,
+    parse_string_list,
+    strip_code_fences,
+)
+
+QUESTIONS = ["Should X fix \"quoted\" bugs?", "Should X [really] {refund} customers?", "Should X add café support?"]
+
+
+def feed_split(parser: JSONArrayStreamParser, text: str, split: int):
+    return parser.feed(text[:split]) + parser.feed(text[split:])
+
+
+@pytest.mark.parametrize("prefix", ["", "```json\n", "Here are the questions:\n"])
+def test_array_stream_parser_at_every_chunk_boundary(prefix):
+    text = prefix + json.dumps(QUESTIONS) + "\n```"
+    for split in range(len(text) + 1):
+        parser = JSONArrayStreamParser()
+        assert feed_split(parser, text, split) == QUESTIONS, split
+        assert parser.finished
+
+
+def test_array_stream_parser_one_char_at_a_time_skips_nested_values():
+    text = json.dumps(["first?", {"nested": ["not a question"]}, ["nor this"], "second?"])
+    parser = JSONArrayStreamParser()
+    found = [question for char in text for question in parser.feed(char)]
+    assert found == ["first?", "second?"]
+
+
+def test_array_stream_parser_returns_completed_elements_of_truncated_array():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('["one?", "two?", "thr') == ["one?", "two?"]
+    assert not parser.finished
+
+
+def test_lists_stream_parser_at_every_byte_boundary():
+    document = {
+        "brand_name": "Café",
+        "summary": {
+            "negative_reviews": ["naïve ☕ review", "second, with \"quotes\""],
+            "negative_reddit": [],
+            "negative_social": ["a", 12.5, "b"],
+        },
+    }
+    payload = json.dumps(document, ensure_ascii=False).encode("utf-8")
+    keys = ("negative_reviews", "negative_reddit", "negative_social")
+    for split in range(len(payload) + 1):
+        parser = JSONListsStreamParser(keys)
+        parser.feed(payload[:split])
+        parser.feed(payload[split:])
+        assert parser.close() == document["summary"], split
+
+
+def test_lists_stream_parser_keeps_one_page_and_counts_totals():
+    payload = json.dumps({"summary": {"negative_reviews": [f"item {i}" for i in range(10)]}})
+    parser = JSONListsStreamParser(("negative_reviews",), offset=3, limit=4)
+    for i in range(0, len(payload), 7):
+        parser.feed(payload[i:i + 7])
+    assert parser.close() == {"negative_reviews": ["item 3", "item 4", "item 5", "item 6"]}
+    assert parser.totals == {"negative_reviews": 10}
+
+
+def test_lists_stream_parser_rejects_truncated_array():
+    parser = JSONListsStreamParser(("negative_reviews",))
+    parser.feed('{"negative_reviews": ["a", "b"')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("```json\nQ?\n```", "Q?"),
+    ("```\nQ?", "Q?"),
+    ("```Should X improve?```", "Should X improve?"),
+    ("Sure:\n```text\nQ?\n```\nThanks", "Q?"),
+    ("  plain  ", "plain"),
+])
+def test_strip_code_fences(text, expected):
+    assert strip_code_fences(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    '{"intent": "faq", "keyword": "x"}',
+    '```json\n{"intent": "faq", "keyword": "x"}\n```',
+    'Result: {"intent": "faq", "keyword": "x"} hope this helps {',
+    "{'intent': 'faq', 'keyword': 'x',}",
+    '{"intent": "faq", "keyword": "x", "note": "cut o',
+])
+def test_loads_lenient_objects(text):
+    result = loads_lenient(text, dict)
+    assert result["intent"] == "faq" and result["keyword"] == "x"
+
+
+@pytest.mark.parametrize("text", [
+    '["a?", "b?"]',
+    'Here you go: ["a?", "b?"] Let me know!',
+    "['a?', 'b?',]",
+    '{"questions": ["a?", "b?"]}',
+    '["a?", "b?", "unfinish',
+])
+def test_loads_lenient_lists(text):
+    assert loads_lenient(text, list) == ["a?", "b?"]
+
+
+@pytest.mark.parametrize("text, expect", [("no json here", dict), ('{"a": 1}', list), ("", None)])
+def test_loads_lenient_raises_when_nothing_recoverable(text, expect):
+    with pytest.raises(ValueError):
+        loads_lenient(text, expect)
+
+
+def test_parse_string_list_accepts_plain_lists():
+    assert parse_string_list('1. Should A?\n2) "Should B?"\n- Should C?\n\nThanks!') == ["Should A?", "Should B?", "Should C?"]
+    assert parse_string_list('["a?", 3, "", "b?"]') == ["a?", "b?"]
+    assert parse_string_list("nothing useful") == []
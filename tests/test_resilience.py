@@ -0,0 +1,252 @@
+# test_resilience.py
+import asyncio
+import time
+
+import pytest
+from hyperon import MeTTa
+
+from bench.benchmark import BenchContext
+from voting.resilience import CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, CircuitBreaker, UpstreamGuard, UpstreamUnavailable
+from voting.utils import LLM, process_query
+from voting.votingrag import VotingRAG
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.opened == 1
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+def test_breaker_ignored_trial_frees_its_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.allow()
+
+
+def test_limiter_sheds_when_queue_is_full():
+    async def main():
+        limiter = AdaptiveLimiter("test", max_limit=1, max_queue=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamUnavailable) as error:
+            await limiter.acquire()
+        assert error.value.reason == "shed"
+        limiter.release(dropped=False, latency=0.01)
+        await waiter
+        assert limiter.in_flight == 1 and limiter.shed == 1
+
+    asyncio.run(main())
+
+
+def test_limiter_sheds_after_queue_timeout():
+    async def main():
+        limiter = AdaptiveLimiter("test", max_limit=1, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(UpstreamUnavailable):
+            await limiter.acquire()
+        assert not limiter._waiters
+
+    asyncio.run(main())
+
+
+def test_limiter_aimd():
+    limiter = AdaptiveLimiter("test", initial_limit=4, max_limit=8, latency_target=1.0)
+    # Fast completions grow the limit only while it is actually in use
+    limiter.in_flight = 1
+    limiter.release(dropped=False, latency=0.1)
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.in_flight = 4
+        limiter.release(dropped=False, latency=0.1)
+    assert 4 < limiter.limit < 6
+    limiter.in_flight += 1
+    limiter.release(dropped=True, latency=None)
+    assert 2 < limiter.limit < 3
+    limiter.in_flight += 1
+    limiter.release(dropped=False, latency=2.0)
+    assert 1 < limiter.limit < 1.5
+    limiter.in_flight += 1
+    limiter.release(dropped=True, latency=None)
+    assert limiter.limit == limiter.min_limit
+
+
+def test_guard_opens_and_rejects():
+    async def main():
+        guard = UpstreamGuard("kg", failure_threshold=2, reset_timeout=60)
+
+        async def fail():
+            raise ConnectionError("down")
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await guard.call(fail)
+        with pytest.raises(UpstreamUnavailable) as error:
+            await guard.call(fail)
+        assert error.value.reason == "open"
+        assert guard.stats()["rejected"] == 1 and guard.stats()["breaker_state"] == 2
+
+    asyncio.run(main())
+
+
+def test_guard_counts_failed_results():
+    async def main():
+        guard = UpstreamGuard("kg", failure_threshold=1)
+
+        async def unavailable():
+            return 503, "busy"
+
+        assert await guard.call(unavailable, failed=lambda result: result[0] >= 500) == (503, "busy")
+        assert guard.breaker.state == OPEN
+
+    asyncio.run(main())
+
+
+def test_guard_timeout_backs_off_but_cancellation_does_not():
+    async def main():
+        guard = UpstreamGuard("llm", timeout=0.01, max_concurrency=8)
+        with pytest.raises(asyncio.TimeoutError):
+            await guard.call(lambda: asyncio.sleep(1))
+        assert guard.limiter.limit == 4
+
+        for _ in range(5):
+            task = asyncio.ensure_future(guard.call(lambda: asyncio.sleep(1)))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        async def stream():
+            async with guard.slot():
+                await asyncio.sleep(1)
+
+        task = asyncio.ensure_future(stream())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert guard.limiter.limit == 4 and guard.limiter.in_flight == 0
+        assert guard.breaker.consecutive_failures == 1
+
+    asyncio.run(main())
+
+
+def open_breaker(guard):
+    for _ in range(guard.breaker.failure_threshold):
+        guard.breaker.record_failure()
+
+
+def test_open_kg_breaker_is_not_reported_as_missing_data(fake_upstreams):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                await rag.arefresh_brand_catalogue()
+                cached = await rag.aget_brand_negative_data("Tesla")
+                open_breaker(rag.guard)
+                assert await rag.aget_brand_negative_data("Tesla") is cached
+                with pytest.raises(UpstreamUnavailable):
+                    await rag.aget_brand_negative_data("Nike")
+                with pytest.raises(UpstreamUnavailable):
+                    await rag.aget_brand_negative_data_page("Nike", limit=5)
+                # A loaded catalogue is kept rather than emptied
+                assert "Tesla" in await rag.arefresh_brand_catalogue()
+                assert upstreams.calls["kg"] == 2
+            finally:
+                await rag.close()
+
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            try:
+                open_breaker(rag.guard)
+                with pytest.raises(UpstreamUnavailable):
+                    await rag.aget_all_brands()
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
+
+
+def test_stale_summary_is_served_while_kg_is_unavailable(fake_upstreams, caplog):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url, cache_ttl=0.01, cache_stale_ttl=60)
+            try:
+                cached = await rag.aget_brand_negative_data("Tesla")
+                await asyncio.sleep(0.02)
+                open_breaker(rag.guard)
+                assert await rag.aget_brand_negative_data("Tesla") is cached
+                # Let the background refresh run into the open breaker
+                await asyncio.sleep(0.01)
+                assert upstreams.calls["kg"] == 1
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
+    assert "Serving stale brand summary" in caplog.text
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+
+def test_chat_answers_without_kg_or_llm_while_kg_is_unavailable(fake_upstreams, caplog):
+    async def main():
+        async with fake_upstreams() as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            llm = LLM(api_key="test", base_url=f"{base_url}/v1")
+            try:
+                await rag.arefresh_brand_catalogue()
+                open_breaker(rag.guard)
+                answer = await process_query("Generate a voting question for Nike", rag, llm)
+                assert "temporarily unavailable" in answer["humanized_answer"]
+                assert upstreams.calls["llm"] == 0
+            finally:
+                await rag.close()
+
+    asyncio.run(main())
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+
+def test_rest_handlers_report_kg_unavailable(agent_module, caplog):
+    ctx = BenchContext()
+
+    async def main():
+        negative_data = await agent_module.handle_brand_negative_data(
+            ctx, agent_module.BrandNegativeDataRequest(brand_name="Tesla", limit=5)
+        )
+        voting = await agent_module.handle_voting(ctx, agent_module.VotingRequest(brand_name="Tesla", mode="template"))
+        questions = await agent_module.handle_voting_questions(
+            ctx, agent_module.MultipleVotingRequest(brand_name="Tesla", mode="template")
+        )
+        return negative_data, voting, questions
+
+    guard = agent_module.rag.guard
+    open_breaker(guard)
+    try:
+        negative_data, voting, questions = asyncio.run(main())
+    finally:
+        guard.breaker.record_success()
+    assert not negative_data.success and not voting.success and not questions.success
+    assert voting.voting_question == agent_module.KG_UNAVAILABLE_MESSAGE
+    assert "kg unavailable (open)" in caplog.text
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
@@ -0,0 +1,141 @@
+# test_scheduler.py
+import asyncio
+
+import pytest
+
+from voting.scheduler import WorkClass, WorkRejected, WorkScheduler
+
+
+async def run_jobs(scheduler, jobs, duration=0.01):
+    """Start (work_class, sender, tag) jobs in order while every slot is busy; returns tags in start order."""
+    started = []
+    gate = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("low", "blocker"):
+            await gate.wait()
+
+    async def job(work_class, sender, tag):
+        try:
+            async with scheduler.slot(work_class, sender):
+                started.append(tag)
+                await asyncio.sleep(duration)
+        except WorkRejected as e:
+            started.append(f"{tag}:{e.reason}")
+
+    blocking = [asyncio.ensure_future(blocker()) for _ in range(scheduler.concurrency)]
+    await asyncio.sleep(0)
+    tasks = [asyncio.ensure_future(job(*spec)) for spec in jobs]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*blocking, *tasks)
+    return started
+
+
+def classes(**overrides):
+    options = {"high": {}, "low": {}}
+    for name, settings in overrides.items():
+        options[name].update(settings)
+    return [WorkClass("high", 0, **options["high"]), WorkClass("low", 1, **options["low"])]
+
+
+def test_higher_priority_work_runs_first():
+    scheduler = WorkScheduler(classes(), concurrency=1)
+    started = asyncio.run(run_jobs(scheduler, [("low", "a", "low1"), ("high", "b", "high1"), ("low", "a", "low2")]))
+    assert started == ["high1", "low1", "low2"]
+
+
+def test_senders_take_turns_within_a_class():
+    scheduler = WorkScheduler(classes(), concurrency=1)
+    jobs = [("high", "alice", "a1"), ("high", "alice", "a2"), ("high", "alice", "a3"), ("high", "bob", "b1"), ("high", "bob", "b2")]
+    assert asyncio.run(run_jobs(scheduler, jobs)) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_max_running_leaves_slots_for_other_classes():
+    async def main():
+        scheduler = WorkScheduler(classes(low={"max_running": 1}), concurrency=2)
+        release = asyncio.Event()
+
+        async def hold(work_class, sender):
+            async with scheduler.slot(work_class, sender):
+                await release.wait()
+
+        low = [asyncio.ensure_future(hold("low", f"batch{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["low"]["running"] == 1 and scheduler.stats()["low"]["queued"] == 2
+        high = asyncio.ensure_future(hold("high", "chat"))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["high"]["running"] == 1
+        release.set()
+        await asyncio.gather(*low, high)
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_sender_concurrency_keeps_a_senders_work_in_order():
+    async def main():
+        scheduler = WorkScheduler(classes(high={"sender_concurrency": 1}), concurrency=4)
+        running = []
+        overlap = []
+
+        async def job(sender):
+            async with scheduler.slot("high", sender):
+                overlap.append(running.count(sender))
+                running.append(sender)
+                await asyncio.sleep(0.01)
+                running.remove(sender)
+
+        await asyncio.gather(*[job("alice") for _ in range(3)], *[job("bob") for _ in range(2)])
+        assert overlap == [0] * 5
+
+    asyncio.run(main())
+
+
+def test_full_queues_reject_work():
+    scheduler = WorkScheduler(classes(high={"max_queue": 2, "max_sender_queue": 1}), concurrency=1)
+    jobs = [("high", "alice", "a1"), ("high", "alice", "a2"), ("high", "bob", "b1"), ("high", "carol", "c1")]
+    assert asyncio.run(run_jobs(scheduler, jobs)) == ["a2:full", "c1:full", "a1", "b1"]
+    assert scheduler.stats()["high"]["rejected"] == 2
+
+
+def test_expired_work_is_dropped():
+    async def main():
+        scheduler = WorkScheduler(classes(high={"deadline": 0.01}), concurrency=1)
+
+        async def slow():
+            async with scheduler.slot("high", "alice"):
+                await asyncio.sleep(0.05)
+
+        async def late():
+            async with scheduler.slot("high", "bob"):
+                pass
+
+        results = await asyncio.gather(slow(), late(), return_exceptions=True)
+        assert isinstance(results[1], WorkRejected) and results[1].reason == "expired"
+        assert scheduler.stats()["high"] == {"running": 0, "queued": 0, "senders": 0, "admitted": 1, "rejected": 0, "expired": 1}
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = WorkScheduler(classes(), concurrency=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("high", "alice"):
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.stats()["high"]["queued"] == 0
+        release.set()
+        await holder
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
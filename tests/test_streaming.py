@@ -0,0 +1,61 @@
+# test_streaming.py
+import asyncio
+
+from hyperon import MeTTa
+
+from voting.utils import LLM, process_query, stream_query_answer
+from voting.votingrag import VotingRAG
+
+QUERY = "Create voting questions for Tesla"
+
+
+class ScriptedLLM(LLM):
+    """LLM whose answer streams are the given chunks."""
+
+    def __init__(self, chunks, **kwargs):
+        super().__init__(**kwargs)
+        self.chunks = chunks
+
+    async def astream_completion(self, prompt, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+
+
+async def stream(rag, llm, query=QUERY):
+    return [chunk async for chunk in stream_query_answer(query, rag, llm)]
+
+
+def test_answer_streams_header_then_deltas(fake_upstreams):
+    async def main():
+        async with fake_upstreams(llm_chunks=16) as (upstreams, base_url):
+            rag = VotingRAG(MeTTa(), kg_base_url=base_url)
+            llm = LLM(api_key="test", base_url=base_url + "/v1")
+            try:
+                await rag.arefresh_brand_catalogue()
+                chunks = await stream(rag, llm)
+                answered = await process_query(QUERY, rag, llm)
+            finally:
+                await rag.close()
+        assert len(chunks) > 1
+        assert chunks[0].startswith(f"**{answered['selected_question']}**\n\n")
+        assert "".join(chunks) == f"**{answered['selected_question']}**\n\n{answered['humanized_answer']}"
+        assert upstreams.calls["llm"] == 2
+
+    asyncio.run(main())
+
+
+def test_marker_split_across_chunks_is_held_back_until_complete():
+    async def main():
+        rag = VotingRAG(MeTTa(), kg_base_url="http://127.0.0.1:9")
+        rag._apply_catalogue(["Tesla"])
+        rag.brand_cache.set("tesla", {"negative_reviews": ["battery drains overnight"]})
+        llm = ScriptedLLM(["Selected Question: Should Tesla fix it?\nHuman", "ized Answer: Yes", ", soon."], api_key="test")
+        try:
+            assert await stream(rag, llm) == ["**Should Tesla fix it?**\n\nYes", ", soon."]
+            # Without the marker the whole response is rendered once it ends
+            llm.chunks = ["Just ", "an answer."]
+            assert await stream(rag, llm) == [f"**{QUERY}**\n\nJust an answer."]
+        finally:
+            await rag.close()
+
+    asyncio.run(main())
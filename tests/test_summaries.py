@@ -0,0 +1,148 @@
+# test_summaries.py
+import asyncio
+import threading
+
+import pytest
+
+import voting.themes
+from voting.condense import FeedbackCondenser, MinHasher, estimate_tokens, shingles
+from voting.templates import (
+    agenerate_template_questions,
+    default_voting_questions,
+    detect_complaint_categories,
+    generate_template_questions,
+)
+from voting.themes import ThemeSummarizer
+from voting.utils import aformat_negative_feedback
+
+BATTERY = [
+    "The battery drains way too fast after the last update",
+    "Battery drains way too fast after the last update, really annoying",
+    "battery drains way too fast after the last update!",
+]
+SUPPORT = [
+    "Customer support never answered my emails about the refund",
+    "Support agents were rude and hung up on me twice",
+]
+SHIPPING = [
+    "My package was delayed for three weeks with no tracking",
+    "Delivery was late again and the courier lost the package",
+]
+
+
+def test_minhash_similarity():
+    hasher = MinHasher()
+    left = hasher.signature(shingles(BATTERY[0]))
+    assert hasher.similarity(left, hasher.signature(shingles(BATTERY[0]))) == 1.0
+    assert hasher.similarity(left, hasher.signature(shingles(SUPPORT[1]))) == 0.0
+    assert hasher.similarity((), ()) == 1.0
+
+
+def test_condenser_merges_near_duplicates():
+    condensed = FeedbackCondenser().condense(BATTERY + SUPPORT)
+    assert condensed[0] == (BATTERY[0], 3)
+    assert sorted(text for text, count in condensed[1:]) == sorted(SUPPORT)
+
+
+def test_condenser_respects_token_budget():
+    items = [f"complaint number {i} about a completely different thing {i * 7}" for i in range(50)]
+    condenser = FeedbackCondenser(token_budget=40)
+    condensed = condenser.condense(items)
+    assert 0 < len(condensed) < 50
+    assert sum(estimate_tokens(text) for text, _ in condensed) <= 40
+    # A single item larger than the budget is cut to about the budget rather than dropped
+    (text, count), = condenser.condense(["word " * 200], token_budget=10)
+    assert text.endswith("...") and estimate_tokens(text) <= 11
+    assert condenser.condense(items, token_budget=0) == []
+
+
+def test_condenser_format_lists_counts_per_source():
+    formatted = FeedbackCondenser().format({"negative_reviews": BATTERY, "negative_social": []})
+    assert formatted.count("\n- ") == 1 and "(x3)" in formatted
+
+
+NEGATIVE_DATA = {"negative_reviews": BATTERY + SHIPPING, "negative_reddit": SUPPORT, "negative_social": SHIPPING}
+
+
+def test_themes_group_items():
+    summary = ThemeSummarizer().summarize(NEGATIVE_DATA)
+    assert summary["total"] == 9
+    assert summary["sources"] == {"reviews": 5, "reddit": 2, "social": 2}
+    assert sum(theme["count"] for theme in summary["themes"]) + summary["other"] == 9
+    battery = next(theme for theme in summary["themes"] if "battery" in theme["keywords"])
+    assert battery["count"] == 3 and battery["sources"] == {"reviews": 3}
+    assert len(battery["exemplars"]) == 1
+    assert ThemeSummarizer().summarize({}) == {"total": 0, "sources": {}, "themes": [], "other": 0}
+
+
+@pytest.mark.parametrize("sample_size", [2000, 25])
+def test_theme_clustering_backends_agree(monkeypatch, sample_size):
+    pytest.importorskip("numpy")
+    data = {"negative_reviews": [f"{text} ({i})" for i in range(20) for text in BATTERY + SUPPORT + SHIPPING]}
+    monkeypatch.setattr(voting.themes, "CLUSTERING_BACKEND", "numpy")
+    with_numpy = ThemeSummarizer(sample_size=sample_size).summarize(data)
+    monkeypatch.setattr(voting.themes, "CLUSTERING_BACKEND", "python")
+    assert ThemeSummarizer(sample_size=sample_size).summarize(data) == with_numpy
+
+
+def test_themes_fitted_on_a_sample_still_count_every_item():
+    data = {"negative_reviews": [f"{text} ({i})" for i in range(50) for text in BATTERY + SUPPORT + SHIPPING]}
+    summary = ThemeSummarizer(sample_size=20).summarize(data)
+    assert summary["total"] == 350
+    assert sum(theme["count"] for theme in summary["themes"]) + summary["other"] == 350
+    battery = next(theme for theme in summary["themes"] if "battery" in theme["keywords"])
+    assert battery["count"] == 150
+
+
+def test_themes_are_memoized_per_negative_data_object():
+    summarizer = ThemeSummarizer()
+    assert summarizer.cached(NEGATIVE_DATA) is None
+    formatted = summarizer.format(NEGATIVE_DATA)
+    assert formatted.startswith("COMPLAINT THEMES (from 9 negative items")
+    assert summarizer.cached(NEGATIVE_DATA) is formatted
+    # An equal but distinct dict (e.g. a refreshed brand summary) is summarized again
+    assert summarizer.cached(dict(NEGATIVE_DATA)) is None
+
+
+def test_async_formatting_runs_uncached_work_in_a_thread():
+    summarizer = ThemeSummarizer()
+    threads = []
+    original = summarizer.format
+
+    def format(negative_data):
+        threads.append(threading.get_ident())
+        return original(negative_data)
+
+    summarizer.format = format
+
+    async def main():
+        first = await aformat_negative_feedback(NEGATIVE_DATA, summarizer)
+        second = await aformat_negative_feedback(NEGATIVE_DATA, summarizer)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+
+
+def test_complaint_categories_are_ranked_by_mentions():
+    categories = detect_complaint_categories(NEGATIVE_DATA)
+    assert categories[0] == ("shipping", 4, "delivery times")
+    # "after the last update" also counts as a software complaint
+    assert [category for category, _, _ in categories] == ["shipping", "performance", "software", "support", "billing"]
+    assert detect_complaint_categories(NEGATIVE_DATA) is categories
+    assert detect_complaint_categories({"negative_reviews": ["SHIPPING took FOREVER"]}) == [("shipping", 1, "delivery times")]
+
+
+def test_template_questions_fill_with_defaults():
+    questions = generate_template_questions("Acme", NEGATIVE_DATA, count=8)
+    assert len(questions) == len(set(questions)) == 8
+    assert "Acme" in questions[0] and "delivery times" in questions[0]
+    assert generate_template_questions("Acme", {}, count=3) == default_voting_questions("Acme")[:3]
+    assert len(generate_template_questions("Acme", {}, count=10)) == 10
+
+
+def test_async_template_questions_match_sync():
+    data = {"negative_reviews": list(BATTERY)}
+    questions = asyncio.run(agenerate_template_questions("Acme", data, count=4))
+    assert questions == generate_template_questions("Acme", data, count=4)
@@ -0,0 +1,280 @@
+# cache.py
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Content-address arbitrary JSON-serializable parts as a sha256 hex digest."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """Bounded in-process cache with LRU eviction and per-entry TTL.
+
+    Entries are fresh for `ttl` seconds, then stale for a further `stale_ttl`
+    seconds (callers may serve them while refreshing), then expired.
+    """
+
+    # Lookups are in-memory, so async callers use it directly on the event loop
+    blocking = False
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """Return (value, is_stale) for a live entry, or None on a miss."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return value, True
+        self.hits += 1
+        return value, False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value for key, or default."""
+        found = self.lookup(key)
+        if found is None or found[1]:
+            return default
+        return found[0]
+
+    def set(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entries if full."""
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for sizing the cache."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+class IdentityMemo:
+    """Bounded LRU memo keyed on the identity of an argument rather than its contents.
+
+    Meant for results derived from large cached values (brand summaries), where
+    hashing the contents on every call would cost nearly as much as the work
+    saved. Entries keep a reference to their argument, so its id can't be
+    reused by another object while the entry lives; callers must not mutate
+    memoized arguments.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[int, Tuple[Any, Any]]" = OrderedDict()
+
+    def get(self, obj: Any, default: Any = None) -> Any:
+        entry = self._data.get(id(obj))
+        if entry is None or entry[0] is not obj:
+            return default
+        self._data.move_to_end(id(obj))
+        return entry[1]
+
+    def set(self, obj: Any, value: Any):
+        if self.maxsize <= 0:
+            return
+        self._data[id(obj)] = (obj, value)
+        self._data.move_to_end(id(obj))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk cache with the same get/set interface as TTLCache.
+
+    Values are stored as JSON. Entries expire after `ttl` seconds and the least
+    recently read entries are evicted once more than `maxsize` are stored.
+    """
+
+    # Every call does disk I/O; async callers run it in a worker thread
+    blocking = True
+
+    def __init__(self, path: str, maxsize: int = 10000, ttl: float = 86400.0):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._size -= 1
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        if self.maxsize <= 0:
+            return
+        now = time.time()
+        encoded = json.dumps(value)
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE cache SET value = ?, created_at = ?, accessed_at = ? WHERE key = ?", (encoded, now, now, key)
+            ).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)", (key, encoded, now, now)
+                )
+                self._size += 1
+            if self._size > self.maxsize:
+                excess = self._size - self.maxsize
+                deleted = self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (excess,)
+                ).rowcount
+                self._size -= deleted
+                self.evictions += deleted
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, default)
+        with self._lock:
+            self._size -= self._conn.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_cache(backend: str, maxsize: int, ttl: float, path: Optional[str] = None):
+    """Build a cache backend by name: "memory", "sqlite", or "none" (returns None)."""
+    backend = (backend or "none").lower()
+    if backend == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend needs a database path")
+        return SQLiteCache(path, maxsize=maxsize, ttl=ttl)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+class SingleFlight:
+    """Collapse concurrent async calls for the same key into one upstream call."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key unless a call for key is already running, and share its result."""
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+
+            def _done(finished, key=key):
+                if self._inflight.get(key) is finished:
+                    del self._inflight[key]
+
+            future.add_done_callback(_done)
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled waiter does not cancel the shared call for the others
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "calls": self.calls, "coalesced": self.coalesced}
@@ -0,0 +1,188 @@
+# condense.py
+import heapq
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from .cache import IdentityMemo
+from .faq import STOPWORDS
+
+# Rough chars-per-token ratio for English text; good enough for budgeting prompts
+CHARS_PER_TOKEN = 4
+
+# (key in negative_data, prompt section header)
+FEEDBACK_SOURCES = (
+    ("negative_reviews", "NEGATIVE REVIEWS"),
+    ("negative_reddit", "NEGATIVE REDDIT DISCUSSIONS"),
+    ("negative_social", "NEGATIVE SOCIAL MEDIA"),
+)
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens at a word boundary, collapsing whitespace."""
+    text = " ".join(text.split())
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip(" ,.;:") + "..."
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word n-grams of the lowercased text (the whole text if it is shorter than size words)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Bottom-k MinHash sketches over shingle sets, deterministic across processes.
+
+    A sketch keeps the num_hashes smallest shingle hashes, so sets with fewer
+    shingles than that are compared exactly and larger ones are estimated.
+    """
+
+    def __init__(self, num_hashes: int = 32):
+        self.num_hashes = num_hashes
+
+    def signature(self, features: Set[str]) -> Tuple[int, ...]:
+        return tuple(heapq.nsmallest(self.num_hashes, {zlib.crc32(feature.encode("utf-8")) for feature in features}))
+
+    def similarity(self, left: Sequence[int], right: Sequence[int]) -> float:
+        """Estimated Jaccard similarity of the shingle sets behind two sketches."""
+        union = heapq.nsmallest(self.num_hashes, set(left) | set(right))
+        if not union:
+            return 1.0
+        both = set(left) & set(right)
+        return sum(1 for h in union if h in both) / len(union)
+
+
+class FeedbackCondenser:
+    """Shrink a list of feedback items to a bounded, representative prompt section.
+
+    Items are truncated to max_item_tokens, near-duplicates (estimated Jaccard
+    similarity of word 3-gram shingles >= similarity) are merged into the
+    earliest one, and the groups are ranked by size and then by how typical their
+    wording is of the whole source. Ranked items are taken until the source's
+    token_budget is spent.
+    """
+
+    def __init__(self, token_budget: int = 300, max_item_tokens: int = 80, similarity: float = 0.5,
+                 num_hashes: int = 32, max_candidates: int = 8, memo_size: int = 128):
+        self.token_budget = token_budget
+        self.max_item_tokens = max_item_tokens
+        self.similarity = similarity
+        self.hasher = MinHasher(num_hashes=num_hashes)
+        self.max_candidates = max_candidates
+        # Cached brand summaries are condensed again on every request, so remember recent results,
+        # keyed on the (never mutated) negative_data dict itself so hits don't hash every item
+        self._memo = IdentityMemo(maxsize=memo_size)
+
+    def _groups(self, items: List[str]) -> List[List[int]]:
+        """Indices of items grouped by near-duplicate, the first index of each group being its leader.
+
+        Candidate leaders are found through an inverted index over the leaders'
+        sketches; only the max_candidates sharing the most hashes with the item
+        are compared, which keeps large, repetitive sources near linear.
+        """
+        postings: Dict[int, List[int]] = {}
+        sketches: Dict[int, Tuple[int, ...]] = {}
+        groups: Dict[int, List[int]] = {}
+        for i, item in enumerate(items):
+            sketch = self.hasher.signature(shingles(item))
+            shared: Dict[int, int] = {}
+            for h in sketch:
+                for j in postings.get(h, ()):
+                    shared[j] = shared.get(j, 0) + 1
+            candidates = heapq.nsmallest(self.max_candidates, shared, key=lambda j: (-shared[j], j))
+            for j in candidates:
+                if self.hasher.similarity(sketch, sketches[j]) >= self.similarity:
+                    groups[j].append(i)
+                    break
+            else:
+                groups[i] = [i]
+                sketches[i] = sketch
+                for h in sketch:
+                    postings.setdefault(h, []).append(i)
+        return list(groups.values())
+
+    def condense(self, items: List[str], token_budget: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Return [(item text, number of near-duplicate mentions)] within the token budget, best first."""
+        budget = self.token_budget if token_budget is None else token_budget
+        texts = [truncate_to_tokens(item, self.max_item_tokens) for item in items if item and item.strip()]
+        if not texts or budget <= 0:
+            return []
+        groups = self._groups(texts)
+
+        # Centrality: average share of the source's items that contain each of this item's content words
+        words = [{w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS} for text in texts]
+        document_frequency: Dict[str, int] = {}
+        for group in groups:
+            for word in words[group[0]]:
+                document_frequency[word] = document_frequency.get(word, 0) + len(group)
+
+        def centrality(index: int) -> float:
+            if not words[index]:
+                return 0.0
+            return sum(document_frequency[w] for w in words[index]) / (len(words[index]) * len(texts))
+
+        ranked = sorted(groups, key=lambda group: (-len(group), -centrality(group[0]), group[0]))
+        selected = []
+        used = 0
+        for group in ranked:
+            text = texts[group[0]]
+            cost = estimate_tokens(text)
+            if used + cost > budget:
+                if selected:
+                    continue
+                text = truncate_to_tokens(text, budget)
+                cost = estimate_tokens(text)
+            selected.append((text, len(group)))
+            used += cost
+        return selected
+
+    def cached(self, negative_data: Dict) -> Optional[str]:
+        """The memoized format() result for this negative_data, without computing it."""
+        return self._memo.get(negative_data)
+
+    def format(self, negative_data: Dict) -> str:
+        """Render every non-empty feedback source as a condensed prompt section."""
+        cached = self._memo.get(negative_data)
+        if cached is not None:
+            return cached
+        sections = []
+        for source, header in FEEDBACK_SOURCES:
+            condensed = self.condense(negative_data.get(source) or [])
+            if condensed:
+                lines = [f"- {text} (x{count})" if count > 1 else f"- {text}" for text, count in condensed]
+                sections.append(f"{header}:\n" + "\n".join(lines))
+        formatted = "\n\n".join(sections)
+        self._memo.set(negative_data, formatted)
+        return formatted
+
+
+DEFAULT_CONDENSER = FeedbackCondenser()
+
+
+def configure_condenser(token_budget: int = 300, max_item_tokens: int = 80, similarity: float = 0.5,
+                        mode: str = "themes", max_themes: int = 8):
+    """Replace the summarizer used by format_negative_feedback.
+
+    "themes" clusters every item into counted complaint themes (voting.themes);
+    "samples" keeps the most representative deduplicated items per source.
+    """
+    global DEFAULT_CONDENSER
+    if mode == "themes":
+        from .themes import ThemeSummarizer
+        DEFAULT_CONDENSER = ThemeSummarizer(max_themes=max_themes, exemplar_tokens=max(1, max_item_tokens // 2))
+    elif mode == "samples":
+        DEFAULT_CONDENSER = FeedbackCondenser(token_budget=token_budget, max_item_tokens=max_item_tokens, similarity=similarity)
+    else:
+        raise ValueError(f"Unknown feedback summary mode: {mode}")
+    return DEFAULT_CONDENSER
@@ -0,0 +1,118 @@
+# faq.py
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from hyperon import AtomKind
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "do", "does", "did", "can", "could", "would", "should",
+    "i", "me", "my", "you", "your", "we", "it", "to", "of", "for", "in", "on", "and", "or",
+    "what", "how", "which", "who", "please", "with", "be", "any", "have", "has",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("How do I...?" -> "how do i ...")."""
+    return " ".join(_WORD_RE.findall(question.lower()))
+
+
+def tokenize(question: str) -> Set[str]:
+    """Content tokens of a question, with stopwords removed and plurals folded."""
+    words = _WORD_RE.findall(question.lower())
+    tokens = {w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+              for w in words if w not in STOPWORDS}
+    # Queries made only of stopwords still need something to match on
+    return tokens or set(words)
+
+
+class FAQIndex:
+    """Inverted-index FAQ store with similarity lookup.
+
+    Entries are keyed on the normalized question, so re-adding a question
+    replaces its answer instead of creating a duplicate.
+    """
+
+    def __init__(self, min_score: float = 0.6):
+        self.min_score = min_score
+        self.entries: Dict[str, Tuple[str, str, Set[str]]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def from_metta(cls, metta, min_score: float = 0.6) -> "FAQIndex":
+        """Build an index from the (faq <question> <answer>) atoms in a MeTTa space."""
+        index = cls(min_score=min_score)
+        results = metta.run('!(match &self (faq $question $answer) ($question $answer))')
+        for pair in (results[0] if results else []):
+            question_atom, answer_atom = pair.get_children()
+            index.add(_atom_text(question_atom), _atom_text(answer_atom))
+        return index
+
+    def add(self, question: str, answer: str) -> str:
+        """Insert or replace an entry and return its normalized key."""
+        key = normalize_question(question)
+        if key in self.entries:
+            self.remove(key)
+        tokens = tokenize(question)
+        self.entries[key] = (question, answer, tokens)
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(key)
+        return key
+
+    def remove(self, key: str) -> Optional[Tuple[str, str]]:
+        """Remove an entry by normalized key and return its (question, answer)."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        question, answer, tokens = entry
+        for token in tokens:
+            keys = self.postings.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[token]
+        return question, answer
+
+    def lookup(self, question: str, min_score: Optional[float] = None) -> Optional[Tuple[str, str, float]]:
+        """Return (key, answer, score) for the most similar entry, or None below min_score.
+
+        Exact normalized matches score 1.0; otherwise the score is the cosine
+        similarity of the content-token sets, computed only over entries that
+        share at least one token with the query.
+        """
+        threshold = self.min_score if min_score is None else min_score
+        key = normalize_question(question)
+        entry = self.entries.get(key)
+        if entry is not None:
+            return key, entry[1], 1.0
+
+        tokens = tokenize(question)
+        overlap: Dict[str, int] = {}
+        for token in tokens:
+            for candidate in self.postings.get(token, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+        best: Optional[Tuple[str, str, float]] = None
+        for candidate, shared in overlap.items():
+            candidate_tokens = self.entries[candidate][2]
+            score = shared / math.sqrt(len(tokens) * len(candidate_tokens))
+            if best is None or score > best[2]:
+                best = (candidate, self.entries[candidate][1], score)
+        if best is None or best[2] < threshold:
+            return None
+        return best
+
+    def questions(self) -> List[str]:
+        return [question for question, _, _ in self.entries.values()]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _atom_text(atom) -> str:
+    """Name of a symbol atom or the Python value of a grounded atom."""
+    if atom.get_metatype() == AtomKind.SYMBOL:
+        return atom.get_name()
+    if atom.get_metatype() == AtomKind.GROUNDED:
+        return str(atom.get_object().value)
+    return str(atom)
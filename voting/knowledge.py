@@ -1,5 +1,18 @@
 # knowledge.py
-from hyperon import MeTTa, E, S, ValueAtom
+import hashlib
+import json
+import os
+import zlib
+from typing import List, Optional
+from hyperon import MeTTa, E, S, V, ValueAtom, AtomKind
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT = "voting-kg-snapshot"
+SNAPSHOT_VERSION = 1
+# Bump when initialize_knowledge_graph changes so old snapshots re-seed instead of restoring stale seed atoms
+SEED_VERSION = 1
 
 def initialize_knowledge_graph(metta: MeTTa):
     """Initialize the MeTTa knowledge graph with voting question data structure."""
@@ -18,3 +31,101 @@ def initialize_knowledge_graph(metta: MeTTa):
     metta.space().add_atom(E(S("faq"), S("What brands do you have negative data for?"), ValueAtom("I can query our knowledge graph to find all available brands with negative feedback data. Would you like me to check?")))
     metta.space().add_atom(E(S("faq"), S("How do I generate voting questions?"), ValueAtom("Just ask me to create voting questions for any brand! I'll analyze negative feedback and generate actionable voting questions.")))
     metta.space().add_atom(E(S("faq"), S("What types of voting questions can you create?"), ValueAtom("I can create yes/no questions and multiple choice questions based on negative reviews, Reddit discussions, and social media comments.")))
+
+def _encode_atom(atom):
+    """Encode an atom as nested JSON lists: ["S", name], ["V", name], ["G", value] or ["E", [...]]."""
+    kind = atom.get_metatype()
+    if kind == AtomKind.SYMBOL:
+        return ["S", atom.get_name()]
+    if kind == AtomKind.VARIABLE:
+        return ["V", atom.get_name()]
+    if kind == AtomKind.EXPR:
+        return ["E", [_encode_atom(child) for child in atom.get_children()]]
+    return ["G", atom.get_object().value]
+
+def _decode_atom(data):
+    tag, value = data
+    if tag == "S":
+        return S(value)
+    if tag == "V":
+        return V(value)
+    if tag == "E":
+        return E(*[_decode_atom(child) for child in value])
+    if tag == "G":
+        return ValueAtom(value)
+    raise ValueError(f"Unknown atom tag: {tag}")
+
+def save_knowledge_snapshot(metta: MeTTa, path: str, learned_atoms: List = ()) -> int:
+    """Write the space to a compressed snapshot file and return the number of atoms saved.
+    
+    learned_atoms (in least-recently-used order) are stored separately from the
+    seed atoms so a later restore can keep tracking them. The file is a one-line
+    JSON header with format, versions and a sha256 of the payload, followed by
+    the zlib-compressed JSON payload. It is written to a temp file and renamed.
+    """
+    learned = [_encode_atom(atom) for atom in learned_atoms]
+    learned_keys = {json.dumps(atom) for atom in learned}
+    seed = []
+    for atom in metta.space().get_atoms():
+        try:
+            encoded = _encode_atom(atom)
+            key = json.dumps(encoded)
+        except (TypeError, ValueError):
+            # Grounded values that aren't JSON-serializable can't be restored anyway
+            continue
+        if key not in learned_keys:
+            seed.append(encoded)
+    
+    payload = zlib.compress(json.dumps({"seed": seed, "learned": learned}, separators=(",", ":")).encode("utf-8"))
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "seed_version": SEED_VERSION,
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "atoms": len(seed) + len(learned),
+        "learned": len(learned),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps(header).encode("utf-8") + b"\n")
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return header["atoms"]
+
+def load_knowledge_snapshot(metta: MeTTa, path: str) -> Optional[List]:
+    """Load a snapshot written by save_knowledge_snapshot into an empty space.
+    
+    Returns the restored learned atoms, or None (leaving the space untouched) if
+    the file is missing, has an unknown format or version, or fails its checksum.
+    When the snapshot was taken with an older SEED_VERSION, the seed atoms are
+    rebuilt with initialize_knowledge_graph and only learned atoms are restored.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            payload = f.read()
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            logger.warning("Ignoring knowledge snapshot: unsupported format", extra={"path": path, "format": header.get("format"), "version": header.get("version")})
+            return None
+        if hashlib.sha256(payload).hexdigest() != header.get("sha256"):
+            logger.warning("Ignoring knowledge snapshot: checksum mismatch", extra={"path": path})
+            return None
+        data = json.loads(zlib.decompress(payload))
+        seed = [_decode_atom(atom) for atom in data["seed"]]
+        learned = [_decode_atom(atom) for atom in data["learned"]]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, zlib.error) as e:
+        logger.warning("Ignoring knowledge snapshot: %s", e, extra={"path": path})
+        return None
+    
+    if header.get("seed_version") != SEED_VERSION:
+        initialize_knowledge_graph(metta)
+        seed = []
+    # hyperon has no bulk insert for grounding spaces (and MeTTa source can't express symbols
+    # containing spaces, like FAQ questions), so every atom is decoded up front and added in one pass
+    add_atom = metta.space().add_atom
+    for atom in seed + learned:
+        add_atom(atom)
+    logger.info("Restored knowledge snapshot", extra={"path": path, "learned": len(learned)})
+    return learned
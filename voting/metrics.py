@@ -0,0 +1,292 @@
+# metrics.py
+import functools
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Latency buckets in seconds, from a cache hit up to a slow LLM completion
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, in the Prometheus layout."""
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> [per-bucket counts, sum, count]
+        self._series: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels) -> int:
+        """Number of observations with exactly these labels."""
+        series = self._series.get(_label_key(labels))
+        return series[2] if series else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate the q-quantile like PromQL's histogram_quantile (linear within a bucket)."""
+        series = self._series.get(_label_key(labels))
+        return self._quantile(series, q) if series else None
+
+    def _quantile(self, series: list, q: float) -> Optional[float]:
+        counts, _, total = series
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i]
+                if upper == math.inf:
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-2]
+
+    def summary(self) -> Dict[str, Dict]:
+        """Count, sum and p50/p95/p99 per label set, keyed by the rendered labels."""
+        return {
+            _format_labels(key) or "total": {
+                "count": series[2],
+                "sum": series[1],
+                "p50": self._quantile(series, 0.5),
+                "p95": self._quantile(series, 0.95),
+                "p99": self._quantile(series, 0.99),
+            }
+            for key, series in self._series.items()
+        }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total_sum, total_count) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {total_count}")
+        return lines
+
+
+# A collector returns (metric name, labels, value) samples, rendered as gauges at scrape time
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, object], float]]]
+
+
+class MetricsRegistry:
+    """Named counters, histograms and scrape-time gauge collectors."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Tuple[str, Collector]] = []
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Counter(name, documentation)
+        return metric
+
+    def histogram(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Histogram(name, documentation, buckets)
+        return metric
+
+    def add_collector(self, documentation: str, collector: Collector):
+        self._collectors.append((documentation, collector))
+
+    def summary(self) -> Dict[str, Dict]:
+        """Histogram quantiles for the JSON metrics endpoint."""
+        return {name: metric.summary() for name, metric in self._metrics.items() if isinstance(metric, Histogram)}
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        gauges: Dict[str, List[str]] = {}
+        docs: Dict[str, str] = {}
+        for documentation, collector in self._collectors:
+            for name, labels, value in collector():
+                docs.setdefault(name, documentation)
+                gauges.setdefault(name, []).append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        for name, samples in gauges.items():
+            lines.append(f"# HELP {name} {docs[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "voting_stage_duration_seconds", "Time spent in each stage of request handling"
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "voting_request_duration_seconds", "End-to-end handling time per REST endpoint or chat message"
+)
+KG_REQUEST_SECONDS = REGISTRY.histogram(
+    "voting_kg_request_duration_seconds", "Knowledge graph HTTP request time, including retries"
+)
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "voting_llm_request_duration_seconds", "Completion time per backend (cache misses only)"
+)
+LLM_ATTEMPTS = REGISTRY.counter(
+    "voting_llm_attempts_total", "Completion requests sent, by backend and reason (primary, hedge or fallback)"
+)
+LLM_WINS = REGISTRY.counter(
+    "voting_llm_wins_total", "Completions answered, by the backend whose response was used"
+)
+SCHEDULER_WAIT_SECONDS = REGISTRY.histogram(
+    "voting_scheduler_wait_seconds", "Time work waited for a scheduler slot, by work class"
+)
+LLM_TOKENS = REGISTRY.counter(
+    "voting_llm_tokens_total", "Tokens reported in completion usage, by prompt/completion"
+)
+LLM_TOKENS_PER_CALL = REGISTRY.histogram(
+    "voting_llm_tokens_per_call", "Total tokens per completion", TOKEN_BUCKETS
+)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels) -> Iterator[None]:
+    """Observe the duration of the block, with outcome="error" if it raises."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, outcome=outcome, **labels)
+
+
+def span(stage: str, **labels):
+    """Time one stage of a request (intent, kg_fetch, generation, parse, ...)."""
+    return timed(STAGE_SECONDS, stage=stage, **labels)
+
+
+def instrumented(histogram: Histogram, **labels):
+    """Decorator that times every call of an async handler into histogram."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with timed(histogram, **labels):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_usage(usage, mode: str = "async"):
+    """Count the tokens of a completion's usage field, if the backend reported one."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    LLM_TOKENS.inc(prompt_tokens, type="prompt", mode=mode)
+    LLM_TOKENS.inc(completion_tokens, type="completion", mode=mode)
+    LLM_TOKENS_PER_CALL.observe(getattr(usage, "total_tokens", None) or prompt_tokens + completion_tokens, mode=mode)
+
+
+def stats_collector(stats_fn: Callable[[], Dict[str, Dict]], prefix: str, label: str) -> Collector:
+    """Expose the numeric fields of {name: stats dict} as <prefix>_<field>{<label>=name} gauges."""
+
+    def collect():
+        for name, stats in stats_fn().items():
+            for field, value in (stats or {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield f"{prefix}_{field}", {label: name}, value
+
+    return collect
+
+
+def cache_stats_collector(stats_fn: Callable[[], Dict[str, Dict]]) -> Collector:
+    """Expose the numeric fields of {cache name: stats dict} as voting_cache_<field>{cache=...} gauges."""
+    return stats_collector(stats_fn, "voting_cache", "cache")
+
+
+def upstream_stats_collector(stats_fn: Callable[[], Dict[str, Dict]]) -> Collector:
+    """Expose UpstreamGuard stats as voting_upstream_<field>{upstream=...} gauges (breaker_state: 0 closed, 1 half-open, 2 open)."""
+    return stats_collector(stats_fn, "voting_upstream", "upstream")
+
+
+def scheduler_stats_collector(stats_fn: Callable[[], Dict[str, Dict]]) -> Collector:
+    """Expose WorkScheduler stats as voting_scheduler_<field>{work_class=...} gauges."""
+    return stats_collector(stats_fn, "voting_scheduler", "work_class")
+
+
+async def start_metrics_server(port: int, registry: MetricsRegistry = REGISTRY, host: str = "0.0.0.0"):
+    """Serve registry.render() as text/plain on http://host:port/metrics and return the aiohttp runner."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,244 @@
+# parsing.py
+import ast
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+
+class JSONArrayStreamParser:
+    """Incrementally extract string elements from a streamed JSON array.
+
+    Text before the opening '[' (code fences, preambles) is ignored. Each call
+    to feed() returns the strings completed by that chunk, so callers can act
+    on the first element before the closing ']' has arrived.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escaped = False
+        self._depth = 0
+        self._current: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing ']' of the top-level array has been seen."""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[str]:
+        completed = []
+        for char in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._depth == 1:
+                    self._current.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        completed.append(json.loads("".join(self._current)))
+                        self._current = []
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._current = ['"']
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finished = True
+        return completed
+
+
+# An opening code fence on a line of its own, with an optional language tag
+_OPENING_FENCE = re.compile(r"^```[\w+-]*[ \t]*(?:\n|$)")
+# A complete fenced block anywhere in the text
+_FENCED_BLOCK = re.compile(r"```[\w+-]*[ \t]*\n(.*?)```", re.DOTALL)
+_CLOSERS = {"[": "]", "{": "}"}
+# A complete "key": scalar member, salvaged from truncated objects
+_MEMBER = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*("(?:[^"\\]|\\.)*"|null|true|false|-?\d+(?:\.\d+)?(?=\s*[,}]))')
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove the Markdown code fence (and language tag) models often wrap answers in.
+
+    A complete fenced block is returned without the text around it.
+    """
+    text = text.strip()
+    block = _FENCED_BLOCK.search(text)
+    if block:
+        return block.group(1).strip()
+    if text.startswith("```"):
+        match = _OPENING_FENCE.match(text)
+        text = text[match.end():] if match else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def _json_values(text: str) -> Iterator[Any]:
+    """Candidate values in text: the whole text, then each JSON value starting at a '[' or '{'."""
+    try:
+        yield json.loads(text)
+        return
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    pos = 0
+    for match in re.finditer(r"[\[{]", text):
+        if match.start() < pos:
+            continue
+        try:
+            value, pos = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        yield value
+    # Python-style literals: single quotes, trailing commas, None/True/False
+    start = min((text.find(char) for char in _CLOSERS if char in text), default=-1)
+    end = text.rfind(_CLOSERS[text[start]]) if start >= 0 else -1
+    if end > start:
+        try:
+            yield ast.literal_eval(text[start:end + 1])
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+
+
+def _coerce(value: Any, expect: Optional[type]) -> Any:
+    if expect is None or isinstance(value, expect):
+        return value
+    # Schema-constrained output wraps arrays in an object, e.g. {"questions": [...]}
+    if expect is list and isinstance(value, dict):
+        return next((item for item in value.values() if isinstance(item, list)), None)
+    return None
+
+
+def loads_lenient(text: str, expect: Optional[type] = None) -> Any:
+    """Decode the JSON value in an LLM response, tolerating formatting drift.
+
+    Code fences, preambles and trailing text around the value are ignored, and
+    Python-style literals are accepted. With expect=list, an object's first
+    array is returned, and the complete strings of a truncated array are
+    salvaged, as are the complete scalar members of a truncated object with
+    expect=dict. Raises ValueError if no value of type expect can be recovered.
+    """
+    text = strip_code_fences(text or "")
+    for value in _json_values(text):
+        value = _coerce(value, expect)
+        if value is not None:
+            return value
+    if expect is list:
+        items = JSONArrayStreamParser().feed(text)
+        if items:
+            return items
+    if expect is dict:
+        members = {json.loads(f'"{key}"'): json.loads(value) for key, value in _MEMBER.findall(text)}
+        if members:
+            return members
+    raise ValueError(f"No JSON {expect.__name__ if expect else 'value'} in response")
+
+
+
+# A bulleted or numbered list item, optionally quoted
+_LIST_ITEM = re.compile(r'^\s*(?:[-*\u2022]|\d+[.)])\s+"?(.+?)"?,?\s*$')
+
+
+def parse_string_list(text: str) -> List[str]:
+    """Non-empty strings from a JSON array in text (see loads_lenient), or else from a bulleted or numbered list."""
+    try:
+        items = loads_lenient(text, list)
+    except ValueError:
+        items = [match.group(1) for match in map(_LIST_ITEM.match, strip_code_fences(text or "").splitlines()) if match]
+    return [item.strip() for item in items if isinstance(item, str) and item.strip()]
+
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class JSONListsStreamParser:
+    """Incrementally collect one page of the arrays stored under given keys of a streamed JSON document.
+
+    Array elements are decoded one at a time with the C JSON decoder and only
+    those at positions [offset, offset + limit) are kept, while totals counts
+    every element. Memory is bounded by the page plus the largest element
+    rather than by the payload. Keys are matched wherever `"key": [` appears
+    outside a string, at any nesting level. Feed bytes (decoded as UTF-8) or
+    str, then call close().
+    """
+
+    def __init__(self, keys: Iterable[str], offset: int = 0, limit: Optional[int] = None):
+        self.keys = tuple(keys)
+        self.offset = max(0, offset)
+        self.limit = limit
+        self.items: Dict[str, List] = {key: [] for key in self.keys}
+        self.totals: Dict[str, int] = {key: 0 for key in self.keys}
+        self._key_re = re.compile(r'"(' + "|".join(re.escape(key) for key in self.keys) + r')"\s*:\s*\[')
+        # Unmatched text kept between chunks, enough for a key split across them
+        self._key_tail = max((len(key) for key in self.keys), default=0) + 16
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._current: Optional[str] = None
+
+    def feed(self, chunk: Union[bytes, str]):
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        self._buffer += chunk
+        self._consume(final=False)
+
+    def close(self) -> Dict[str, List]:
+        """Finish parsing and return {key: page of elements}; raises ValueError if an array was cut off."""
+        self._buffer += self._utf8.decode(b"", final=True)
+        self._consume(final=True)
+        if self._current is not None:
+            raise ValueError(f"Truncated JSON array for {self._current!r}")
+        return self.items
+
+    def _consume(self, final: bool):
+        buffer = self._buffer
+        size = len(buffer)
+        pos = 0
+        while True:
+            if self._current is None:
+                match = self._key_re.search(buffer, pos)
+                if match is None:
+                    pos = max(pos, size - self._key_tail)
+                    break
+                self._current = match.group(1)
+                pos = match.end()
+                continue
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos >= size:
+                break
+            if buffer[pos] == "]":
+                self._current = None
+                pos += 1
+                continue
+            try:
+                value, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise ValueError(f"Invalid JSON array element for {self._current!r}")
+                break
+            # A complete element is always followed by ',' or ']' (maybe after whitespace); anything else, or
+            # the end of the buffer, means a number was cut off between chunks ("12." of "12.5")
+            if not final and (end >= size or buffer[end] not in ",] \t\r\n"):
+                break
+            index = self.totals[self._current]
+            self.totals[self._current] = index + 1
+            if index >= self.offset and (self.limit is None or index < self.offset + self.limit):
+                self.items[self._current].append(value)
+            pos = end
+        self._buffer = buffer[pos:]
@@ -0,0 +1,283 @@
+# resilience.py
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# Numeric breaker states for the voting_upstream_breaker_state gauge
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose breaker is open ("open") or whose limiter shed the call ("shed")."""
+
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"{upstream} unavailable ({reason})")
+        self.upstream = upstream
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after failure_threshold failures in a row and rejects calls for
+    reset_timeout seconds, then lets up to half_open_calls trial calls through:
+    a successful trial closes it, a failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        # Sync callers may record outcomes from worker threads
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go ahead; in half-open state this claims one of the trial slots."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    return False
+                self._trials += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+
+    def record_failure(self) -> bool:
+        """Count a failed call; returns True if this opened the breaker."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                opening = self.state != OPEN
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.opened += opening
+                return opening
+            return False
+
+    def record_ignored(self):
+        """Give back a trial slot for a call that ended without a verdict (cancelled or shed)."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials:
+                self._trials -= 1
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a bounded FIFO queue.
+
+    Each successful call raises the limit by 1/limit (about one per limit
+    calls) while the limit is in use; a failed, timed-out or slower than
+    latency_target call multiplies it by backoff. Calls beyond the limit wait
+    in arrival order; they are shed with UpstreamUnavailable when max_queue
+    calls are already waiting or after queue_timeout seconds.
+    """
+
+    def __init__(self, name: str, initial_limit: Optional[int] = None, min_limit: int = 1, max_limit: int = 10,
+                 backoff: float = 0.5, latency_target: Optional[float] = None, max_queue: int = 100,
+                 queue_timeout: Optional[float] = None):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit or self.max_limit)))
+        self.backoff = backoff
+        self.latency_target = latency_target
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise UpstreamUnavailable(self.name, "shed")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release(dropped=False, latency=None)
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.shed += 1
+            raise UpstreamUnavailable(self.name, "shed") from None
+
+    def release(self, dropped: bool, latency: Optional[float]):
+        """Free a slot, adjusting the limit: dropped for failures and timeouts, latency (seconds) for completed calls."""
+        self.in_flight -= 1
+        if dropped or (latency is not None and self.latency_target and latency > self.latency_target):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif latency is not None and self.in_flight + 1 >= self.limit / 2:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        # Hand freed slots to waiters directly, so new arrivals can't jump the queue
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class UpstreamGuard:
+    """Circuit breaker, adaptive concurrency limit and deadline around calls to one upstream.
+
+    Async calls go through call() or, for streams, slot(); sync calls through
+    run(), which uses the breaker only (their timeouts are set on the HTTP client).
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = None, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, max_concurrency: int = 10, initial_concurrency: Optional[int] = None,
+                 latency_target: Optional[float] = None, max_queue: int = 100, queue_timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.limiter = AdaptiveLimiter(
+            name, initial_limit=initial_concurrency, max_limit=max_concurrency, latency_target=latency_target,
+            max_queue=max_queue, queue_timeout=queue_timeout,
+        )
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise UpstreamUnavailable(self.name, "open")
+        self.calls += 1
+
+    async def _enter(self) -> float:
+        """Admit a call and wait for a concurrency slot; returns the start time."""
+        self._admit()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record_ignored()
+            raise
+        return time.monotonic()
+
+    def _record(self, failed: bool):
+        if failed:
+            self.failures += 1
+            if self.breaker.record_failure():
+                logger.warning("Circuit opened for %s", self.name, extra={
+                    "upstream": self.name, "failures": self.breaker.consecutive_failures,
+                    "reset_timeout": self.breaker.reset_timeout,
+                })
+        else:
+            if self.breaker.state != CLOSED:
+                logger.info("Circuit closed for %s", self.name, extra={"upstream": self.name})
+            self.breaker.record_success()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Callable[[], None]]:
+        """Hold a concurrency slot for the block, counting an exception as a failure.
+
+        The block is given a first_chunk() callback to call when a stream
+        produces its first chunk: the limiter judges streams by that time to
+        first chunk, since a long healthy stream is not a slow upstream. A
+        block that never calls it leaves the limit unchanged on success.
+        A cancelled block (a lost hedge, a client going away) frees its slot
+        without a verdict for the limiter or the breaker; a consumer closing a
+        stream early counts as a success.
+        """
+        start = await self._enter()
+        first: Optional[float] = None
+
+        def first_chunk():
+            nonlocal first
+            if first is None:
+                first = time.monotonic()
+
+        try:
+            yield first_chunk
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            cancelled = isinstance(e, asyncio.CancelledError)
+            self.limiter.release(dropped=False, latency=None if cancelled or first is None else first - start)
+            if cancelled:
+                self.breaker.record_ignored()
+            else:
+                self._record(failed=False)
+            raise
+        except Exception:
+            self.limiter.release(dropped=True, latency=None)
+            self._record(failed=True)
+            raise
+        else:
+            self.limiter.release(dropped=False, latency=None if first is None else first - start)
+            self._record(failed=False)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], failed: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Run fn() within timeout seconds under the breaker and limiter.
+
+        failed(result) marks results that count as failures without raising
+        (e.g. HTTP 5xx after retries); the result is returned either way.
+        Cancelled calls, such as hedges that lost, leave the limit unchanged;
+        timeouts and errors lower it.
+        """
+        start = await self._enter()
+        try:
+            result = await asyncio.wait_for(fn(), self.timeout)
+        except asyncio.CancelledError:
+            self.limiter.release(dropped=False, latency=None)
+            self.breaker.record_ignored()
+            raise
+        except Exception:
+            self.limiter.release(dropped=True, latency=None)
+            self._record(failed=True)
+            raise
+        bad = failed is not None and failed(result)
+        self.limiter.release(dropped=bad, latency=None if bad else time.monotonic() - start)
+        self._record(failed=bad)
+        return result
+
+    def run(self, fn: Callable[[], Any], failed: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Sync variant of call(), without the concurrency limit or deadline."""
+        self._admit()
+        try:
+            result = fn()
+        except Exception:
+            self._record(failed=True)
+            raise
+        self._record(failed=failed is not None and failed(result))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "breaker_state": STATE_CODES[self.breaker.state],
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "opened": self.breaker.opened,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "queued": len(self.limiter._waiters),
+            "shed": self.limiter.shed,
+        }
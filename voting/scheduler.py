@@ -0,0 +1,169 @@
+# scheduler.py
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Iterable, Optional, Tuple
+from .log import get_logger
+from .metrics import SCHEDULER_WAIT_SECONDS
+
+logger = get_logger(__name__)
+
+
+class WorkRejected(Exception):
+    """Raised instead of running work whose class queue is full ("full") or whose deadline passed while queued ("expired")."""
+
+    def __init__(self, work_class: str, reason: str):
+        super().__init__(f"{work_class} work {'queue full' if reason == 'full' else 'expired in queue'}")
+        self.work_class = work_class
+        self.reason = reason
+
+
+class WorkClass:
+    """A priority class of work; classes with lower priority values are served first.
+
+    max_running caps the class's share of the scheduler's slots (None: no cap
+    beyond the scheduler's), sender_concurrency how many jobs of one sender run
+    at once. At most max_queue jobs wait, max_sender_queue per sender, and a job
+    still waiting deadline seconds after it was queued is dropped.
+    """
+
+    def __init__(self, name: str, priority: int, max_running: Optional[int] = None, max_queue: int = 100,
+                 max_sender_queue: Optional[int] = None, sender_concurrency: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        self.name = name
+        self.priority = priority
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self.max_sender_queue = max_sender_queue
+        self.sender_concurrency = sender_concurrency
+        self.deadline = deadline
+
+
+class WorkScheduler:
+    """Priority admission with per-sender fair queuing for request handlers.
+
+    At most concurrency jobs hold a slot at once. A freed slot goes to the
+    highest-priority class with waiting work that has room under its limits;
+    within a class, senders with waiting work take turns, and each sender's
+    jobs run in arrival order. Jobs are refused with WorkRejected when their
+    class or sender queue is full, or once their deadline passes in the queue.
+    """
+
+    def __init__(self, classes: Iterable[WorkClass], concurrency: int = 32):
+        self.concurrency = max(1, concurrency)
+        self.classes: Dict[str, WorkClass] = {
+            work_class.name: work_class for work_class in sorted(classes, key=lambda work_class: work_class.priority)
+        }
+        self.in_flight = 0
+        # Per class: sender -> waiting jobs; the dict order is the senders' turn order
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {name: OrderedDict() for name in self.classes}
+        self._queued = {name: 0 for name in self.classes}
+        self._running = {name: 0 for name in self.classes}
+        self._sender_running: Dict[Tuple[str, str], int] = {}
+        self._counts = {name: {"admitted": 0, "rejected": 0, "expired": 0} for name in self.classes}
+
+    def _has_room(self, work_class: WorkClass, sender: str) -> bool:
+        if work_class.max_running is not None and self._running[work_class.name] >= work_class.max_running:
+            return False
+        running = self._sender_running.get((work_class.name, sender), 0)
+        return work_class.sender_concurrency is None or running < work_class.sender_concurrency
+
+    def _dispatch(self):
+        """Hand free slots to waiting jobs, highest priority class first, senders in turn."""
+        for name, work_class in self.classes.items():
+            queue = self._queues[name]
+            started = True
+            while started and queue:
+                started = False
+                for sender in list(queue):
+                    if self.in_flight >= self.concurrency:
+                        return
+                    if not self._has_room(work_class, sender):
+                        continue
+                    jobs = queue[sender]
+                    waiter = jobs.popleft()
+                    self._queued[name] -= 1
+                    if jobs:
+                        # Served this turn; the sender's next job waits for the other senders
+                        queue.move_to_end(sender)
+                    else:
+                        del queue[sender]
+                    self._start(name, sender)
+                    waiter.set_result(None)
+                    started = True
+
+    def _start(self, name: str, sender: str):
+        self.in_flight += 1
+        self._running[name] += 1
+        self._sender_running[(name, sender)] = self._sender_running.get((name, sender), 0) + 1
+        self._counts[name]["admitted"] += 1
+
+    def _finish(self, name: str, sender: str):
+        self.in_flight -= 1
+        self._running[name] -= 1
+        key = (name, sender)
+        self._sender_running[key] -= 1
+        if not self._sender_running[key]:
+            del self._sender_running[key]
+        self._dispatch()
+
+    def _remove(self, name: str, sender: str, waiter: asyncio.Future):
+        jobs = self._queues[name].get(sender)
+        if jobs is not None and waiter in jobs:
+            jobs.remove(waiter)
+            self._queued[name] -= 1
+            if not jobs:
+                del self._queues[name][sender]
+
+    async def _acquire(self, work_class: WorkClass, sender: str):
+        name = work_class.name
+        jobs = self._queues[name].get(sender)
+        if self._queued[name] >= work_class.max_queue or (
+            work_class.max_sender_queue is not None and jobs is not None and len(jobs) >= work_class.max_sender_queue
+        ):
+            self._counts[name]["rejected"] += 1
+            raise WorkRejected(name, "full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[name].setdefault(sender, deque()).append(waiter)
+        self._queued[name] += 1
+        self._dispatch()
+        if waiter.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), work_class.deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._finish(name, sender)
+            else:
+                waiter.cancel()
+                self._remove(name, sender, waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._counts[name]["expired"] += 1
+            logger.debug("Dropped expired work", extra={"work_class": name, "sender": sender, "deadline": work_class.deadline})
+            raise WorkRejected(name, "expired") from None
+
+    @asynccontextmanager
+    async def slot(self, work_class: str, sender: str) -> AsyncIterator[None]:
+        """Wait for a slot for one job of work_class on behalf of sender, and hold it for the block."""
+        start = time.perf_counter()
+        await self._acquire(self.classes[work_class], sender)
+        SCHEDULER_WAIT_SECONDS.observe(time.perf_counter() - start, work_class=work_class)
+        try:
+            yield
+        finally:
+            self._finish(work_class, sender)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Running, queued and admitted/rejected/expired counts per work class."""
+        return {
+            name: {
+                "running": self._running[name],
+                "queued": self._queued[name],
+                "senders": len(self._queues[name]),
+                **self._counts[name],
+            }
+            for name in self.classes
+        }
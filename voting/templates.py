@@ -0,0 +1,225 @@
+# templates.py
+import asyncio
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+from .cache import IdentityMemo
+from .condense import FEEDBACK_SOURCES
+
+# Complaint categories: ({topic: lexicon regex}, question templates). Templates take {brand} and
+# {topic}, the category's most frequently mentioned topic.
+COMPLAINT_CATEGORIES: Dict[str, Tuple[Dict[str, str], List[str]]] = {
+    "support": (
+        {
+            "response time": r"no response|never (?:answered|replied|responded)|on hold|waited|waiting|slow to respond|ignored",
+            "support staff": r"rude|unhelpful|agents?|representatives?|hung up|clueless",
+            "customer support": r"support|customer service|service desk|call center|tickets?|chat ?bot",
+        },
+        [
+            "Should {brand} improve its {topic} before anything else?",
+            "Should {brand} guarantee a reply to every support request within 24 hours?",
+        ],
+    ),
+    "quality": (
+        {
+            "defects": r"defect\w*|faulty|broke|broken|breaks|stopped working|malfunction\w*|dead on arrival|doa",
+            "poor build quality": r"quality|flimsy|cheap|cheaply made|poorly made|falls apart|fell apart",
+            "screen damage": r"cracked|cracks|scratch\w*|dead pixels?",
+        },
+        [
+            "Should {brand} invest more in quality control to address {topic} complaints?",
+            "Should {brand} replace products affected by {topic} free of charge?",
+        ],
+    ),
+    "warranty": (
+        {
+            "warranty coverage": r"warranty|guarantee|coverage|applecare|void\w*",
+            "repair service": r"repairs?|repaired|replacement|service center",
+        },
+        [
+            "Should {brand} improve its {topic}?",
+            "Should {brand} make warranty claims and repairs faster?",
+        ],
+    ),
+    "pricing": (
+        {
+            "prices": r"price\w*|expensive|overpriced|pricey|costly|rip ?off|not worth|value for money",
+            "fees": r"fees?|subscriptions?|hidden costs?|paywall\w*",
+        },
+        [
+            "Should {brand} lower its {topic} or offer a cheaper option?",
+            "Should {brand} be more transparent about {topic}?",
+        ],
+    ),
+    "shipping": (
+        {
+            "delivery times": r"late|delays?|delayed|slow shipping|took (?:weeks|forever)|backorder\w*|out of stock",
+            "damaged deliveries": r"arrived damaged|damaged|lost (?:in transit|package)|missing package|wrong item",
+            "shipping": r"shipping|shipped|delivery|delivered|courier|tracking|package",
+        },
+        [
+            "Should {brand} prioritize fixing {topic}?",
+            "Should {brand} compensate customers for late or damaged deliveries?",
+        ],
+    ),
+    "billing": (
+        {
+            "refunds": r"refunds?|refunded|money back|chargeback",
+            "billing": r"double charged|overcharged|charged twice|billing|invoice|unauthori[sz]ed charge",
+            "cancellations": r"cancel\w*",
+        },
+        [
+            "Should {brand} simplify {topic}?",
+            "Should {brand} process refunds and cancellations within a guaranteed time?",
+        ],
+    ),
+    "performance": (
+        {
+            "battery life": r"battery|drains?|draining|charg\w*",
+            "heat management": r"overheat\w*|hot|burning up",
+            "speed": r"slow|lag\w*|sluggish|stutter\w*|freez\w*",
+            "stability": r"crash\w*|restarts?|reboots?",
+        },
+        [
+            "Should {brand} make {topic} its top engineering priority?",
+            "Should {brand} publish a plan to improve {topic}?",
+        ],
+    ),
+    "software": (
+        {
+            "software reliability": r"bugs?|buggy|glitch\w*|error messages?|errors?",
+            "updates": r"updates?|firmware|patch\w*",
+            "the app": r"app|login|log in|sync\w*|interface|ui",
+        },
+        [
+            "Should {brand} pause new features until problems with {topic} are fixed?",
+            "Should {brand} test software updates more thoroughly before release?",
+        ],
+    ),
+    "safety": (
+        {
+            "product safety": r"safety|unsafe|dangerous|fire|exploded|injur\w*|recall\w*",
+            "privacy and security": r"privacy|data breach|hacked|security|scam\w*|leak\w*",
+        },
+        [
+            "Should {brand} commission an independent review of {topic}?",
+            "Should {brand} communicate {topic} issues to customers more openly?",
+        ],
+    ),
+    "usability": (
+        {
+            "setup": r"setup|set up|installation|install\w*|instructions|manual",
+            "everyday use": r"confusing|complicated|hard to use|difficult|unintuitive",
+            "the design": r"design|uncomfortable|heavy|noisy|loud|ugly",
+        },
+        [
+            "Should {brand} simplify {topic} based on customer feedback?",
+            "Should {brand} involve customers in testing before launching new products?",
+        ],
+    ),
+}
+
+# All topics in one alternation, so each item is scanned once; the group name identifies the topic.
+# The lexicons are lowercase and items are lowercased before matching, which is much faster than IGNORECASE.
+_TOPICS = [(category, topic) for category, (topics, _) in COMPLAINT_CATEGORIES.items() for topic in topics]
+_TOPIC_RE = re.compile(
+    r"\b(?:"
+    + "|".join(
+        rf"(?P<t{index}>{COMPLAINT_CATEGORIES[category][0][topic]})" for index, (category, topic) in enumerate(_TOPICS)
+    )
+    + r")\b"
+)
+# Keyed on the (cached, never mutated) negative_data dict itself, so hits don't hash every item
+_detected = IdentityMemo(maxsize=256)
+
+
+def detect_complaint_categories(negative_data: Dict) -> List[Tuple[str, int, str]]:
+    """Rank complaint categories by how many negative items mention them.
+
+    Returns (category, item count, most mentioned topic), most common first.
+    Ties go to the category, then the topic, listed first in COMPLAINT_CATEGORIES.
+    """
+    cached = _detected.get(negative_data)
+    if cached is not None:
+        return cached
+    counts: Counter = Counter()
+    topic_counts: Counter = Counter()
+    for source, _ in FEEDBACK_SOURCES:
+        for item in negative_data.get(source) or []:
+            if not item:
+                continue
+            matched = {_TOPICS[int(match.lastgroup[1:])] for match in _TOPIC_RE.finditer(item.lower())}
+            counts.update({category for category, _ in matched})
+            topic_counts.update(matched)
+    ranked = []
+    for category, (topics, _) in COMPLAINT_CATEGORIES.items():
+        if counts[category]:
+            # max() keeps the first of equally mentioned topics
+            top_topic = max(topics, key=lambda topic: topic_counts[(category, topic)])
+            ranked.append((category, counts[category], top_topic))
+    ranked.sort(key=lambda entry: -entry[1])
+    _detected.set(negative_data, ranked)
+    return ranked
+
+
+async def adetect_complaint_categories(negative_data: Dict) -> List[Tuple[str, int, str]]:
+    """Async variant of detect_complaint_categories that scans uncached feedback in a worker thread."""
+    cached = _detected.get(negative_data)
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(detect_complaint_categories, negative_data)
+
+
+def generate_template_questions(brand_name: str, negative_data: Dict, count: int = 5) -> List[str]:
+    """Voting questions from category templates, most frequent complaint categories first.
+
+    Each detected category contributes its first template before any
+    contributes a second; generic questions fill any remaining slots. Fewer
+    than count questions are returned only when count exceeds the detected
+    categories' templates plus the ten generic questions.
+    """
+    categories = detect_complaint_categories(negative_data)
+    questions: List[str] = []
+    for level in range(max((len(templates) for _, templates in COMPLAINT_CATEGORIES.values()), default=0)):
+        for category, _, topic in categories:
+            templates = COMPLAINT_CATEGORIES[category][1]
+            if level < len(templates) and len(questions) < count:
+                questions.append(templates[level].format(brand=brand_name, topic=topic))
+    for question in default_voting_questions(brand_name):
+        if len(questions) >= count:
+            break
+        if question not in questions:
+            questions.append(question)
+    return questions[:count]
+
+
+def generate_template_question(brand_name: str, negative_data: Dict) -> str:
+    """The single question for the most frequent complaint category."""
+    return generate_template_questions(brand_name, negative_data, 1)[0]
+
+
+async def agenerate_template_questions(brand_name: str, negative_data: Dict, count: int = 5) -> List[str]:
+    """Async variant of generate_template_questions that doesn't block the event loop on large feedback."""
+    await adetect_complaint_categories(negative_data)
+    return generate_template_questions(brand_name, negative_data, count)
+
+
+async def agenerate_template_question(brand_name: str, negative_data: Dict) -> str:
+    """Async variant of generate_template_question."""
+    return (await agenerate_template_questions(brand_name, negative_data, 1))[0]
+
+
+def default_voting_questions(brand_name: str) -> List[str]:
+    """Generic questions used when no complaint category is detected."""
+    return [
+        f"Should {brand_name} improve their customer service?",
+        f"Should {brand_name} invest more in product quality?",
+        f"Should {brand_name} provide better product information?",
+        f"Should {brand_name} offer better warranty coverage?",
+        f"Should {brand_name} implement better quality control?",
+        f"Should {brand_name} make returns and refunds easier?",
+        f"Should {brand_name} offer more competitive prices?",
+        f"Should {brand_name} ship orders faster?",
+        f"Should {brand_name} release software updates more carefully?",
+        f"Should {brand_name} ask customers for feedback before launching new products?"
+    ]
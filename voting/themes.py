@@ -0,0 +1,268 @@
+# themes.py
+import math
+import random
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from .cache import IdentityMemo
+from .condense import FEEDBACK_SOURCES, truncate_to_tokens
+from .faq import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # Installed from requirements.txt; without it the pure-Python path gives the same themes, just slower
+    np = None
+
+# Which clustering implementation ThemeSummarizer uses, logged at agent startup
+CLUSTERING_BACKEND = "numpy" if np is not None else "python"
+
+# Rows densified at a time when assigning items to themes (ASSIGN_BLOCK_ROWS x dim float32, 8 MiB at dim 1024)
+ASSIGN_BLOCK_ROWS = 2048
+
+SOURCE_LABELS = {"negative_reviews": "reviews", "negative_reddit": "reddit", "negative_social": "social"}
+
+# Filler common in complaints that would otherwise dominate short items
+THEME_STOPWORDS = {
+    "again", "all", "also", "at", "but", "from", "get", "got", "just", "not", "now", "one", "only", "really",
+    "so", "still", "that", "their", "them", "there", "they", "this", "too", "up", "very", "was", "were", "when",
+    "honestly", "literally", "annoying", "after", "even", "ever", "every", "its", "it's", "i'm", "im",
+}
+
+
+def theme_tokens(text: str) -> set:
+    tokens = tokenize(text)
+    return {token for token in tokens if token not in THEME_STOPWORDS} or tokens
+
+
+def _feature(token: str, dim: int) -> int:
+    return zlib.crc32(token.encode("utf-8")) % dim
+
+
+class ThemeSummarizer:
+    """Cluster every feedback item into complaint themes and render a fixed-size summary.
+
+    Items from all sources are embedded as L2-normalized TF-IDF vectors over
+    hashed unigram features. Themes are fitted on a sample of at most
+    sample_size items: a single leader pass opens a new theme whenever an item's
+    cosine similarity to every existing centroid is below `similarity` (up to
+    max_candidates themes), then a few spherical k-means iterations refine the
+    centroids. Every item is then assigned to its closest centroid, so counts
+    cover all the feedback while the fitting cost stays bounded. The largest
+    max_themes themes are reported with their share, per-source counts, top
+    keywords and the items closest to their centroid as exemplars, so the
+    prompt stays the same size however many items there are.
+    """
+
+    def __init__(self, max_themes: int = 8, exemplars: int = 2, exemplar_tokens: int = 40, keywords: int = 4,
+                 similarity: float = 0.2, dim: int = 1024, iterations: int = 3, sample_size: int = 2000,
+                 memo_size: int = 128):
+        self.max_themes = max_themes
+        self.exemplars = exemplars
+        self.exemplar_tokens = exemplar_tokens
+        self.keywords = keywords
+        self.similarity = similarity
+        self.dim = dim
+        self.iterations = iterations
+        self.max_candidates = max_themes * 4
+        self.sample_size = sample_size
+        # Keyed on the (cached, never mutated) negative_data dict itself, so hits don't hash every item
+        self._memo = IdentityMemo(maxsize=memo_size)
+
+    def _vectors(self, tokens: List[set]) -> List[Dict[int, float]]:
+        """Sparse, L2-normalized TF-IDF vectors (feature index -> weight)."""
+        document_frequency = Counter(token for item in tokens for token in item)
+        n = len(tokens)
+        # Feature and IDF weight once per distinct token rather than once per occurrence
+        weights = {
+            token: (_feature(token, self.dim), math.log((1 + n) / (1 + frequency)) + 1.0)
+            for token, frequency in document_frequency.items()
+        }
+        vectors = []
+        for item in tokens:
+            vector: Dict[int, float] = {}
+            for token in item:
+                index, weight = weights[token]
+                vector[index] = vector.get(index, 0.0) + weight
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            vectors.append({index: weight / norm for index, weight in vector.items()})
+        return vectors
+
+    def _sample(self, n: int) -> List[int]:
+        """Indices of the items the themes are fitted on: all of them, or a seeded random sample_size of them.
+
+        A fixed stride could alias with periodic input (e.g. sources interleaved item by item).
+        """
+        if n <= self.sample_size:
+            return list(range(n))
+        return sorted(random.Random(n).sample(range(n), self.sample_size))
+
+    def _cluster_numpy(self, vectors: List[Dict[int, float]]) -> Tuple[List[int], List[float]]:
+        # Vectors stay sparse (CSR arrays); only the sample and one block of rows at a time are densified
+        n = len(vectors)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(vector) for vector in vectors), dtype=np.int64, count=n), out=indptr[1:])
+        indices = np.fromiter((index for vector in vectors for index in vector), dtype=np.int64, count=indptr[-1])
+        data = np.fromiter((weight for vector in vectors for weight in vector.values()), dtype=np.float32, count=indptr[-1])
+
+        def dense(rows: np.ndarray) -> np.ndarray:
+            starts, counts = indptr[rows], indptr[rows + 1] - indptr[rows]
+            positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+            block = np.zeros((len(rows), self.dim), dtype=np.float32)
+            block[np.repeat(np.arange(len(rows)), counts), indices[positions]] = data[positions]
+            return block
+
+        matrix = dense(np.asarray(self._sample(n)))
+        centroids = np.zeros((self.max_candidates, self.dim), dtype=np.float32)
+        sums = np.zeros_like(centroids)
+        centroids[0] = sums[0] = matrix[0]
+        count = 1
+        for row in matrix[1:]:
+            scores = centroids[:count] @ row
+            best = int(scores.argmax())
+            if scores[best] < self.similarity and count < self.max_candidates:
+                centroids[count] = sums[count] = row
+                count += 1
+            else:
+                sums[best] += row
+                centroids[best] = sums[best] / (np.linalg.norm(sums[best]) or 1.0)
+        centroids = centroids[:count]
+        for _ in range(self.iterations):
+            labels = (matrix @ centroids.T).argmax(axis=1)
+            for theme in range(count):
+                members = matrix[labels == theme]
+                if len(members):
+                    total = members.sum(axis=0)
+                    centroids[theme] = total / (np.linalg.norm(total) or 1.0)
+
+        labels = np.empty(n, dtype=np.int64)
+        best_scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, ASSIGN_BLOCK_ROWS):
+            rows = np.arange(start, min(n, start + ASSIGN_BLOCK_ROWS))
+            scores = dense(rows) @ centroids.T
+            labels[rows] = scores.argmax(axis=1)
+            best_scores[rows] = scores[np.arange(len(rows)), labels[rows]]
+        return labels.tolist(), best_scores.tolist()
+
+    def _cluster_python(self, vectors: List[Dict[int, float]]) -> Tuple[List[int], List[float]]:
+        def dot(sparse: Dict[int, float], dense: Dict[int, float]) -> float:
+            return sum(weight * dense.get(index, 0.0) for index, weight in sparse.items())
+
+        def normalized(total: Dict[int, float]) -> Dict[int, float]:
+            norm = math.sqrt(sum(weight * weight for weight in total.values())) or 1.0
+            return {index: weight / norm for index, weight in total.items()}
+
+        def add(total: Dict[int, float], vector: Dict[int, float]):
+            for index, weight in vector.items():
+                total[index] = total.get(index, 0.0) + weight
+
+        sample = [vectors[i] for i in self._sample(len(vectors))]
+        centroids = [dict(sample[0])]
+        sums = [dict(sample[0])]
+        for vector in sample[1:]:
+            scores = [dot(vector, centroid) for centroid in centroids]
+            best = max(range(len(scores)), key=scores.__getitem__)
+            if scores[best] < self.similarity and len(centroids) < self.max_candidates:
+                centroids.append(dict(vector))
+                sums.append(dict(vector))
+            else:
+                add(sums[best], vector)
+                centroids[best] = normalized(sums[best])
+
+        def assign(vectors: List[Dict[int, float]]) -> Tuple[List[int], List[float]]:
+            labels, best_scores = [], []
+            for vector in vectors:
+                scores = [dot(vector, centroid) for centroid in centroids]
+                best = max(range(len(scores)), key=scores.__getitem__)
+                labels.append(best)
+                best_scores.append(scores[best])
+            return labels, best_scores
+
+        for _ in range(self.iterations):
+            labels, _ = assign(sample)
+            totals: Dict[int, Dict[int, float]] = {}
+            for label, vector in zip(labels, sample):
+                add(totals.setdefault(label, {}), vector)
+            for theme, total in totals.items():
+                centroids[theme] = normalized(total)
+        return assign(vectors)
+
+    def summarize(self, negative_data: Dict) -> Dict:
+        """Return {"total", "sources", "themes": [{keywords, count, sources, exemplars}], "other"}."""
+        items: List[Tuple[str, str]] = [
+            (source, item) for source, _ in FEEDBACK_SOURCES for item in (negative_data.get(source) or []) if item and item.strip()
+        ]
+        item_tokens = [theme_tokens(text) for _, text in items]
+        keep = [i for i, tokens in enumerate(item_tokens) if tokens]
+        items = [items[i] for i in keep]
+        item_tokens = [item_tokens[i] for i in keep]
+        summary = {
+            "total": len(items),
+            "sources": dict(Counter(SOURCE_LABELS[source] for source, _ in items)),
+            "themes": [],
+            "other": 0,
+        }
+        if not items:
+            return summary
+
+        vectors = self._vectors(item_tokens)
+        cluster = self._cluster_numpy if CLUSTERING_BACKEND == "numpy" else self._cluster_python
+        labels, scores = cluster(vectors)
+
+        members: Dict[int, List[int]] = {}
+        for index, label in enumerate(labels):
+            members.setdefault(label, []).append(index)
+        ranked = sorted(members.values(), key=lambda group: (-len(group), group[0]))
+        document_frequency = Counter(token for tokens in item_tokens for token in tokens)
+        for group in ranked[:self.max_themes]:
+            counts = Counter(token for index in group for token in item_tokens[index])
+            # Distinctive keywords: frequent in the theme relative to the whole corpus
+            keywords = sorted(
+                counts, key=lambda t: (-counts[t] * math.log((1 + len(items)) / document_frequency[t] + 1), t)
+            )[:self.keywords]
+            exemplars, seen = [], set()
+            for index in sorted(group, key=lambda i: (-scores[i], i)):
+                # Skip exemplars that only differ from an earlier one in filler words
+                wording = frozenset(item_tokens[index])
+                if wording not in seen:
+                    seen.add(wording)
+                    exemplars.append(truncate_to_tokens(items[index][1], self.exemplar_tokens))
+                if len(exemplars) >= self.exemplars:
+                    break
+            summary["themes"].append({
+                "keywords": keywords,
+                "count": len(group),
+                "sources": dict(Counter(SOURCE_LABELS[items[index][0]] for index in group)),
+                "exemplars": exemplars,
+            })
+        summary["other"] = sum(len(group) for group in ranked[self.max_themes:])
+        return summary
+
+    def cached(self, negative_data: Dict) -> Optional[str]:
+        """The memoized format() result for this negative_data, without computing it."""
+        return self._memo.get(negative_data)
+
+    def format(self, negative_data: Dict) -> str:
+        """Render the theme summary as a prompt section."""
+        cached = self._memo.get(negative_data)
+        if cached is not None:
+            return cached
+        summary = self.summarize(negative_data)
+        formatted = format_theme_summary(summary)
+        self._memo.set(negative_data, formatted)
+        return formatted
+
+
+def format_theme_summary(summary: Dict) -> str:
+    if not summary["total"]:
+        return ""
+    sources = ", ".join(f"{count} {name}" for name, count in summary["sources"].items())
+    lines = [f"COMPLAINT THEMES (from {summary['total']} negative items: {sources}):"]
+    for rank, theme in enumerate(summary["themes"], 1):
+        share = theme["count"] / summary["total"]
+        by_source = ", ".join(f"{name} {count}" for name, count in theme["sources"].items())
+        lines.append(f"{rank}. {', '.join(theme['keywords'])} - {theme['count']} mentions ({share:.0%}; {by_source})")
+        for exemplar in theme["exemplars"]:
+            lines.append(f'   e.g. "{exemplar}"')
+    if summary["other"]:
+        lines.append(f"Other, less common complaints: {summary['other']} mentions")
+    return "\n".join(lines)
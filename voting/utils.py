@@ -1,23 +1,416 @@
-import json
-from typing import Dict, List
-from openai import OpenAI
-from .votingrag import VotingRAG
+import asyncio
+import contextlib
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+from .votingrag import VotingRAG, normalize_brand_name
+from .cache import SingleFlight, make_cache_key
+from .parsing import JSONArrayStreamParser, loads_lenient, parse_string_list, strip_code_fences
+from . import condense
+from .templates import agenerate_template_question, agenerate_template_questions
+from .log import get_logger
+from .metrics import LLM_ATTEMPTS, LLM_REQUEST_SECONDS, LLM_WINS, record_usage, span, timed
+from .resilience import UpstreamGuard, UpstreamUnavailable
+from .scheduler import WorkScheduler
 
-class LLM:
-    def __init__(self, api_key):
+logger = get_logger(__name__)
+
+# "llm" asks the model; "template" fills category templates from the feedback (voting.templates)
+GENERATION_MODES = ("llm", "template")
+
+# Call sites that can be given their own backend order through LLM routes
+LLM_ROUTES = ("intent", "generation", "knowledge", "answer")
+
+# How a backend is asked for JSON: not at all (prompt only), OpenAI JSON mode, or a strict JSON schema
+STRUCTURED_OUTPUT_MODES = ("none", "json_object", "json_schema")
+
+class LLMBackend:
+    """One OpenAI-compatible endpoint and model, guarded as its own upstream."""
+
+    def __init__(self, name: str, model: str, base_url: str, api_key: str, guard: Optional[UpstreamGuard] = None,
+                 structured_output: str = "none"):
+        if structured_output not in STRUCTURED_OUTPUT_MODES:
+            raise ValueError(f"Unknown structured output mode {structured_output!r}, expected one of: {', '.join(STRUCTURED_OUTPUT_MODES)}")
+        self.name = name
+        self.model = model
+        self.structured_output = structured_output
         self.client = OpenAI(
             api_key=api_key,
-            base_url="https://api.asi1.ai/v1"
+            base_url=base_url
         )
-
-    def create_completion(self, prompt):
-        completion = self.client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="asi1-mini"  # ASI:One model name
+        # Async client used by the agent handlers so completions don't block the event loop
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url
         )
-        return completion.choices[0].message.content
+        # Circuit breaker and adaptive concurrency limit around every completion request
+        self.guard = guard or UpstreamGuard(name, max_concurrency=32)
+
+    def request_params(self, params: Dict, schema: Optional[Dict] = None) -> Dict:
+        """params plus the response_format asking this backend for JSON matching schema, if it supports one."""
+        if schema is None or self.structured_output == "none":
+            return params
+        if self.structured_output == "json_object":
+            response_format = {"type": "json_object"}
+        else:
+            response_format = {"type": "json_schema", "json_schema": {"name": schema.get("title", "response"), "schema": schema, "strict": True}}
+        return {**params, "response_format": response_format}
+
+def parse_llm_backends(spec: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Parse "name=model@base_url,..." into (name, model, base_url or None) tuples."""
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, target = entry.partition("=")
+        model, _, base_url = target.partition("@")
+        if not name.strip() or not model.strip():
+            raise ValueError(f"Invalid LLM backend {entry!r}, expected name=model[@base_url]")
+        backends.append((name.strip(), model.strip(), base_url.strip() or None))
+    return backends
+
+def parse_llm_routes(spec: str) -> Dict[str, List[str]]:
+    """Parse "call_site=backend,backend;..." into {call site: backend names in order}."""
+    routes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        site, _, names = entry.partition("=")
+        site = site.strip()
+        if site not in LLM_ROUTES:
+            raise ValueError(f"Unknown LLM route {site!r}, expected one of: {', '.join(LLM_ROUTES)}")
+        routes[site] = [name.strip() for name in names.split(",") if name.strip()]
+    return routes
+
+class LLM:
+    def __init__(self, api_key=None, cache=None, model: str = "asi1-mini", base_url: str = "https://api.asi1.ai/v1",
+                 guard: Optional[UpstreamGuard] = None, backends: Optional[List[LLMBackend]] = None,
+                 routes: Optional[Dict[str, List[str]]] = None, hedge_quantile: float = 0.95, hedge_delay: float = 2.0,
+                 hedge_min_samples: int = 20):
+        # Backends in preference order; without backends, one ASI:One backend from api_key/model/base_url
+        self.backends = backends or [LLMBackend("asi_one", model, base_url, api_key, guard)]
+        self._backends = {backend.name: backend for backend in self.backends}
+        unknown = {name for names in (routes or {}).values() for name in names} - set(self._backends)
+        if unknown:
+            raise ValueError(f"Unknown LLM backends in routes: {', '.join(sorted(unknown))}")
+        # Call site (LLM_ROUTES) -> backend names; call sites without a route use every backend in order
+        self.routes = routes or {}
+        # A request still running after its backend's hedge_quantile latency is duplicated on the next backend;
+        # hedge_delay seconds is used until hedge_min_samples completions were timed (hedge_quantile=0 disables hedging)
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        # Optional response cache (TTLCache or SQLiteCache from voting.cache)
+        self.cache = cache
+
+    def route(self, name: Optional[str] = None) -> List[LLMBackend]:
+        """Backends for a call site, in the order they are tried."""
+        names = self.routes.get(name) if name else None
+        return [self._backends[backend] for backend in names] if names else self.backends
+
+    def _cache_key(self, messages: List[Dict], params: Dict, backends: List[LLMBackend], schema: Optional[Dict] = None) -> str:
+        # Keyed on the preferred model; a fallback's answer stands in for it
+        if schema is None:
+            return make_cache_key(backends[0].model, messages, params)
+        return make_cache_key(backends[0].model, messages, params, schema)
+
+    async def _acache(self, method: str, *args) -> Any:
+        """self.cache.<method>(*args), run in a worker thread for caches that block (SQLiteCache)."""
+        fn = getattr(self.cache, method)
+        if self.cache.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def cache_stats(self) -> Dict:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def upstream_stats(self) -> Dict:
+        """Circuit breaker and concurrency limiter state per completion backend."""
+        return {backend.name: backend.guard.stats() for backend in self.backends}
+
+    def _hedge_after(self, backend: LLMBackend) -> Optional[float]:
+        """Seconds to wait on backend before hedging, or None to never hedge."""
+        if not self.hedge_quantile:
+            return None
+        labels = {"mode": "async", "backend": backend.name, "outcome": "ok"}
+        if LLM_REQUEST_SECONDS.count(**labels) < self.hedge_min_samples:
+            return self.hedge_delay
+        return LLM_REQUEST_SECONDS.quantile(self.hedge_quantile, **labels)
+
+    def create_completion(self, prompt, use_cache: bool = True, route: Optional[str] = None,
+                          response_schema: Optional[Dict] = None, **params):
+        """Complete prompt on the route's backends, moving on to the next one when a backend fails.
+
+        Backends with structured output support are asked for JSON matching
+        response_schema (a JSON schema) when one is given.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        backends = self.route(route)
+        key = self._cache_key(messages, params, backends, response_schema) if self.cache is not None and use_cache else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        for index, backend in enumerate(backends):
+            def _create():
+                with timed(LLM_REQUEST_SECONDS, mode="sync", backend=backend.name):
+                    return backend.client.chat.completions.create(
+                        messages=messages,
+                        model=backend.model,
+                        **backend.request_params(params, response_schema)
+                    )
+            LLM_ATTEMPTS.inc(backend=backend.name, reason="fallback" if index else "primary")
+            try:
+                completion = backend.guard.run(_create)
+                LLM_WINS.inc(backend=backend.name)
+                break
+            except Exception as e:
+                if index == len(backends) - 1:
+                    raise
+                logger.warning("LLM backend %s failed, falling back: %s", backend.name, e, extra={"route": route})
+        record_usage(completion.usage, mode="sync")
+        content = completion.choices[0].message.content
+        if key is not None and content:
+            self.cache.set(key, content)
+        return content
+
+    async def _acreate(self, backend: LLMBackend, messages: List[Dict], params: Dict, schema: Optional[Dict] = None):
+        async def _create():
+            with timed(LLM_REQUEST_SECONDS, mode="async", backend=backend.name):
+                return await backend.async_client.chat.completions.create(
+                    messages=messages,
+                    model=backend.model,
+                    **backend.request_params(params, schema)
+                )
+        return await backend.guard.call(_create)
+
+    async def _acreate_hedged(self, backends: List[LLMBackend], messages: List[Dict], params: Dict, route: Optional[str],
+                              schema: Optional[Dict] = None):
+        """First successful completion from backends.
+        
+        Starts on the first backend and adds the next one whenever every running
+        attempt has failed (fallback) or the latest one has been running past
+        its hedge delay (hedge). The first success wins and the attempts still
+        running are cancelled. Raises the last error if every backend fails.
+        """
+        waiting = list(backends)
+        running: Dict[asyncio.Future, LLMBackend] = {}
+        error: Optional[BaseException] = None
+        reason = "primary"
+        try:
+            while True:
+                delay = None
+                if waiting:
+                    backend = waiting.pop(0)
+                    LLM_ATTEMPTS.inc(backend=backend.name, reason=reason)
+                    running[asyncio.ensure_future(self._acreate(backend, messages, params, schema))] = backend
+                    if waiting:
+                        delay = self._hedge_after(backend)
+                if not running:
+                    raise error
+                done, _ = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    reason = "hedge"
+                    logger.debug("Hedging LLM request", extra={"route": route, "slow": backend.name, "hedge": waiting[0].name, "after": delay})
+                    continue
+                for task in done:
+                    finished = running.pop(task)
+                    if task.exception() is None:
+                        LLM_WINS.inc(backend=finished.name)
+                        return task.result()
+                    error = task.exception()
+                    logger.warning("LLM backend %s failed: %s", finished.name, error, extra={"route": route, "remaining": len(waiting)})
+                reason = "fallback"
+        finally:
+            for task in running:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Finished alongside the winner; retrieve its outcome so asyncio doesn't log it
+                    task.exception()
+
+    async def acreate_completion(self, prompt, use_cache: bool = True, route: Optional[str] = None,
+                                 response_schema: Optional[Dict] = None, **params):
+        """Async variant of create_completion that also hedges slow requests (see _acreate_hedged)."""
+        messages = [{"role": "user", "content": prompt}]
+        backends = self.route(route)
+        key = self._cache_key(messages, params, backends, response_schema) if self.cache is not None and use_cache else None
+        if key is not None:
+            cached = await self._acache("get", key)
+            if cached is not None:
+                return cached
+        completion = await self._acreate_hedged(backends, messages, params, route, response_schema)
+        record_usage(completion.usage, mode="async")
+        content = completion.choices[0].message.content
+        if key is not None and content:
+            await self._acache("set", key, content)
+        return content
+
+    async def acreate_json(self, prompt, schema: Dict, expect: type = dict, use_cache: bool = True,
+                           route: Optional[str] = None, **params) -> Any:
+        """Complete prompt and decode the JSON value of type expect in the answer.
 
-def get_intent_and_keyword(query, llm):
+        Backends with structured output support are constrained to schema;
+        other answers are decoded leniently (voting.parsing.loads_lenient).
+        Raises ValueError, after evicting the cached answer, if nothing usable
+        can be recovered.
+        """
+        response = await self.acreate_completion(prompt, use_cache=use_cache, route=route, response_schema=schema, **params)
+        try:
+            return loads_lenient(response, expect)
+        except ValueError:
+            if self.cache is not None and use_cache:
+                await self._acache("pop", self._cache_key([{"role": "user", "content": prompt}], params, self.route(route), schema))
+            raise
+
+    async def _astream(self, backend: LLMBackend, messages: List[Dict], params: Dict,
+                       schema: Optional[Dict] = None) -> AsyncIterator[str]:
+        # The concurrency slot is held until the stream ends or the consumer closes it; the
+        # limiter only sees the time to first chunk, so long answers don't read as a slow backend
+        async with backend.guard.slot() as first_chunk:
+            start = time.perf_counter()
+            stream = await asyncio.wait_for(backend.async_client.chat.completions.create(
+                messages=messages,
+                model=backend.model,
+                stream=True,
+                **backend.request_params(params, schema)
+            ), backend.guard.timeout)
+            try:
+                async for chunk in stream:
+                    first_chunk()
+                    # Backends that report usage on streams send it on the final chunk
+                    record_usage(getattr(chunk, "usage", None), mode="stream")
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                # Also runs when the consumer stops early, releasing the HTTP stream
+                await stream.close()
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream", backend=backend.name, outcome="ok")
+
+    async def astream_completion(self, prompt, use_cache: bool = True, route: Optional[str] = None,
+                                 response_schema: Optional[Dict] = None, **params) -> AsyncIterator[str]:
+        """Stream a completion as text deltas; a cached response is yielded as one chunk.
+        
+        A backend that fails before its first delta is replaced by the next one;
+        streams are not hedged. Each backend's guard timeout bounds the wait for
+        its stream to start, not the stream itself.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        backends = self.route(route)
+        key = self._cache_key(messages, params, backends, response_schema) if self.cache is not None and use_cache else None
+        if key is not None:
+            cached = await self._acache("get", key)
+            if cached is not None:
+                yield cached
+                return
+        parts = []
+        for index, backend in enumerate(backends):
+            LLM_ATTEMPTS.inc(backend=backend.name, reason="fallback" if index else "primary")
+            try:
+                async for delta in self._astream(backend, messages, params, response_schema):
+                    if not parts:
+                        LLM_WINS.inc(backend=backend.name)
+                    parts.append(delta)
+                    yield delta
+                break
+            except Exception as e:
+                if parts or index == len(backends) - 1:
+                    raise
+                logger.warning("LLM backend %s failed, falling back: %s", backend.name, e, extra={"route": route})
+        if key is not None and parts:
+            await self._acache("set", key, "".join(parts))
+
+# Keyword patterns for classifying intent locally before falling back to the LLM
+INTENT_PATTERNS = {
+    "voting_question_generation": re.compile(r"\b(vot(e|es|ing)|polls?|survey|(create|generate|make|write)\b.*\bquestions?)\b"),
+    "negative_data_analysis": re.compile(r"\b(negative|analy[sz](e|is|ing)|complaints?|feedback|issues|problems|reviews)\b"),
+    "brand_comparison": re.compile(r"\b(compare|comparison|versus|vs\.?)\b"),
+}
+# Intents the LLM classifier may return
+INTENTS = ("voting_question_generation", "negative_data_analysis", "brand_comparison", "faq", "unknown")
+
+# JSON schemas for structured LLM answers (see LLMBackend.request_params)
+INTENT_SCHEMA = {
+    "title": "intent",
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": list(INTENTS)},
+        "keyword": {"type": ["string", "null"]},
+    },
+    "required": ["intent", "keyword"],
+    "additionalProperties": False,
+}
+# Arrays are wrapped in an object, since JSON mode only allows objects at the top level
+QUESTIONS_SCHEMA = {
+    "title": "voting_questions",
+    "type": "object",
+    "properties": {"questions": {"type": "array", "items": {"type": "string"}}},
+    "required": ["questions"],
+    "additionalProperties": False,
+}
+
+FAQ_PATTERN = re.compile(r"^(hi|hello|hey|help)\b|^(how do i|what types|what brands|what can you)\b")
+
+def format_negative_feedback(negative_data: Dict, condenser=None) -> str:
+    """Render negative feedback as a bounded prompt section: complaint themes or representative samples.
+    
+    Uses the summarizer set by condense.configure_condenser unless one is given.
+    """
+    return (condenser or condense.DEFAULT_CONDENSER).format(negative_data)
+
+async def aformat_negative_feedback(negative_data: Dict, condenser=None) -> str:
+    """Async variant of format_negative_feedback that summarizes uncached feedback in a worker thread.
+    
+    Clustering a large brand takes long enough to stall the event loop, so only
+    memoized results are returned inline.
+    """
+    condenser = condenser or condense.DEFAULT_CONDENSER
+    cached = condenser.cached(negative_data)
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(condenser.format, negative_data)
+
+def has_negative_data(negative_data: Dict) -> bool:
+    """True if any negative feedback source has items."""
+    return bool(negative_data) and bool(negative_data.get('negative_reviews') or negative_data.get('negative_reddit') or negative_data.get('negative_social'))
+
+def summarize_negative_data(negative_data: Dict) -> Dict:
+    """Per-source item counts for API responses."""
+    return {
+        "negative_reviews_count": len(negative_data.get('negative_reviews', [])),
+        "negative_reddit_count": len(negative_data.get('negative_reddit', [])),
+        "negative_social_count": len(negative_data.get('negative_social', []))
+    }
+
+# Chat command for several questions at once, e.g. "3 voting questions for Tesla"
+QUESTIONS_COMMAND = re.compile(r"^\s*(?:generate\s+|create\s+|give\s+me\s+)?(\d+)\s+(?:voting\s+)?questions\s+(?:for|about|on)\s+(.+?)\s*[?.!]*$", re.IGNORECASE)
+
+def parse_questions_command(query: str, max_count: int = 10) -> Optional[Tuple[int, str]]:
+    """Parse "<N> voting questions for <brand>" into (count, brand), or None."""
+    match = QUESTIONS_COMMAND.match(query)
+    if not match:
+        return None
+    return max(1, min(int(match.group(1)), max_count)), match.group(2)
+
+def classify_intent_locally(query: str, rag: VotingRAG) -> Optional[Tuple[str, Optional[str]]]:
+    """Classify intent from keyword patterns, the brand catalogue and the FAQ store.
+    
+    Returns (intent, keyword) when the query is unambiguous, or None when the
+    LLM classifier should decide.
+    """
+    text = " ".join(query.lower().split())
+    brands = rag.find_brands_in_text(query)
+    matched = [intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(text)]
+    
+    if "brand_comparison" in matched and brands:
+        return "brand_comparison", brands[0]
+    if len(matched) == 1 and matched[0] != "brand_comparison" and len(brands) == 1:
+        return matched[0], brands[0]
+    if not matched and not brands and (FAQ_PATTERN.search(text) or rag.query_faq(query)):
+        return "faq", query
+    return None
+
+async def get_intent_and_keyword(query, llm):
     """Use ASI:One API to classify intent and extract a keyword."""
     prompt = (
         f"Given the query: '{query}'\n"
@@ -29,35 +422,30 @@ def get_intent_and_keyword(query, llm):
         "  \"keyword\": \"<extracted_keyword>\"\n"
         "}"
     )
-    response = llm.create_completion(prompt)
     try:
-        result = json.loads(response)
-        return result["intent"], result["keyword"]
-    except json.JSONDecodeError:
-        print(f"Error parsing ASI:One response: {response}")
+        result = await llm.acreate_json(prompt, INTENT_SCHEMA, route="intent")
+    except ValueError as e:
+        logger.warning("Error parsing ASI:One intent response: %s", e)
         return "unknown", None
+    intent = result.get("intent")
+    keyword = result.get("keyword")
+    if intent not in INTENTS:
+        logger.warning("Unexpected intent from ASI:One", extra={"intent": intent})
+        intent = "unknown"
+    return intent, keyword if isinstance(keyword, str) and keyword.strip() else None
 
-def generate_voting_question(brand_name: str, negative_data: Dict, llm: LLM) -> str:
-    """Generate a single voting question based on negative feedback data."""
+async def generate_voting_question(brand_name: str, negative_data: Dict, llm: LLM, mode: str = "llm",
+                                   timeout: Optional[float] = None) -> str:
+    """Generate a single voting question based on negative feedback data.
     
-    # Extract negative data
-    negative_reviews = negative_data.get('negative_reviews', [])
-    negative_reddit = negative_data.get('negative_reddit', [])
-    negative_social = negative_data.get('negative_social', [])
+    Falls back to the template question if the LLM fails, returns nothing or
+    takes longer than timeout seconds.
+    """
+    if mode == "template":
+        return await agenerate_template_question(brand_name, negative_data)
     
     # Create comprehensive negative data summary for LLM
-    all_negative_data = []
-    
-    if negative_reviews:
-        all_negative_data.append(f"NEGATIVE REVIEWS:\n{chr(10).join(negative_reviews[:5])}")
-    
-    if negative_reddit:
-        all_negative_data.append(f"NEGATIVE REDDIT DISCUSSIONS:\n{chr(10).join(negative_reddit[:5])}")
-    
-    if negative_social:
-        all_negative_data.append(f"NEGATIVE SOCIAL MEDIA:\n{chr(10).join(negative_social[:5])}")
-    
-    comprehensive_negative_data = "\n\n".join(all_negative_data)
+    comprehensive_negative_data = await aformat_negative_feedback(negative_data)
     
     # Create the voting question generation prompt
     prompt = f"""
@@ -87,44 +475,30 @@ CRITICAL: Return ONLY the voting question. No explanations, no additional text,
 """
     
     try:
-        response = llm.create_completion(prompt)
-        print(f"Raw LLM response: {response[:200]}...")
-        
+        response = await asyncio.wait_for(llm.acreate_completion(prompt, route="generation"), timeout)
         # Clean the response - remove any markdown formatting
-        cleaned_response = response.strip()
-        if cleaned_response.startswith("```"):
-            cleaned_response = cleaned_response[3:]
-        if cleaned_response.endswith("```"):
-            cleaned_response = cleaned_response[:-3]
-        cleaned_response = cleaned_response.strip()
+        cleaned_response = strip_code_fences(response or "")
         
-        print(f"Generated voting question: {cleaned_response}")
-        return cleaned_response
+        if cleaned_response:
+            logger.debug("Generated voting question", extra={"brand_name": brand_name, "question": cleaned_response})
+            return cleaned_response
+        logger.warning("Empty voting question from LLM, using template", extra={"brand_name": brand_name})
+    except asyncio.TimeoutError:
+        logger.warning("LLM timed out after %ss, using template question", timeout, extra={"brand_name": brand_name})
+    except UpstreamUnavailable as e:
+        logger.warning("LLM unavailable (%s), using template question", e.reason, extra={"brand_name": brand_name})
     except Exception as e:
-        print(f"Error generating voting question: {e}")
-        return f"Should {brand_name} address the negative feedback from customers?"
+        logger.error("Error generating voting question: %s", e, extra={"brand_name": brand_name})
+    return await agenerate_template_question(brand_name, negative_data)
 
-def generate_multiple_voting_questions(brand_name: str, negative_data: Dict, llm: LLM, count: int = 5) -> List[str]:
-    """Generate multiple voting questions based on negative feedback data."""
-    
-    # Extract negative data
-    negative_reviews = negative_data.get('negative_reviews', [])
-    negative_reddit = negative_data.get('negative_reddit', [])
-    negative_social = negative_data.get('negative_social', [])
+def build_multiple_questions_prompt(brand_name: str, negative_data: Dict, count: int,
+                                    feedback: Optional[str] = None) -> str:
+    """Build the prompt asking for a JSON array of count voting questions.
     
+    feedback is the already formatted negative data, if the caller has it.
+    """
     # Create comprehensive negative data summary for LLM
-    all_negative_data = []
-    
-    if negative_reviews:
-        all_negative_data.append(f"NEGATIVE REVIEWS:\n{chr(10).join(negative_reviews[:5])}")
-    
-    if negative_reddit:
-        all_negative_data.append(f"NEGATIVE REDDIT DISCUSSIONS:\n{chr(10).join(negative_reddit[:5])}")
-    
-    if negative_social:
-        all_negative_data.append(f"NEGATIVE SOCIAL MEDIA:\n{chr(10).join(negative_social[:5])}")
-    
-    comprehensive_negative_data = "\n\n".join(all_negative_data)
+    comprehensive_negative_data = feedback if feedback is not None else format_negative_feedback(negative_data)
     
     # Create the multiple voting questions generation prompt
     prompt = f"""
@@ -155,50 +529,179 @@ EXAMPLES OF GOOD VOTING QUESTIONS:
 CRITICAL: Return ONLY a JSON array of {count} voting questions. No explanations, no additional text, no markdown formatting. Just the JSON array like this:
 ["Question 1", "Question 2", "Question 3", "Question 4", "Question 5"]
 """
+    return prompt
+
+async def generate_multiple_voting_questions(brand_name: str, negative_data: Dict, llm: LLM, count: int = 5,
+                                             mode: str = "llm", timeout: Optional[float] = None) -> List[str]:
+    """Generate multiple voting questions based on negative feedback data.
+    
+    Falls back to the template questions if the LLM fails or times out; an
+    answer with fewer usable questions than count (e.g. a truncated array) is
+    topped up from them.
+    """
+    if mode == "template":
+        return await agenerate_template_questions(brand_name, negative_data, count)
+    
+    prompt = build_multiple_questions_prompt(brand_name, negative_data, count,
+                                              await aformat_negative_feedback(negative_data))
     
+    questions: List[str] = []
     try:
-        response = llm.create_completion(prompt)
-        print(f"Raw LLM response: {response[:200]}...")
-        
-        # Clean the response - remove any markdown formatting
-        cleaned_response = response.strip()
-        if cleaned_response.startswith("```json"):
-            cleaned_response = cleaned_response[7:]
-        if cleaned_response.startswith("```"):
-            cleaned_response = cleaned_response[3:]
-        if cleaned_response.endswith("```"):
-            cleaned_response = cleaned_response[:-3]
-        cleaned_response = cleaned_response.strip()
-        
-        print(f"Cleaned response: {cleaned_response[:200]}...")
-        
-        # Parse the JSON response
-        questions = json.loads(cleaned_response)
-        print(f"Generated {len(questions)} voting questions")
-        return questions
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
-        print(f"Raw response that failed to parse: {response}")
-        # Return default questions if parsing fails
-        return [
-            f"Should {brand_name} improve their customer service?",
-            f"Should {brand_name} invest more in product quality?",
-            f"Should {brand_name} provide better product information?",
-            f"Should {brand_name} offer better warranty coverage?",
-            f"Should {brand_name} implement better quality control?"
-        ]
+        response = await asyncio.wait_for(
+            llm.acreate_completion(prompt, route="generation", response_schema=QUESTIONS_SCHEMA), timeout
+        )
+        # A JSON array, tolerating fences, surrounding text and truncation, or else a plain list
+        questions = parse_string_list(response)[:count]
+        logger.debug("Generated %d voting questions", len(questions), extra={"brand_name": brand_name})
+        if len(questions) == count:
+            return questions
+        logger.warning("Got %d of %d voting questions from LLM, filling with template questions", len(questions), count,
+                       extra={"brand_name": brand_name, "response": response})
+    except asyncio.TimeoutError:
+        logger.warning("LLM timed out after %ss, using template questions", timeout, extra={"brand_name": brand_name})
+    except UpstreamUnavailable as e:
+        logger.warning("LLM unavailable (%s), using template questions", e.reason, extra={"brand_name": brand_name})
     except Exception as e:
-        print(f"Error generating voting questions: {e}")
-        # Return default questions if parsing fails
-        return [
-            f"Should {brand_name} improve their customer service?",
-            f"Should {brand_name} invest more in product quality?",
-            f"Should {brand_name} provide better product information?",
-            f"Should {brand_name} offer better warranty coverage?",
-            f"Should {brand_name} implement better quality control?"
-        ]
-
-def generate_knowledge_response(query, intent, keyword, llm):
+        logger.error("Error generating voting questions: %s", e, extra={"brand_name": brand_name})
+    # Fill the slots the LLM response didn't with template questions
+    for question in await agenerate_template_questions(brand_name, negative_data, count):
+        if len(questions) >= count:
+            break
+        if question not in questions:
+            questions.append(question)
+    return questions
+
+async def stream_multiple_voting_questions(brand_name: str, negative_data: Dict, llm: LLM, count: int = 5,
+                                           mode: str = "llm", timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """Yield voting questions one by one as the LLM streams its JSON array.
+    
+    If the stream fails, ends early or is still running after timeout seconds,
+    the remaining slots are filled from the template questions.
+    """
+    emitted: List[str] = []
+    if mode != "template":
+        prompt = build_multiple_questions_prompt(brand_name, negative_data, count,
+                                                  await aformat_negative_feedback(negative_data))
+        parser = JSONArrayStreamParser()
+        deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+        deltas = llm.astream_completion(prompt, route="generation", response_schema=QUESTIONS_SCHEMA)
+        try:
+            while len(emitted) < count:
+                remaining = None if deadline is None else max(0.0, deadline - asyncio.get_running_loop().time())
+                try:
+                    delta = await asyncio.wait_for(deltas.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                for question in parser.feed(delta):
+                    if len(emitted) < count:
+                        emitted.append(question)
+                        yield question
+        except asyncio.TimeoutError:
+            logger.warning("LLM stream timed out after %ss, filling with template questions", timeout,
+                           extra={"brand_name": brand_name, "emitted": len(emitted)})
+        except UpstreamUnavailable as e:
+            logger.warning("LLM unavailable (%s), using template questions", e.reason, extra={"brand_name": brand_name})
+        except Exception as e:
+            logger.error("Error streaming voting questions: %s", e, extra={"brand_name": brand_name})
+        finally:
+            await deltas.aclose()
+    if len(emitted) < count:
+        for question in await agenerate_template_questions(brand_name, negative_data, count):
+            if len(emitted) >= count:
+                break
+            if question not in emitted:
+                emitted.append(question)
+                yield question
+
+async def coalesced_generation(
+    flight: SingleFlight,
+    rag: VotingRAG,
+    brand_name: str,
+    mode: str,
+    generate: Callable[[str, Dict], Awaitable[Any]],
+    *key_parts,
+) -> Tuple[Dict, Any]:
+    """Fetch a brand's negative data and run generate(brand_name, negative_data) once per identical request.
+    
+    Concurrent calls with the same normalized brand, mode and key_parts share
+    one KG fetch and one generation, and all get the same (negative_data,
+    result); result is None when the brand has no negative data. Questions are
+    generated under the catalogue spelling of the brand when it is known, so
+    the shared result doesn't depend on which caller arrived first.
+    """
+    key = (normalize_brand_name(brand_name), mode) + key_parts
+    
+    async def _run() -> Tuple[Dict, Any]:
+        canonical = rag.resolve_brand(brand_name) or brand_name
+        with span("kg_fetch"):
+            negative_data = await rag.aget_brand_negative_data(canonical)
+        if not has_negative_data(negative_data):
+            return negative_data, None
+        with span("generation", mode=mode):
+            return negative_data, await generate(canonical, negative_data)
+    
+    if flight.in_flight(key):
+        logger.debug("Joining in-flight generation", extra={"brand_name": brand_name, "mode": mode})
+    return await flight.do(key, _run)
+
+async def generate_voting_questions_batch(
+    brand_names: List[str],
+    rag: VotingRAG,
+    llm: LLM,
+    fetch_concurrency: int = 8,
+    llm_concurrency: int = 4,
+    mode: str = "llm",
+    timeout: Optional[float] = None,
+    scheduler: Optional[WorkScheduler] = None,
+    sender: str = "batch",
+) -> List[Dict]:
+    """Generate one voting question per brand with bounded concurrency.
+    
+    KG fetches and LLM calls are limited by separate semaphores, so slow LLM
+    calls don't hold fetch slots; template mode never takes an LLM slot.
+    With a scheduler, each brand is also one "batch" job queued for sender,
+    so batches yield to interactive work.
+    Brands repeated in the batch (after normalization) are generated once.
+    Returns one result dict per input brand, in input order, with an error
+    message instead of a question on failure.
+    """
+    fetch_slots = asyncio.Semaphore(fetch_concurrency)
+    llm_slots = asyncio.Semaphore(llm_concurrency)
+    flight = SingleFlight()
+    
+    async def _generate(brand_name: str) -> Dict:
+        result = {"brand_name": brand_name, "success": False, "voting_question": None, "negative_data_summary": {}, "error": None}
+        try:
+            async with scheduler.slot("batch", sender) if scheduler is not None else contextlib.nullcontext():
+                async with fetch_slots:
+                    with span("kg_fetch"):
+                        negative_data = await rag.aget_brand_negative_data(brand_name)
+                if not has_negative_data(negative_data):
+                    result["error"] = f"No negative feedback data found for {brand_name}"
+                    return result
+                result["negative_data_summary"] = summarize_negative_data(negative_data)
+                if mode == "template":
+                    with span("generation", mode=mode):
+                        result["voting_question"] = await agenerate_template_question(brand_name, negative_data)
+                else:
+                    async with llm_slots:
+                        with span("generation", mode=mode):
+                            result["voting_question"] = await generate_voting_question(brand_name, negative_data, llm, timeout=timeout)
+            result["success"] = True
+        except UpstreamUnavailable as e:
+            logger.warning("Skipped batch brand: %s", e, extra={"brand_name": brand_name})
+            result["error"] = f"Knowledge graph temporarily unavailable for {brand_name}, please retry later"
+        except Exception as e:
+            result["error"] = f"Error processing voting question for {brand_name}: {str(e)}"
+        return result
+    
+    async def _one(brand_name: str) -> Dict:
+        result = await flight.do(normalize_brand_name(brand_name), lambda: _generate(brand_name))
+        return {**result, "brand_name": brand_name}
+    
+    return await asyncio.gather(*[_one(brand_name) for brand_name in brand_names])
+
+async def generate_knowledge_response(query, intent, keyword, llm):
     """Use ASI:One to generate a response for new knowledge based on intent."""
     if intent == "voting_question_generation":
         prompt = (
@@ -226,20 +729,37 @@ def generate_knowledge_response(query, intent, keyword, llm):
         )
     else:
         return None
-    return llm.create_completion(prompt)
+    return await llm.acreate_completion(prompt, route="knowledge")
 
-def process_query(query, rag: VotingRAG, llm: LLM):
-    """Process voting-related queries using the knowledge graph and LLM."""
-    intent, keyword = get_intent_and_keyword(query, llm)
-    print(f"Intent: {intent}, Keyword: {keyword}")
+async def build_query_prompt(query, rag: VotingRAG, llm: LLM, local_intent: bool = True, combined: bool = True) -> str:
+    """Classify a chat query, gather its knowledge graph context and build the final prompt.
+    
+    With local_intent, unambiguous queries are classified without an LLM call.
+    With combined, voting questions are generated and explained in the final
+    completion instead of a separate generate_voting_question call.
+    """
+    local = None
+    if local_intent:
+        with span("intent_local"):
+            local = classify_intent_locally(query, rag)
+    if local is not None:
+        intent, keyword = local
+    else:
+        with span("intent_llm"):
+            intent, keyword = await get_intent_and_keyword(query, llm)
+    logger.debug("Classified query", extra={"intent": intent, "keyword": keyword, "local": local is not None})
     prompt = ""
 
     if intent == "faq":
-        faq_answer = rag.query_faq(query)
+        faq_match = rag.match_faq(query)
+        faq_answer = faq_match[0] if faq_match else None
+        if faq_match:
+            logger.debug("FAQ match with confidence %.2f", faq_match[1])
         if not faq_answer and keyword:
-            new_answer = generate_knowledge_response(query, intent, keyword, llm)
+            with span("faq_generation"):
+                new_answer = await generate_knowledge_response(query, intent, keyword, llm)
             rag.add_knowledge("faq", query, new_answer)
-            print(f"Knowledge graph updated - Added FAQ: '{query}' → '{new_answer}'")
+            logger.debug("Knowledge graph updated with new FAQ", extra={"question": query})
             prompt = (
                 f"Query: '{query}'\n"
                 f"FAQ Answer: '{new_answer}'\n"
@@ -254,33 +774,46 @@ def process_query(query, rag: VotingRAG, llm: LLM):
     
     elif intent == "voting_question_generation" and keyword:
         # Get negative data for the brand
-        print(f"🔍 Fetching negative data for voting question generation: '{keyword}'")
-        negative_data = rag.get_brand_negative_data(keyword)
-        print(f"📊 Negative data received: {type(negative_data)} - {bool(negative_data)}")
+        with span("kg_fetch"):
+            negative_data = await rag.aget_brand_negative_data(keyword)
         
-        if negative_data and (negative_data.get('negative_reviews') or negative_data.get('negative_reddit') or negative_data.get('negative_social')):
-            print(f"📊 Negative data keys: {list(negative_data.keys()) if isinstance(negative_data, dict) else 'Not a dict'}")
-            
-            # Generate voting question
-            voting_question = generate_voting_question(keyword, negative_data, llm)
-            
-            prompt = (
-                f"Query: '{query}'\n"
-                f"Brand: {keyword}\n"
-                f"Generated Voting Question: '{voting_question}'\n"
-                f"INSTRUCTIONS: Provide a comprehensive response that includes:\n"
-                f"1. The generated voting question\n"
-                f"2. Brief explanation of why this question was chosen\n"
-                f"3. How it addresses the negative feedback\n"
-                f"4. Potential impact of implementing the suggested improvement\n\n"
-                f"Make the response informative and actionable."
-            )
-            print(f"📝 Generated voting question prompt length: {len(prompt)} characters")
+        if has_negative_data(negative_data):
+            if combined:
+                # Generate and explain the question in the final completion
+                prompt = (
+                    f"Query: '{query}'\n"
+                    f"Brand: {keyword}\n\n"
+                    f"NEGATIVE CUSTOMER FEEDBACK DATA:\n{await aformat_negative_feedback(negative_data)}\n\n"
+                    f"INSTRUCTIONS: Create a single, clear yes/no or multiple choice voting question for {keyword} that "
+                    f"addresses the most frequently mentioned negative themes above, and use it as the Selected Question. "
+                    f"In the Humanized Answer provide:\n"
+                    f"1. The generated voting question\n"
+                    f"2. Brief explanation of why this question was chosen\n"
+                    f"3. How it addresses the negative feedback\n"
+                    f"4. Potential impact of implementing the suggested improvement\n\n"
+                    f"Make the response informative and actionable."
+                )
+            else:
+                # Generate voting question
+                with span("generation"):
+                    voting_question = await generate_voting_question(keyword, negative_data, llm)
+                
+                prompt = (
+                    f"Query: '{query}'\n"
+                    f"Brand: {keyword}\n"
+                    f"Generated Voting Question: '{voting_question}'\n"
+                    f"INSTRUCTIONS: Provide a comprehensive response that includes:\n"
+                    f"1. The generated voting question\n"
+                    f"2. Brief explanation of why this question was chosen\n"
+                    f"3. How it addresses the negative feedback\n"
+                    f"4. Potential impact of implementing the suggested improvement\n\n"
+                    f"Make the response informative and actionable."
+                )
         else:
             # Brand not found or no negative data
-            print(f"🔍 Brand '{keyword}' not found or no negative data available")
-            all_brands = rag.get_all_brands()
-            print(f"📊 Available brands in KG: {all_brands}")
+            logger.debug("Brand not found or no negative data available", extra={"brand_name": keyword})
+            with span("kg_catalogue"):
+                all_brands = await rag.aget_all_brands()
             
             prompt = (
                 f"Query: '{query}'\n"
@@ -292,36 +825,12 @@ def process_query(query, rag: VotingRAG, llm: LLM):
     
     elif intent == "negative_data_analysis" and keyword:
         # Get negative data for analysis
-        print(f"🔍 Fetching negative data for analysis: '{keyword}'")
-        negative_data = rag.get_brand_negative_data(keyword)
-        print(f"📊 Negative data received: {type(negative_data)} - {bool(negative_data)}")
+        with span("kg_fetch"):
+            negative_data = await rag.aget_brand_negative_data(keyword)
         
-        if negative_data and (negative_data.get('negative_reviews') or negative_data.get('negative_reddit') or negative_data.get('negative_social')):
-            print(f"📊 Negative data keys: {list(negative_data.keys()) if isinstance(negative_data, dict) else 'Not a dict'}")
-            
-            # Extract all data types
-            negative_reviews = negative_data.get('negative_reviews', [])
-            negative_reddit = negative_data.get('negative_reddit', [])
-            negative_social = negative_data.get('negative_social', [])
-            
-            print(f"📊 Data counts:")
-            print(f"   Negative Reviews: {len(negative_reviews) if negative_reviews else 0} items")
-            print(f"   Negative Reddit: {len(negative_reddit) if negative_reddit else 0} items")
-            print(f"   Negative Social: {len(negative_social) if negative_social else 0} items")
-            
+        if has_negative_data(negative_data):
             # Create comprehensive data summary for LLM
-            all_data = []
-            
-            if negative_reviews:
-                all_data.append(f"NEGATIVE REVIEWS:\n{chr(10).join(negative_reviews[:5])}")
-            
-            if negative_reddit:
-                all_data.append(f"NEGATIVE REDDIT DISCUSSIONS:\n{chr(10).join(negative_reddit[:5])}")
-            
-            if negative_social:
-                all_data.append(f"NEGATIVE SOCIAL MEDIA:\n{chr(10).join(negative_social[:5])}")
-            
-            comprehensive_data = "\n\n".join(all_data)
+            comprehensive_data = await aformat_negative_feedback(negative_data)
             
             prompt = (
                 f"Query: '{query}'\n"
@@ -335,12 +844,11 @@ def process_query(query, rag: VotingRAG, llm: LLM):
                 f"5. Priority areas for improvement\n\n"
                 f"Make the analysis comprehensive, data-driven, and actionable."
             )
-            print(f"📝 Generated analysis prompt length: {len(prompt)} characters")
         else:
             # Check if the knowledge graph is accessible at all
-            print(f"🔍 No negative data found, checking knowledge graph accessibility...")
-            all_brands = rag.get_all_brands()
-            print(f"📊 Available brands in KG: {all_brands}")
+            logger.debug("No negative data found, checking knowledge graph accessibility", extra={"brand_name": keyword})
+            with span("kg_catalogue"):
+                all_brands = await rag.aget_all_brands()
             
             if not all_brands:
                 prompt = (
@@ -363,7 +871,8 @@ def process_query(query, rag: VotingRAG, llm: LLM):
     
     elif intent == "brand_comparison" and keyword:
         # Get all brands and suggest comparison
-        all_brands = rag.get_all_brands()
+        with span("kg_catalogue"):
+            all_brands = await rag.aget_all_brands()
         prompt = (
             f"Query: '{query}'\n"
             f"Brand: {keyword}\n"
@@ -375,14 +884,49 @@ def process_query(query, rag: VotingRAG, llm: LLM):
         prompt = f"Query: '{query}'\nNo specific info found. Offer general voting question generation assistance."
 
     prompt += "\nFormat response as: 'Selected Question: <question>' on first line, 'Humanized Answer: <response>' on second."
-    print(f"📝 Final prompt length: {len(prompt)} characters")
-    print(f"📝 Final prompt preview: {prompt[:200]}...")
+    logger.debug("Built final prompt", extra={"intent": intent, "prompt_chars": len(prompt)})
+    return prompt
+
+async def degraded_query_response(query, rag: VotingRAG) -> Dict:
+    """Answer a chat query without the LLM or KG while one's circuit is open or it is shedding load.
     
-    print(f"🤖 Sending prompt to ASI:One LLM...")
-    response = llm.create_completion(prompt)
-    print(f"📥 LLM response received: {len(response)} characters")
-    print(f"📥 LLM response preview: {response[:200]}...")
+    Voting question requests for a catalogue brand get the template question for
+    the brand's negative feedback (if the KG is reachable); anything else gets a
+    try-again-later answer.
+    """
+    local = classify_intent_locally(query, rag)
+    if local is not None and local[0] == "voting_question_generation":
+        brand_name = local[1]
+        try:
+            with span("kg_fetch"):
+                negative_data = await rag.aget_brand_negative_data(brand_name)
+        except UpstreamUnavailable:
+            negative_data = {}
+        if has_negative_data(negative_data):
+            return {
+                "selected_question": await agenerate_template_question(brand_name, negative_data),
+                "humanized_answer": f"This question addresses the most common complaints in recent negative feedback about {brand_name}. "
+                                    "A detailed explanation is temporarily unavailable; please try again shortly.",
+            }
+    return {"selected_question": query, "humanized_answer": "The assistant is temporarily unavailable. Please try again shortly."}
+
+async def process_query(query, rag: VotingRAG, llm: LLM, local_intent: bool = True, combined: bool = True):
+    """Process voting-related queries using the knowledge graph and LLM."""
+    try:
+        prompt = await build_query_prompt(query, rag, llm, local_intent=local_intent, combined=combined)
+        
+        with span("answer"):
+            response = await llm.acreate_completion(prompt, route="answer")
+    except UpstreamUnavailable as e:
+        logger.warning("%s, answering without it", e, extra={"query": query})
+        return await degraded_query_response(query, rag)
+    logger.debug("LLM response received", extra={"response_chars": len(response)})
     
+    with span("parse"):
+        return parse_query_response(query, response)
+
+def parse_query_response(query, response: str) -> Dict:
+    """Split a final completion into its selected question and humanized answer."""
     try:
         # Split response into lines and find the sections
         lines = response.split('\n')
@@ -400,13 +944,44 @@ def process_query(query, rag: VotingRAG, llm: LLM):
                 answer = '\n'.join(answer_lines).strip()
                 break
         
-        print(f"✅ Parsed response successfully:")
-        print(f"   Selected Question: {selected_q}")
-        print(f"   Humanized Answer length: {len(answer)} characters")
-        print(f"   Humanized Answer preview: {answer[:200]}...")
-        
         return {"selected_question": selected_q, "humanized_answer": answer}
     except Exception as e:
-        print(f"⚠️ Failed to parse LLM response format: {e}")
-        print(f"   Raw response: {response[:200]}...")
+        logger.warning("Failed to parse LLM response format: %s", e, extra={"response": response})
         return {"selected_question": query, "humanized_answer": response}
+
+async def stream_query_answer(query, rag: VotingRAG, llm: LLM, local_intent: bool = True, combined: bool = True) -> AsyncIterator[str]:
+    """Stream the answer to a chat query as display text, "**<question>**\n\n<answer>".
+    
+    Output is held back only until the "Humanized Answer:" marker arrives, so the
+    header can be rendered; the answer itself is forwarded as it streams. If the
+    marker never appears, the whole response is rendered like process_query does.
+    While the LLM is unavailable the degraded_query_response answer is sent instead.
+    """
+    pending = ""
+    header_sent = False
+    try:
+        prompt = await build_query_prompt(query, rag, llm, local_intent=local_intent, combined=combined)
+        async for delta in llm.astream_completion(prompt, route="answer"):
+            if header_sent:
+                yield delta
+                continue
+            pending += delta
+            marker = pending.find("Humanized Answer:")
+            if marker == -1:
+                continue
+            selected_q = query
+            for line in pending[:marker].split('\n'):
+                if "Selected Question:" in line:
+                    selected_q = line.replace("Selected Question:", "").strip()
+            header_sent = True
+            yield f"**{selected_q}**\n\n{pending[marker + len('Humanized Answer:'):].lstrip()}"
+    except UpstreamUnavailable as e:
+        # Raised before the stream starts, so nothing has been sent yet
+        logger.warning("%s, answering without it", e, extra={"query": query})
+        degraded = await degraded_query_response(query, rag)
+        yield f"**{degraded['selected_question']}**\n\n{degraded['humanized_answer']}"
+        return
+    
+    if not header_sent:
+        parsed = parse_query_response(query, pending)
+        yield f"**{parsed['selected_question']}**\n\n{parsed['humanized_answer']}"
@@ -1,103 +1,618 @@
 # votingrag.py
+import asyncio
+import logging
+import time
 import requests
+import aiohttp
 import json
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Callable, Iterable, List, Dict, Optional, Set, Tuple, Any
+from .cache import TTLCache, SingleFlight
+from .faq import FAQIndex, normalize_question
+from .knowledge import save_knowledge_snapshot
+from .log import get_logger
+from .parsing import JSONListsStreamParser
+from .metrics import KG_REQUEST_SECONDS, timed
+from .resilience import UpstreamGuard, UpstreamUnavailable
+
+logger = get_logger(__name__)
+
+DEFAULT_KG_BASE_URL = "https://orchestrator-739298578243.us-central1.run.app"
+
+# Statuses worth retrying: rate limiting and transient orchestrator / Cloud Run errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# (brand_name, data_type, sentiment) for /kg/query_brand_data; None leaves a filter out
+BrandDataQuery = Tuple[str, Optional[str], Optional[str]]
+
+# negative_data key -> query_brand_data data_type
+NEGATIVE_DATA_TYPES = (
+    ("negative_reviews", "reviews"),
+    ("negative_reddit", "reddit_threads"),
+    ("negative_social", "social_comments"),
+)
+NEGATIVE_DATA_KEYS = tuple(key for key, _ in NEGATIVE_DATA_TYPES)
+
+# Bytes read per chunk when streaming a brand summary through JSONListsStreamParser
+SUMMARY_CHUNK_SIZE = 64 * 1024
+
+def normalize_brand_name(brand_name: str) -> str:
+    """Normalize a brand name for cache and index keys ("  iPhone " -> "iphone")."""
+    return " ".join(brand_name.split()).casefold()
+
+def _unique_queries(queries: Iterable[BrandDataQuery]) -> List[BrandDataQuery]:
+    """Distinct queries in first-seen order, with empty filters normalized to None."""
+    return list(dict.fromkeys((brand_name, data_type or None, sentiment or None) for brand_name, data_type, sentiment in queries))
+
+def _bulk_result(queries: List[BrandDataQuery], outcomes: List[Tuple[List[str], Optional[str]]]) -> Dict[BrandDataQuery, Dict]:
+    result = {query: {"success": error is None, "results": results, "error": error} for query, (results, error) in zip(queries, outcomes)}
+    failed = sum(1 for outcome in result.values() if not outcome["success"])
+    if failed:
+        logger.warning("Bulk KG query partially failed", extra={"queries": len(result), "failed": failed})
+    else:
+        logger.debug("Bulk KG query", extra={"queries": len(result)})
+    return result
+
+def _page_of(negative_data: Dict, offset: int, limit: Optional[int]) -> Dict:
+    """Slice every negative source to [offset, offset + limit), adding the full "totals" per source."""
+    if not negative_data:
+        return {}
+    end = None if limit is None else offset + limit
+    page = {key: negative_data.get(key, [])[offset:end] for key in NEGATIVE_DATA_KEYS}
+    page["totals"] = {key: len(negative_data.get(key, [])) for key in NEGATIVE_DATA_KEYS}
+    return page
 
 class VotingRAG:
-    def __init__(self, metta_instance):
+    def __init__(
+        self,
+        metta_instance,
+        kg_base_url: Optional[str] = None,
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        cache_size: int = 256,
+        cache_ttl: float = 300.0,
+        cache_stale_ttl: float = 600.0,
+        catalogue_ttl: float = 300.0,
+        faq_min_score: float = 0.6,
+        max_learned_knowledge: int = 1000,
+        guard: Optional[UpstreamGuard] = None,
+    ):
         self.metta = metta_instance
-        # Your ngrok URL - update this with your current ngrok URL
-        self.kg_base_url = "https://orchestrator-739298578243.us-central1.run.app"
+        self.kg_base_url = (kg_base_url or DEFAULT_KG_BASE_URL).rstrip("/")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Circuit breaker and adaptive concurrency limit shared by every orchestrator request
+        self.guard = guard or UpstreamGuard("kg", max_concurrency=pool_size)
+        
+        # Keep-alive connection pool for the sync methods, with bounded retries and backoff
+        self.http = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        
+        # Shared session for the async methods; created lazily on the running event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Brand summary cache keyed on normalized brand name (cache_size=0 disables it)
+        self.brand_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl, stale_ttl=cache_stale_ttl)
+        self._brand_flight = SingleFlight()
+        self._background_tasks = set()
+        
+        # Local brand catalogue: canonical names plus a normalized-name index for O(1) lookups
+        self.catalogue_ttl = catalogue_ttl
+        self.brand_catalogue: Set[str] = set()
+        self._brand_index: Dict[str, str] = {}
+        self._max_brand_words = 1
+        self._catalogue_loaded_at: Optional[float] = None
+        self._catalogue_flight = SingleFlight()
+        self.catalogue_refreshes = 0
+        self.catalogue_short_circuits = 0
+        
+        # FAQ lookups go through a token index built once from the MeTTa faq atoms
+        self.faq_index = FAQIndex.from_metta(metta_instance, min_score=faq_min_score)
+        
+        # Runtime-learned atoms in least-recently-used order, keyed on (relation, normalized subject).
+        # Atoms loaded at startup are never evicted.
+        self.max_learned_knowledge = max_learned_knowledge
+        self._learned: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self.knowledge_evictions = 0
+        self.knowledge_deduplicated = 0
+        # Bumped on every learned-knowledge change so callers can tell when a snapshot is due
+        self.knowledge_changes = 0
+    
+    def _run_in_background(self, coro_fn):
+        """Schedule coro_fn() on the running loop, keeping a reference until it finishes."""
+        task = asyncio.ensure_future(coro_fn())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+    
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout passed to every sync request."""
+        return (self.connect_timeout, self.read_timeout)
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared aiohttp session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+    
+    async def _aget(self, path: str, params: Optional[Dict] = None, parser: Optional[Callable[[], Any]] = None) -> Tuple[int, Any]:
+        """GET a KG endpoint on the pooled session, retrying transient failures with backoff.
+        
+        Returns (status, parsed JSON) on success and (status, response text) otherwise.
+        With parser, a successful body is streamed into a fresh parser() (one per
+        attempt) in SUMMARY_CHUNK_SIZE chunks and the closed parser is returned
+        instead of the parsed JSON.
+        
+        Runs under self.guard: raises UpstreamUnavailable while the breaker is
+        open or the request is shed, and counts retryable statuses as failures.
+        """
+        async def _timed():
+            with timed(KG_REQUEST_SECONDS, path=path):
+                return await self._aget_with_retries(path, params, parser)
+        return await self.guard.call(_timed, failed=lambda result: result[0] in RETRY_STATUSES)
+    
+    async def _aget_with_retries(self, path: str, params: Optional[Dict] = None, parser: Optional[Callable[[], Any]] = None) -> Tuple[int, Any]:
+        url = f"{self.kg_base_url}{path}"
+        session = await self._get_session()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200 and parser is not None:
+                        stream = parser()
+                        async for chunk in response.content.iter_chunked(SUMMARY_CHUNK_SIZE):
+                            stream.feed(chunk)
+                        stream.close()
+                        return response.status, stream
+                    if response.status == 200:
+                        return response.status, await response.json(content_type=None)
+                    if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                        return response.status, await response.text()
+                    logger.warning("Retrying KG request after HTTP %s", response.status, extra={"url": url, "attempt": attempt + 1, "max_retries": self.max_retries})
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("Retrying KG request after %s", type(e).__name__, extra={"url": url, "attempt": attempt + 1, "max_retries": self.max_retries})
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+    
+    async def close(self):
+        """Close the async HTTP session and the sync connection pool."""
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self.http.close()
+    
+    def _extract_negative_data(self, parser: JSONListsStreamParser) -> Dict:
+        """Pull the negative feedback lists out of a streamed /kg/get_brand_summary payload."""
+        negative_data = dict(parser.items)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Negative data extracted", extra={
+                **{key: len(items) for key, items in negative_data.items()},
+                "totals": parser.totals,
+            })
+        
+        return negative_data
+    
+    def upstream_stats(self) -> Dict:
+        """Circuit breaker and concurrency limiter state for the orchestrator."""
+        return {self.guard.name: self.guard.stats()}
+    
+    def cache_stats(self) -> Dict:
+        """Counters for the brand summary cache, miss coalescing and the brand catalogue."""
+        return {
+            "brand_summary": {**self.brand_cache.stats(), **self._brand_flight.stats()},
+            "brand_catalogue": {
+                "size": len(self.brand_catalogue),
+                "loaded": self._catalogue_loaded_at is not None,
+                "age_seconds": time.monotonic() - self._catalogue_loaded_at if self._catalogue_loaded_at is not None else None,
+                "refreshes": self.catalogue_refreshes,
+                "short_circuits": self.catalogue_short_circuits,
+            },
+        }
+    
+    def resolve_brand(self, brand_name: str) -> Optional[str]:
+        """Return the catalogue spelling of brand_name, or None if it is not in the catalogue."""
+        return self._brand_index.get(normalize_brand_name(brand_name))
+    
+    def find_brands_in_text(self, text: str) -> List[str]:
+        """Return catalogue brands mentioned in text, in order of appearance.
+        
+        Checks every word n-gram up to the longest brand name against the index.
+        """
+        words = [w.strip("?!.,;:'\"()[]").removesuffix("'s") for w in text.split()]
+        words = [w for w in words if w]
+        found = []
+        for start in range(len(words)):
+            for size in range(min(self._max_brand_words, len(words) - start), 0, -1):
+                brand = self._brand_index.get(normalize_brand_name(" ".join(words[start:start + size])))
+                if brand is not None:
+                    if brand not in found:
+                        found.append(brand)
+                    break
+        return found
+    
+    def _catalogue_is_stale(self) -> bool:
+        return self._catalogue_loaded_at is None or time.monotonic() - self._catalogue_loaded_at > self.catalogue_ttl
+    
+    def _apply_catalogue(self, brands: List[str]):
+        """Merge a fresh brand list into the catalogue, touching only brands that changed."""
+        incoming = {normalize_brand_name(b): b for b in brands if b}
+        removed = [key for key in self._brand_index if key not in incoming]
+        for key in removed:
+            self.brand_catalogue.discard(self._brand_index.pop(key))
+            self.brand_cache.pop(key)
+        added = 0
+        for key, brand in incoming.items():
+            current = self._brand_index.get(key)
+            if current == brand:
+                continue
+            if current is None:
+                added += 1
+            else:
+                self.brand_catalogue.discard(current)
+            self._brand_index[key] = brand
+            self.brand_catalogue.add(brand)
+        self._max_brand_words = max((len(key.split()) for key in self._brand_index), default=1)
+        self._catalogue_loaded_at = time.monotonic()
+        self.catalogue_refreshes += 1
+        logger.info("Brand catalogue refreshed", extra={"brands": len(self.brand_catalogue), "added": added, "removed": len(removed)})
+    
+    async def arefresh_brand_catalogue(self) -> List[str]:
+        """Reload the brand catalogue from the orchestrator; concurrent calls share one request.
+        
+        A failed refresh keeps the previous catalogue. While the KG is unavailable
+        the previous catalogue is returned, or UpstreamUnavailable raised if none
+        has been loaded yet.
+        """
+        async def _refresh():
+            try:
+                brands = await self._afetch_all_brands()
+            except UpstreamUnavailable as e:
+                if self._catalogue_loaded_at is None:
+                    raise
+                logger.warning("Keeping the brand catalogue: %s", e)
+                return sorted(self.brand_catalogue)
+            if brands is not None:
+                self._apply_catalogue(brands)
+            return sorted(self.brand_catalogue)
+        return await self._catalogue_flight.do("catalogue", _refresh)
     
     def get_brand_negative_data(self, brand_name: str) -> Dict:
         """Get negative data for a brand from the knowledge graph."""
+        key = normalize_brand_name(brand_name)
+        cached = self.brand_cache.get(key)
+        if cached is not None:
+            return cached
+        negative_data = self._fetch_brand_negative_data(brand_name)
+        if negative_data:
+            self.brand_cache.set(key, negative_data)
+        return negative_data
+    
+    def get_brand_negative_data_page(self, brand_name: str, limit: Optional[int] = None, offset: int = 0) -> Dict:
+        """One page of a brand's negative data: each source sliced to [offset, offset + limit), plus "totals".
+        
+        The page is sliced from the cached summary, so paging through a brand
+        fetches it once.
+        """
+        return _page_of(self.get_brand_negative_data(brand_name), max(0, offset), limit)
+    
+    def _fetch_brand_negative_data(self, brand_name: str) -> Dict:
+        """Fetch a brand summary from the orchestrator, bypassing the cache."""
+        parser = self._fetch_brand_summary(brand_name)
+        return self._extract_negative_data(parser) if parser else {}
+    
+    def _fetch_brand_summary(self, brand_name: str) -> Optional[JSONListsStreamParser]:
+        """Stream /kg/get_brand_summary through a JSONListsStreamParser; None on failure."""
         try:
             url = f"{self.kg_base_url}/kg/get_brand_summary"
             params = {"brand_name": brand_name}
-            print(f"🌐 Making request to: {url}")
-            print(f"📤 Request params: {params}")
+            logger.debug("KG request", extra={"url": url, "params": params})
             
-            response = requests.get(url, params=params)
-            print(f"📡 Response status: {response.status_code}")
-            print(f"📡 Response headers: {dict(response.headers)}")
+            def _get() -> Tuple[int, Any]:
+                with self.http.get(url, params=params, timeout=self.timeout, stream=True) as response:
+                    if response.status_code != 200:
+                        return response.status_code, response.text
+                    parser = JSONListsStreamParser(NEGATIVE_DATA_KEYS)
+                    for chunk in response.iter_content(SUMMARY_CHUNK_SIZE):
+                        parser.feed(chunk)
+                    parser.close()
+                    return response.status_code, parser
             
-            if response.status_code == 200:
-                data = response.json()
-                print(f"📊 Response data: {data}")
-                summary = data.get("summary", {})
-                
-                # Extract negative data
-                negative_data = {
-                    "negative_reviews": summary.get('negative_reviews', []),
-                    "negative_reddit": summary.get('negative_reddit', []),
-                    "negative_social": summary.get('negative_social', [])
-                }
-                
-                print(f"📊 Negative data extracted:")
-                print(f"   Negative Reviews: {len(negative_data['negative_reviews'])} items")
-                print(f"   Negative Reddit: {len(negative_data['negative_reddit'])} items")
-                print(f"   Negative Social: {len(negative_data['negative_social'])} items")
-                
-                return negative_data
-            else:
-                print(f"❌ Error response: {response.text}")
-            return {}
+            with timed(KG_REQUEST_SECONDS, path="/kg/get_brand_summary"):
+                status, data = self.guard.run(_get, failed=lambda result: result[0] in RETRY_STATUSES)
+            logger.debug("KG response", extra={"url": url, "status": status})
+            if status != 200:
+                logger.warning("KG error response", extra={"url": url, "status": status, "body": data})
+                return None
+            return data
+        except UpstreamUnavailable as e:
+            logger.warning("Error getting brand negative data: %s", e, extra={"brand_name": brand_name})
+            return None
         except Exception as e:
-            print(f"❌ Error getting brand negative data: {e}")
-            return {}
+            logger.error("Error getting brand negative data: %s", e, extra={"brand_name": brand_name})
+            return None
     
     def get_all_brands(self) -> List[str]:
         """Get all brands available in the knowledge graph."""
         try:
             url = f"{self.kg_base_url}/kg/get_all_brands"
-            print(f"🌐 Making request to: {url}")
-            response = requests.get(url)
-            print(f"📡 Response status: {response.status_code}")
-            print(f"📡 Response headers: {dict(response.headers)}")
+            logger.debug("KG request", extra={"url": url})
+            with timed(KG_REQUEST_SECONDS, path="/kg/get_all_brands"):
+                response = self.guard.run(
+                    lambda: self.http.get(url, timeout=self.timeout), failed=lambda r: r.status_code in RETRY_STATUSES
+                )
+            logger.debug("KG response", extra={"url": url, "status": response.status_code})
             
             if response.status_code == 200:
-                data = response.json()
-                print(f"📊 Response data: {data}")
-                brands = data.get("brands", [])
-                print(f"📊 Extracted brands: {brands}")
+                brands = response.json().get("brands", [])
+                logger.debug("Extracted brands", extra={"count": len(brands)})
                 return brands
             else:
-                print(f"❌ Error response: {response.text}")
+                logger.warning("KG error response", extra={"url": url, "status": response.status_code, "body": response.text})
+            return []
+        except UpstreamUnavailable as e:
+            logger.warning("Error fetching brands: %s", e)
             return []
         except Exception as e:
-            print(f"❌ Error fetching brands: {e}")
+            logger.error("Error fetching brands: %s", e)
             return []
     
+    @staticmethod
+    def _brand_data_params(brand_name: str, data_type: Optional[str], sentiment: Optional[str]) -> Dict:
+        params = {"brand_name": brand_name}
+        if data_type:
+            params["data_type"] = data_type
+        if sentiment:
+            params["sentiment"] = sentiment
+        return params
+    
     def query_brand_data(self, brand_name: str, data_type: str = None, sentiment: str = None) -> List[str]:
         """Query specific brand data from the knowledge graph."""
+        results, error = self._query_brand_data(brand_name, data_type, sentiment)
+        if error:
+            logger.error("Error querying brand data: %s", error, extra={"brand_name": brand_name})
+        return results
+    
+    def _query_brand_data(self, brand_name: str, data_type: Optional[str], sentiment: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        """Return (results, None) on success and ([], error message) otherwise."""
         try:
-            params = {"brand_name": brand_name}
-            if data_type:
-                params["data_type"] = data_type
-            if sentiment:
-                params["sentiment"] = sentiment
-            
+            params = self._brand_data_params(brand_name, data_type, sentiment)
             url = f"{self.kg_base_url}/kg/query_brand_data"
-            print(f"🌐 Making request to: {url}")
-            print(f"📤 Request params: {params}")
+            logger.debug("KG request", extra={"url": url, "params": params})
             
-            response = requests.get(url, params=params)
-            print(f"📡 Response status: {response.status_code}")
+            with timed(KG_REQUEST_SECONDS, path="/kg/query_brand_data"):
+                response = self.guard.run(
+                    lambda: self.http.get(url, params=params, timeout=self.timeout), failed=lambda r: r.status_code in RETRY_STATUSES
+                )
+            logger.debug("KG response", extra={"url": url, "status": response.status_code})
             
             if response.status_code == 200:
-                data = response.json()
-                print(f"📊 Response data: {data}")
-                results = data.get("results", [])
-                print(f"📊 Extracted results: {len(results)} items")
-                if results:
-                    print(f"📊 Sample result: {results[0][:100]}..." if len(results[0]) > 100 else f"📊 Sample result: {results[0]}")
-                return results
+                results = response.json().get("results", [])
+                logger.debug("Extracted results", extra={"count": len(results)})
+                return results, None
+            logger.warning("KG error response", extra={"url": url, "status": response.status_code, "body": response.text})
+            return [], f"HTTP {response.status_code}"
+        except Exception as e:
+            return [], f"{type(e).__name__}: {e}"
+    
+    def query_brand_data_bulk(self, queries: Iterable[BrandDataQuery], concurrency: Optional[int] = None) -> Dict[BrandDataQuery, Dict]:
+        """Run many query_brand_data lookups concurrently over the pooled session.
+        
+        See aquery_brand_data_bulk for the result format.
+        """
+        unique = _unique_queries(queries)
+        if not unique:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(concurrency or self.pool_size, len(unique))) as pool:
+            outcomes = list(pool.map(lambda query: self._query_brand_data(*query), unique))
+        return _bulk_result(unique, outcomes)
+    
+    async def aget_brand_negative_data(self, brand_name: str) -> Dict:
+        """Async variant of get_brand_negative_data that does not block the event loop.
+        
+        Fresh cache hits return immediately, stale hits are served while a single
+        background refresh runs, and concurrent misses share one upstream request.
+        Misses raise UpstreamUnavailable while the KG breaker is open or the
+        request is shed, rather than returning {} as if the brand had no data.
+        Once the brand catalogue is loaded, brands missing from it return {} without
+        a network call, and known brands are requested under their catalogue spelling.
+        """
+        brand_name = self._catalogue_spelling(brand_name)
+        if brand_name is None:
+            return {}
+        
+        key = normalize_brand_name(brand_name)
+        found = self.brand_cache.lookup(key)
+        if found is not None:
+            negative_data, is_stale = found
+            if is_stale and not self._brand_flight.in_flight(key):
+                self._run_in_background(lambda: self._arefresh_stale_brand(brand_name, key))
+            return negative_data
+        return await self._brand_flight.do(key, lambda: self._arefresh_brand(brand_name, key))
+    
+    def _catalogue_spelling(self, brand_name: str) -> Optional[str]:
+        """Catalogue spelling of brand_name, None if the loaded catalogue doesn't have it.
+        
+        Returns brand_name unchanged before the catalogue is loaded, and starts a
+        background refresh when the catalogue is stale.
+        """
+        if not self.brand_catalogue:
+            return brand_name
+        if self._catalogue_is_stale() and not self._catalogue_flight.in_flight("catalogue"):
+            self._run_in_background(self.arefresh_brand_catalogue)
+        canonical = self.resolve_brand(brand_name)
+        if canonical is None:
+            self.catalogue_short_circuits += 1
+            logger.debug("Brand not in catalogue, skipping summary request", extra={"brand_name": brand_name})
+        return canonical
+    
+    async def aget_brand_negative_data_page(self, brand_name: str, limit: Optional[int] = None, offset: int = 0) -> Dict:
+        """Async variant of get_brand_negative_data_page, sharing aget_brand_negative_data's cache and request coalescing."""
+        return _page_of(await self.aget_brand_negative_data(brand_name), max(0, offset), limit)
+    
+    async def _arefresh_stale_brand(self, brand_name: str, key: str):
+        """Background refresh of a stale brand summary; the stale one keeps being served if the KG is unavailable."""
+        try:
+            await self._brand_flight.do(key, lambda: self._arefresh_brand(brand_name, key))
+        except UpstreamUnavailable as e:
+            logger.warning("Serving stale brand summary: %s", e, extra={"brand_name": brand_name})
+    
+    async def _arefresh_brand(self, brand_name: str, key: str) -> Dict:
+        """Fetch a brand summary and store successful results in the cache."""
+        negative_data = await self._afetch_brand_negative_data(brand_name)
+        if negative_data:
+            self.brand_cache.set(key, negative_data)
+        return negative_data
+    
+    async def _afetch_brand_negative_data(self, brand_name: str) -> Dict:
+        """Fetch a brand summary from the orchestrator, bypassing the cache.
+        
+        Returns {} on errors, but raises UpstreamUnavailable while the KG breaker
+        is open or the request is shed.
+        """
+        try:
+            params = {"brand_name": brand_name}
+            logger.debug("KG request", extra={"path": "/kg/get_brand_summary", "params": params})
+            
+            status, data = await self._aget(
+                "/kg/get_brand_summary", params, parser=lambda: JSONListsStreamParser(NEGATIVE_DATA_KEYS)
+            )
+            logger.debug("KG response", extra={"path": "/kg/get_brand_summary", "status": status})
+            
+            if status == 200:
+                return self._extract_negative_data(data)
             else:
-                print(f"❌ Error response: {response.text}")
-            return []
+                logger.warning("KG error response", extra={"path": "/kg/get_brand_summary", "status": status, "body": data})
+            return {}
+        except UpstreamUnavailable:
+            # Not "no data": callers report the knowledge graph as unavailable instead
+            raise
         except Exception as e:
-            print(f"❌ Error querying brand data: {e}")
-            return []
+            logger.error("Error getting brand negative data: %s", e, extra={"brand_name": brand_name})
+            return {}
+    
+    async def aget_all_brands(self) -> List[str]:
+        """Async variant of get_all_brands, served from the local brand catalogue.
+        
+        The first call loads the catalogue; later calls past catalogue_ttl return the
+        current catalogue and refresh it in the background.
+        """
+        if self._catalogue_loaded_at is None:
+            return await self.arefresh_brand_catalogue()
+        if self._catalogue_is_stale() and not self._catalogue_flight.in_flight("catalogue"):
+            self._run_in_background(self.arefresh_brand_catalogue)
+        return sorted(self.brand_catalogue)
+    
+    async def _afetch_all_brands(self) -> Optional[List[str]]:
+        """Fetch the full brand list from the orchestrator; None if the request failed.
+        
+        Raises UpstreamUnavailable while the KG breaker is open or the request is shed.
+        """
+        try:
+            logger.debug("KG request", extra={"path": "/kg/get_all_brands"})
+            
+            status, data = await self._aget("/kg/get_all_brands")
+            logger.debug("KG response", extra={"path": "/kg/get_all_brands", "status": status})
+            
+            if status == 200:
+                brands = data.get("brands", [])
+                logger.debug("Extracted brands", extra={"count": len(brands)})
+                return brands
+            else:
+                logger.warning("KG error response", extra={"path": "/kg/get_all_brands", "status": status, "body": data})
+            return None
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            logger.error("Error fetching brands: %s", e)
+            return None
+    
+    async def aquery_brand_data(self, brand_name: str, data_type: str = None, sentiment: str = None) -> List[str]:
+        """Async variant of query_brand_data."""
+        results, error = await self._aquery_brand_data(brand_name, data_type, sentiment)
+        if error:
+            logger.error("Error querying brand data: %s", error, extra={"brand_name": brand_name})
+        return results
+    
+    async def _aquery_brand_data(self, brand_name: str, data_type: Optional[str], sentiment: Optional[str]) -> Tuple[List[str], Optional[str]]:
+        """Return (results, None) on success and ([], error message) otherwise."""
+        try:
+            params = self._brand_data_params(brand_name, data_type, sentiment)
+            logger.debug("KG request", extra={"path": "/kg/query_brand_data", "params": params})
+            
+            status, data = await self._aget("/kg/query_brand_data", params)
+            logger.debug("KG response", extra={"path": "/kg/query_brand_data", "status": status})
+            
+            if status == 200:
+                results = data.get("results", [])
+                logger.debug("Extracted results", extra={"count": len(results)})
+                return results, None
+            logger.warning("KG error response", extra={"path": "/kg/query_brand_data", "status": status, "body": data})
+            return [], f"HTTP {status}"
+        except Exception as e:
+            return [], f"{type(e).__name__}: {e}"
+    
+    async def aquery_brand_data_bulk(self, queries: Iterable[BrandDataQuery], concurrency: Optional[int] = None) -> Dict[BrandDataQuery, Dict]:
+        """Run many query_brand_data lookups concurrently over the shared session.
+        
+        The orchestrator has no batched query endpoint, so each distinct
+        (brand_name, data_type, sentiment) tuple is one request, with at most
+        concurrency (default pool_size) in flight. Returns
+        {query: {"success", "results", "error"}} for every distinct query; a
+        failed query doesn't affect the others.
+        """
+        unique = _unique_queries(queries)
+        slots = asyncio.Semaphore(concurrency or self.pool_size)
+        
+        async def _one(query: BrandDataQuery) -> Tuple[List[str], Optional[str]]:
+            async with slots:
+                return await self._aquery_brand_data(*query)
+        
+        outcomes = await asyncio.gather(*[_one(query) for query in unique])
+        return _bulk_result(unique, outcomes)
+    
+    async def aquery_negative_data_bulk(self, brand_names: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """Fetch negative reviews, Reddit threads and social comments for many brands in one bulk query.
+        
+        Returns {brand_name: {"negative_reviews", "negative_reddit", "negative_social", "errors"}},
+        where errors maps each failed source to its error message.
+        """
+        brand_names = list(dict.fromkeys(brand_names))
+        bulk = await self.aquery_brand_data_bulk(
+            [(brand_name, data_type, "negative") for brand_name in brand_names for _, data_type in NEGATIVE_DATA_TYPES],
+            concurrency=concurrency,
+        )
+        negative_data = {}
+        for brand_name in brand_names:
+            outcomes = {key: bulk[(brand_name, data_type, "negative")] for key, data_type in NEGATIVE_DATA_TYPES}
+            negative_data[brand_name] = {
+                **{key: outcome["results"] for key, outcome in outcomes.items()},
+                "errors": {key: outcome["error"] for key, outcome in outcomes.items() if not outcome["success"]},
+            }
+        return negative_data
     
     def query_negative_reviews(self, brand_name: str) -> List[str]:
         """Get negative reviews for a brand."""
@@ -111,14 +626,94 @@ class VotingRAG:
         """Get negative social media comments for a brand."""
         return self.query_brand_data(brand_name, "social_comments", "negative")
     
+    async def aquery_negative_reviews(self, brand_name: str) -> List[str]:
+        """Async variant of query_negative_reviews."""
+        return await self.aquery_brand_data(brand_name, "reviews", "negative")
+    
+    async def aquery_negative_reddit(self, brand_name: str) -> List[str]:
+        """Async variant of query_negative_reddit."""
+        return await self.aquery_brand_data(brand_name, "reddit_threads", "negative")
+    
+    async def aquery_negative_social(self, brand_name: str) -> List[str]:
+        """Async variant of query_negative_social."""
+        return await self.aquery_brand_data(brand_name, "social_comments", "negative")
+    
     def query_faq(self, question: str) -> Optional[str]:
-        """Retrieve FAQ answers from local MeTTa knowledge graph."""
-        query_str = f'!(match &self (faq "{question}" $answer) $answer)'
-        results = self.metta.run(query_str)
-        return results[0][0].get_object().value if results and results[0] else None
+        """Retrieve the answer to the most similar FAQ in the local knowledge graph."""
+        match = self.match_faq(question)
+        return match[0] if match else None
+    
+    def match_faq(self, question: str) -> Optional[Tuple[str, float]]:
+        """Return (answer, confidence score) for the closest FAQ, or None if nothing is close enough."""
+        result = self.faq_index.lookup(question)
+        if result is None:
+            return None
+        key, answer, score = result
+        if ("faq", key) in self._learned:
+            self._learned.move_to_end(("faq", key))
+        return answer, score
     
     def add_knowledge(self, relation_type: str, subject: str, object_value: str):
-        """Add new knowledge to local MeTTa knowledge graph."""
+        """Add new knowledge to local MeTTa knowledge graph.
+        
+        Subjects are deduplicated on their normalized form: a learned atom for the
+        same subject is replaced, and subjects already present at startup are kept.
+        Once more than max_learned_knowledge atoms have been learned, the least
+        recently used ones are removed from the space.
+        """
         from hyperon import E, S, ValueAtom
-        self.metta.space().add_atom(E(S(relation_type), S(subject), ValueAtom(object_value)))
+        space = self.metta.space()
+        key = (relation_type, normalize_question(subject))
+        
+        existing = self._learned.pop(key, None)
+        if existing is not None:
+            space.remove_atom(existing)
+            self.knowledge_deduplicated += 1
+        elif relation_type == "faq" and key[1] in self.faq_index.entries:
+            self.knowledge_deduplicated += 1
+            return f"Kept existing {relation_type}: {subject}"
+        
+        atom = E(S(relation_type), S(subject), ValueAtom(object_value))
+        space.add_atom(atom)
+        self._learned[key] = atom
+        if relation_type == "faq":
+            self.faq_index.add(subject, object_value)
+        
+        self.knowledge_changes += 1
+        self._evict_learned_knowledge()
         return f"Added {relation_type}: {subject} → {object_value}"
+    
+    def _evict_learned_knowledge(self):
+        """Drop least recently used learned atoms beyond max_learned_knowledge."""
+        space = self.metta.space()
+        while len(self._learned) > self.max_learned_knowledge:
+            (old_relation, old_subject), old_atom = self._learned.popitem(last=False)
+            space.remove_atom(old_atom)
+            if old_relation == "faq":
+                self.faq_index.remove(old_subject)
+            self.knowledge_evictions += 1
+    
+    def register_learned_knowledge(self, atoms: List):
+        """Track atoms restored from a knowledge snapshot as learned (evictable) knowledge."""
+        for atom in atoms:
+            relation, subject = atom.get_children()[:2]
+            key = (str(relation), normalize_question(subject.get_name()))
+            self._learned[key] = atom
+            self._learned.move_to_end(key)
+        self._evict_learned_knowledge()
+    
+    def save_knowledge(self, path: str) -> int:
+        """Snapshot the local MeTTa space, including learned knowledge, to path."""
+        return save_knowledge_snapshot(self.metta, path, list(self._learned.values()))
+    
+    def knowledge_stats(self) -> Dict:
+        """Size of the local MeTTa space and of the runtime-learned knowledge."""
+        return {
+            "space_atoms": self.metta.space().atom_count(),
+            "faq_entries": len(self.faq_index),
+            "learned": len(self._learned),
+            "max_learned": self.max_learned_knowledge,
+            "evictions": self.knowledge_evictions,
+            "deduplicated": self.knowledge_deduplicated,
+        }
+